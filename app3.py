@@ -6,16 +6,63 @@
 #   python -m pip install -U streamlit plotly pandas openpyxl numpy
 #   python -m streamlit run app.py
 
+import codecs
+import contextvars
+import csv
+import datetime
+import gzip
+import hashlib
+import html
+import inspect
+import io
+import json
+import logging
+import multiprocessing
 import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+import xml.etree.ElementTree as ET
 import numpy as np
 import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+import plotly.io as pio
 from plotly.subplots import make_subplots
 import re
-from dataclasses import dataclass
-from typing import Dict, List, Any, Optional
+from dataclasses import dataclass, field
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, wraps
+from typing import Callable, Dict, List, Any, NamedTuple, Optional, Tuple
+from openpyxl.styles.stylesheet import Stylesheet
+from openpyxl.utils.datetime import from_excel, from_ISO8601, MAC_EPOCH, WINDOWS_EPOCH
+from openpyxl.utils.escape import unescape as xlsx_unescape
+from openpyxl.xml.functions import fromstring as xml_fromstring
+from pandas.io.parsers import TextParser
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # 无 pyarrow 时关闭列式快照与 Parquet 数据源，退回纯 Excel 解析
+    pa = None
+    feather = None
+    pq = None
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # 无 watchdog 时不做文件监视，每次刷新按文件指纹判断
+    Observer = None
+    FileSystemEventHandler = object
+
+logger = logging.getLogger(__name__)
 
 def is_cloud() -> bool:
     return bool(os.environ.get("STREAMLIT_SERVER_PORT") or os.environ.get("STREAMLIT_CLOUD"))
@@ -23,42 +70,51 @@ def is_cloud() -> bool:
 def load_all_dashboard_data(used_file, fp=None):
     """
     统一收口：一站式读取所有看板数据
+    工作簿只打开一次（WorkbookSession），各 read_* 共用同一份已解析的 sheet；
+    各 read_* 按自己 sheet 的指纹缓存，只改了一张表时其余表不重新解析
     """
     results = {}
-    
-    # 1. 年度利润
-    try:
-        results["annual_profit"] = read_annual_profit(used_file, fp=fp)
-    except Exception as e:
-        st.error(f"读取《年度利润》失败：{e}")
-        st.stop()
 
-    # 2. 银行余额
-    try:
-        results["cash_cny"] = read_bank_balance_cny(used_file, fp=fp)
-    except Exception:
-        results["cash_cny"] = 0.0
+    with WorkbookSession(used_file, fp=fp) as book:
+        if PARSE_WORKERS > 1:
+            prefetch_parallel(book, PARSE_WORKERS)
 
-    # 3. 销售数据
-    try:
-        results["sales"] = read_sales(used_file, fp=fp)
-    except Exception as e:
-        st.error(f"读取《销售数据》失败：{e}")
-        st.stop()
+        # 1. 年度利润
+        try:
+            results["annual_profit"] = read_annual_profit(book, fp=book.role_fp("annual_profit"))
+        except Exception as e:
+            st.error(f"读取《年度利润》失败：{e}")
+            st.stop()
 
-    # 4. 平台费用
-    try:
-        results["platform"] = read_platform_selling_exp(used_file, fp=fp)
-    except Exception as e:
-        st.warning(f"读取《平台 销售费用比》失败：{e}（费用分析页将不可用）")
-        results["platform"] = pd.DataFrame()
+        # 2. 银行余额
+        try:
+            results["cash_cny"] = read_bank_balance_cny(book, fp=book.role_fp("bank"))
+        except Exception:
+            results["cash_cny"] = 0.0
+
+        # 3. 销售数据（由立方体上卷出的几张小表，见 SalesRollups；看板各视图不再扫描明细或立方体）
+        try:
+            results["sales"] = sales_rollups(book, fp=book.role_fp("sales"))
+        except Exception as e:
+            st.error(f"读取《销售数据》失败：{e}")
+            st.stop()
+
+        # 4. 平台费用
+        try:
+            results["platform"] = read_platform_selling_exp(book, fp=book.role_fp("platform"))
+        except Exception as e:
+            st.warning(f"读取《平台 销售费用比》失败：{e}（费用分析页将不可用）")
+            results["platform"] = pd.DataFrame()
+
+        # 5. 运营费用
+        try:
+            results["opex_df"] = read_opex(book, fp=book.role_fp("opex"))
+        except Exception as e:
+            results["opex_df"] = pd.DataFrame()
+
+        # 本次刷新各 sheet 的解析耗时（全部命中缓存时为空）
+        results["parse_timings"] = dict(book.timings)
 
-    # 5. 运营费用
-    try:
-        results["opex_df"] = read_opex(used_file, fp=fp)
-    except Exception as e:
-        results["opex_df"] = pd.DataFrame()
-        
     return results
 
 # -----------------------------
@@ -293,68 +349,1431 @@ def pick_col(cols, candidates):
                 return orig
     return None
 
+# -----------------------------
+# 性能剖析（调试）：记录一次刷新内各阶段耗时，渲染瀑布图并导出 Chrome trace
+# -----------------------------
+# 只在侧边栏打开“性能剖析”时启用；未启用时 trace_span / traced 只做一次 ContextVar 读取。
+# 后台线程（图表预取、文件监视）不继承本变量，不计入本次刷新。
+_ACTIVE_TRACE: contextvars.ContextVar = contextvars.ContextVar("bolva_trace", default=None)
+
+@dataclass
+class TraceSpan:
+    name: str
+    cat: str
+    start: float            # 相对本次刷新开始（秒）
+    dur: float = 0.0
+    depth: int = 0
+    args: Dict[str, Any] = field(default_factory=dict)
+
+class RunTrace:
+    """一次刷新的阶段记录：按开始顺序保存，depth 为嵌套层级"""
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        self.spans: List[TraceSpan] = []
+        self._depth = 0
+
+    def open(self, name: str, cat: str, args: Dict[str, Any]) -> TraceSpan:
+        span = TraceSpan(name, cat, time.perf_counter() - self.t0, depth=self._depth, args=dict(args))
+        self.spans.append(span)
+        self._depth += 1
+        return span
+
+    def close(self, span: TraceSpan):
+        span.dur = time.perf_counter() - self.t0 - span.start
+        self._depth -= 1
+
+    def chrome_trace(self) -> str:
+        """Chrome trace JSON（chrome://tracing / Perfetto 可直接打开），时间单位为微秒"""
+        pid, tid = os.getpid(), threading.get_ident()
+        events = [{"name": s.name, "cat": s.cat, "ph": "X", "ts": round(s.start * 1e6), "dur": round(s.dur * 1e6),
+                   "pid": pid, "tid": tid, "args": s.args} for s in self.spans]
+        return json.dumps({"traceEvents": events, "displayTimeUnit": "ms"}, ensure_ascii=False, default=str)
+
+@contextmanager
+def trace_span(name: str, cat: str = "stage", **args):
+    """记录一个阶段；未启用剖析时 yield None。调用方可往 span.args 里补充信息（如缓存命中）"""
+    trace = _ACTIVE_TRACE.get()
+    if trace is None:
+        yield None
+        return
+    span = trace.open(name, cat, args)
+    try:
+        yield span
+    finally:
+        trace.close(span)
+
+def traced(cat: str):
+    """装饰器：以函数名记录耗时（图表构建、洞察生成、汇总计算等）"""
+    def deco(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _ACTIVE_TRACE.get() is None:
+                return func(*args, **kwargs)
+            with trace_span(func.__name__, cat):
+                return func(*args, **kwargs)
+        return wrapper
+    return deco
+
+@contextmanager
+def trace_run(enabled: bool):
+    """包住一次完整刷新；enabled 为 False 时 yield None"""
+    if not enabled:
+        yield None
+        return
+    trace = RunTrace()
+    token = _ACTIVE_TRACE.set(trace)
+    span = trace.open("刷新", "run", {})
+    try:
+        yield trace
+    finally:
+        trace.close(span)
+        _ACTIVE_TRACE.reset(token)
+
 # -----------------------------
 # 核心取数工具：缓存与指纹
 # -----------------------------
+@traced("load")
 def file_fingerprint(file_or_path) -> str:
-    """用 文件大小+修改时间(或对象ID) 作为轻量指纹，驱动缓存失效"""
+    """
+    缓存唯一键（read_* 不再对文件本身做哈希）：
+    - 本地路径：路径 + 修改时间 + 大小（轻量）
+    - 上传文件：内容摘要（同内容重复上传命中同一缓存）
+    - 数据目录 / DataBundle：其中各文件指纹的组合
+    """
+    # 0. 数据目录 / 多文件
+    if isinstance(file_or_path, str) and os.path.isdir(file_or_path):
+        file_or_path = scan_data_dir(file_or_path)
+    if isinstance(file_or_path, DataBundle):
+        parts = sorted((k, file_fingerprint(v)) for k, v in file_or_path.sheet_files.items())
+        if file_or_path.workbook is None and not parts:
+            return "none"
+        wb = file_fingerprint(file_or_path.workbook) if file_or_path.workbook is not None else "-"
+        return "bundle:" + hashlib.blake2b(repr((wb, parts)).encode("utf-8"), digest_size=16).hexdigest()
+
     # 1. 本地路径 (str)
     if isinstance(file_or_path, str):
         try:
             stat = os.stat(file_or_path)
-            return f"{stat.st_mtime_ns}_{stat.st_size}"
+            return f"{os.path.abspath(file_or_path)}|{stat.st_mtime_ns}_{stat.st_size}"
         except:
             return "none"
             
     # 2. UploadedFile (Streamlit)
-    if hasattr(file_or_path, "name") and hasattr(file_or_path, "size"):
-        # 加上 id() 确保即使重新上传相同文件（Streamlit会重建对象）也能触发更新
-        return f"{file_or_path.name}_{file_or_path.size}_{id(file_or_path)}"
+    if hasattr(file_or_path, "getvalue"):
+        return upload_digest(file_or_path)
         
     return "unknown"
 
+UPLOAD_DIGEST_KEEP = 16
+
+def upload_digest(upload) -> str:
+    """上传文件的内容摘要：每个上传（file_id）只在到达时计算一次，之后的 rerun 直接复用"""
+    memo = st.session_state.setdefault("_upload_digests", {})
+    key = getattr(upload, "file_id", None) or id(upload)
+    if key not in memo:
+        if len(memo) >= UPLOAD_DIGEST_KEEP:
+            memo.clear()
+        memo[key] = "blake2b:" + hashlib.blake2b(upload.getvalue(), digest_size=16).hexdigest()
+    return memo[key]
+
 # -----------------------------
-# Excel 读取
+# 工作簿会话：一次刷新只打开/解析一次
 # -----------------------------
-@st.cache_data(show_spinner=False)
-def read_annual_profit(excel_file, fp=None) -> pd.DataFrame:
-    if hasattr(excel_file, "seek"): excel_file.seek(0)
-    raw = pd.read_excel(excel_file, sheet_name="年度利润")
-    headers = raw.iloc[1].tolist()
-    df = raw.iloc[2:].copy()
-    df.columns = headers
+def _header_names(values) -> list:
+    """按 pandas header=0 的习惯命名表头：空表头记为 Unnamed: i，重名依次加 .1/.2"""
+    names, seen = [], {}
+    for i, h in enumerate(values):
+        name = f"Unnamed: {i}" if h is None or (not isinstance(h, str) and pd.isna(h)) else h
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        names.append(name)
+    return names
 
-    mcol = pick_col(df.columns, ["月份", "month"])
-    sales_col = pick_col(df.columns, ["销售额", "营收", "revenue"])
-    gm_col = pick_col(df.columns, ["毛利率", "grossmargin", "gm"])
-    np_col = pick_col(df.columns, ["净利润", "netprofit"])
-    npr_col = pick_col(df.columns, ["净利率", "netmargin"])
+def _promote_header(raw: pd.DataFrame, header_row: int) -> pd.DataFrame:
+    """把 header=None 读出的原始表第 header_row 行提升为表头"""
+    df = raw.iloc[header_row + 1:].copy()
+    df.columns = _header_names(raw.iloc[header_row].tolist())
+    return df.infer_objects()
 
-    if mcol is None or sales_col is None:
-        raise ValueError("《年度利润》缺少关键列：月份 / 销售额(营收)")
+class WorkbookSession:
+    """
+    单次刷新内的工作簿会话：
+    - 文件只打开一次（上传文件只读一次字节），懒加载：全部命中缓存时根本不打开
+    - 每个 sheet 以 header=None 至多完整解析一次，read_* 只做清洗转换
+    - layout() 只读 xlsx 清单与各 sheet 前几行 XML，不为“认 sheet”做完整解析
+    - timings 记录每个 sheet 的解析耗时（秒）
+    source 可以是 xlsx 路径/上传文件、数据目录或 DataBundle；按 sheet 导出的文件见 SheetFile。
+    """
+    def __init__(self, source, fp=None):
+        if isinstance(source, str) and os.path.isdir(source):
+            source = scan_data_dir(source)
+        bundle = source if isinstance(source, DataBundle) else DataBundle(workbook=source)
+        self.source = bundle.workbook
+        self.sheet_files: Dict[str, SheetFile] = {k: SheetFile(v) for k, v in bundle.sheet_files.items()}
+        self.fp = fp
+        self.timings: Dict[str, float] = {}
+        self._bytes: Optional[bytes] = None
+        self._xf: Optional[pd.ExcelFile] = None
+        self._zf: Optional[zipfile.ZipFile] = None
+        self._reader = None
+        self._layout: Optional["WorkbookLayout"] = None
+        self._role_fps: Optional[Dict[str, str]] = None
+        self._raw: Dict[str, pd.DataFrame] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _open_source(self):
+        """本地路径直接用路径；上传文件只取一次字节，zip 与 openpyxl 共用"""
+        if self.source is None:
+            raise ValueError("未提供 Excel 工作簿")
+        if isinstance(self.source, str):
+            return self.source
+        if self._bytes is None:
+            self._bytes = self.source.getvalue()
+        return io.BytesIO(self._bytes)
+
+    def excel(self) -> pd.ExcelFile:
+        if self._xf is None:
+            t0 = time.perf_counter()
+            self._xf = pd.ExcelFile(self._open_source())
+            self.timings["(打开工作簿)"] = time.perf_counter() - t0
+        return self._xf
+
+    def zip(self) -> zipfile.ZipFile:
+        if self._zf is None:
+            self._zf = zipfile.ZipFile(self._open_source())
+        return self._zf
+
+    def stream_reader(self) -> Optional["XlsxStreamReader"]:
+        """xlsx 的 XlsxStreamReader（不看 BOLVA_READER，表头探测总用它）；打不开返回 None"""
+        if self._reader is None:
+            self._reader = False
+            try:
+                self._reader = XlsxStreamReader(self.zip())
+            except (OSError, KeyError, ValueError, zipfile.BadZipFile, ET.ParseError):
+                pass
+        return self._reader or None
+
+    def xml_reader(self) -> Optional["XlsxStreamReader"]:
+        """流式 XML 读取后端（BOLVA_READER=xml 且为 xlsx 时）；不可用返回 None，走 openpyxl"""
+        return self.stream_reader() if READER_BACKEND == "xml" else None
+
+    def layout(self) -> "WorkbookLayout":
+        if self._layout is None:
+            self._layout = detect_workbook_layout(self, fp=self.fp)
+        return self._layout
+
+    def role_fp(self, role: str):
+        """该角色所在 sheet 的指纹（见 sheet_fingerprints）；取不到时退回整文件指纹"""
+        if self._role_fps is None:
+            self._role_fps = sheet_fingerprints(self, fp=self.fp)
+        return self._role_fps.get(role, self.fp)
+
+    @property
+    def sheet_names(self) -> List[str]:
+        return self.layout().sheet_names
+
+    def raw(self, sheet: str) -> pd.DataFrame:
+        """完整解析一个 sheet（header=None），同一会话内只解析一次"""
+        if sheet not in self._raw:
+            t0 = time.perf_counter()
+            df = None
+            if sheet in self.sheet_files:
+                df = self.sheet_files[sheet].raw()
+            elif (rd := self.xml_reader()) is not None:
+                try:
+                    df = rd.raw(sheet)
+                except (KeyError, ValueError, IndexError, ET.ParseError):
+                    df = None   # 非常规写法，退回 openpyxl
+            if df is None:
+                df = self.excel().parse(sheet_name=sheet, header=None)
+            self._raw[sheet] = df
+            self.timings[sheet] = time.perf_counter() - t0
+        return self._raw[sheet]
+
+    def _projection(self, sheet: str, header_row: int, role: Optional[str]) -> Optional[List[str]]:
+        """导出文件按角色只读需要的列（ROLE_SPECS 解析到的实际表头）；工作簿 sheet 不做投影"""
+        if role is None or sheet not in self.sheet_files:
+            return None
+        cols = resolve_cols(self.sheet_files[sheet].header(header_row), role)
+        return list(dict.fromkeys(c for c in cols.values() if c is not None))
+
+    def frame(self, sheet: str, header_row: int = 0, role: Optional[str] = None) -> pd.DataFrame:
+        """取 sheet 并以第 header_row 行（0 起算）为表头；给出 role 时导出文件只读该角色用到的列"""
+        if sheet in self.sheet_files:
+            t0 = time.perf_counter()
+            df = self.sheet_files[sheet].frame(header_row, self._projection(sheet, header_row, role))
+            self.timings[sheet] = time.perf_counter() - t0
+            return df
+        return _promote_header(self.raw(sheet), header_row)
+
+    def iter_chunks(self, sheet: str, header_row: int = 0, chunk_rows: int = 50_000, role: Optional[str] = None):
+        """
+        流式逐块读取 sheet（XML 后端或 openpyxl 只读模式，不整表落成 DataFrame）。
+        依次产出以表头命名列的块；整表耗时计入 timings。
+        """
+        t0 = time.perf_counter()
+        if sheet in self.sheet_files:
+            yield from self.sheet_files[sheet].iter_chunks(header_row, chunk_rows, self._projection(sheet, header_row, role))
+            self.timings[f"{sheet}（流式）"] = time.perf_counter() - t0
+            return
+        rd = self.xml_reader()
+        if rd is not None:
+            yield from rd.iter_chunks(sheet, header_row, chunk_rows)
+            self.timings[f"{sheet}（流式）"] = time.perf_counter() - t0
+            return
+        ws = self.excel().book[sheet]
+        header, buf = None, []
+        for i, row in enumerate(ws.iter_rows(values_only=True)):
+            if i < header_row:
+                continue
+            if header is None:
+                header = _header_names(row)
+                continue
+            buf.append(row)
+            if len(buf) >= chunk_rows:
+                yield pd.DataFrame.from_records(buf).reindex(columns=range(len(header))).set_axis(header, axis=1)
+                buf = []
+        if header is not None and buf:
+            yield pd.DataFrame.from_records(buf).reindex(columns=range(len(header))).set_axis(header, axis=1)
+        self.timings[f"{sheet}（流式）"] = time.perf_counter() - t0
+
+    def close(self):
+        if self._xf is not None:
+            self._xf.close()
+            self._xf = None
+        if self._zf is not None:
+            self._zf.close()
+            self._zf = None
+        self._raw.clear()
+        self._bytes = None
 
-    # ---- 日期兼容：字符串 + Excel序列号 ----
-    # 尝试解析为数值（Excel序列号）
-    df[mcol+"_num"] = pd.to_numeric(df[mcol], errors="coerce")
-    
-    # 尝试解析为字符串并提取YYYY-MM
-    def try_parse_date(x):
-        s = str(x).strip()
-        # 匹配 2025-01
-        m = re.search(r"(\d{4})[-/年](\d{1,2})", s)
-        if m:
-            return f"{m.group(1)}-{int(m.group(2)):02d}"
+# -----------------------------
+# 读取后端：xlsx 流式 XML（不构造 openpyxl 单元格对象）
+# -----------------------------
+READER_BACKEND = os.environ.get("BOLVA_READER", "xml")   # xml：流式 XML 后端；openpyxl：原 pandas/openpyxl 路径
+XLSX_READ_BLOCK = 8 << 20   # 解压读取 sheet XML 的块大小（字节）
+XLSX_HEAD_BLOCK = 64 << 10  # 表头探测只读开头几行，用小块，读够即停
+
+_ROW_END_RE = re.compile(rb"</((?:\w+:)?)row>")
+_CELL_RE = re.compile(rb"<(?:\w+:)?c\b([^>]*?)(?:/>|>(.*?)</(?:\w+:)?c>)", re.S)
+_ATTR_R_RE = re.compile(rb'\br="([A-Za-z]*)(\d+)"')
+_ATTR_T_RE = re.compile(rb'\bt="(\w+)"')
+_ATTR_S_RE = re.compile(rb'\bs="(\d+)"')
+_V_RE = re.compile(rb"<(?:\w+:)?v>(.*?)</(?:\w+:)?v>", re.S)
+_T_RE = re.compile(rb"<(?:\w+:)?t\b[^>]*>(.*?)</(?:\w+:)?t>", re.S)
+# 常见写法（r/s/t 依次出现、无公式）的单元格一次匹配；匹配数与 <c 个数不符的行走通用路径
+_CELL_FAST_RE = re.compile(rb'<c r="([A-Z]+)\d+"(?: s="(\d+)")?(?: t="(\w+)")?\s*(?:/>|>(?:<v>([^<]*)</v>|<is><t>([^<&]+)</t></is>)?</c>)')
+_SST_REF_RE = re.compile(rb't="s"[^>]*>\s*<(?:\w+:)?v>(\d+)<')
+_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\b[^>]*\bref="[A-Za-z]*\d*:?([A-Za-z]*)(\d*)"')
+
+def _xlsx_all_shared_strings(zf: zipfile.ZipFile) -> List[str]:
+    if "xl/sharedStrings.xml" not in zf.namelist():
+        return []
+    out = []
+    with zf.open("xl/sharedStrings.xml") as fh:
+        for _, el in ET.iterparse(fh, events=("end",)):
+            if _xml_local(el.tag) == "si":
+                out.append(_si_text(el))
+                el.clear()
+    return out
+
+class CellError(str):
+    """错误值单元格（#N/A 等）：openpyxl 口径保留文本，pandas 口径转 NaN"""
+
+def _xlsx_rows(zf: zipfile.ZipFile, part: str):
+    """
+    按块解压 sheet XML，逐行产出 (行号 0 起算, 行内 XML 字节)；不建 DOM。
+    按 </row> 切分（C 层完成），自闭合的空行 <row .../> 没有单元格，直接跳过。
+    """
+    with zf.open(part) as fh:
+        yield from _xml_rows(fh)
+
+def _xml_rows(fh, next_row: int = 0, limit: Optional[int] = None, block_size: int = XLSX_READ_BLOCK):
+    """
+    _xlsx_rows 的切分逻辑，作用于已解压的 sheet XML 文件对象（从当前位置起最多读 limit 字节）。
+    next_row：第一行没有 r= 坐标时的行号（从整行边界切开的片段由调用方给出）。
+    """
+    tail, end_tag = b"", None
+    while True:
+        n = block_size if limit is None else min(block_size, limit)
+        block = fh.read(n) if n else b""
+        if limit is not None:
+            limit -= len(block)
+        buf = tail + block
+        if end_tag is None:
+            m = _ROW_END_RE.search(buf)
+            if m is None:
+                tail = buf
+                if not block:
+                    break
+                continue
+            end_tag, start_tag = m.group(0), b"<" + m.group(1) + b"row"
+        pieces = buf.split(end_tag)
+        tail = pieces.pop()
+        for piece in pieces:
+            start = piece.rfind(start_tag)
+            gt = piece.find(b">", start)
+            if start < 0 or gt < 0:
+                continue
+            r = _ATTR_R_RE.search(piece, start, gt)
+            row = int(r.group(2)) - 1 if r else next_row
+            next_row = row + 1
+            yield row, piece[gt + 1:]
+        if not block:
+            break
+
+def _pandas_cell(v):
+    """openpyxl 取值 -> pandas read_excel 的单元格口径（空为 ""、错误为 NaN、整数值浮点转 int）"""
+    if v is None:
+        return ""
+    if isinstance(v, CellError):
+        return np.nan
+    if type(v) is float and v.is_integer():
+        return int(v)
+    return v
+
+class XlsxStreamReader:
+    """
+    xlsx 流式读取后端：直接从 zip 按块解压 sheet XML、按行切分，逐格取值后直接组表。
+    取值口径与 pandas/openpyxl（只读 + data_only）一致：共享/内联字符串、布尔、错误值，
+    按 styles.xml 的数字格式把日期序列号转为 datetime（区分 1900/1904 纪元与时长格式）。
+    单元格缺少 r= 坐标等非常规写法时抛 ValueError，由调用方退回 openpyxl。
+    """
+    def __init__(self, zf: zipfile.ZipFile):
+        self.zf = zf
+        self.parts = dict(_xlsx_manifest(zf))
+        self._sst: Optional[List[str]] = None
+        names = set(zf.namelist())
+        if "xl/styles.xml" in names:
+            styles = Stylesheet.from_tree(xml_fromstring(zf.read("xl/styles.xml")))
+            self.date_xf, self.td_xf = frozenset(styles.date_formats), frozenset(styles.timedelta_formats)
+        else:
+            self.date_xf, self.td_xf = frozenset(), frozenset()
+        date1904 = re.search(rb'date1904="(1|true)"', zf.read("xl/workbook.xml"))
+        self.epoch = MAC_EPOCH if date1904 else WINDOWS_EPOCH
+        info = zf.getinfo("xl/styles.xml") if "xl/styles.xml" in names else None
+        self.styles_token = f"{info.CRC:08x}:{info.file_size}" if info else "-"
+        self._cols: Dict[bytes, int] = {}     # 列字母 -> 列号
+        self._xf_kind: Dict[bytes, int] = {}  # s= 样式号 -> 0 数值 / 1 日期 / 2 时长
+
+    @property
+    def sst(self) -> List[str]:
+        # Excel 把 XML 不能直接写的字符存成 _xHHHH_（字面的 "_x" 写成 _x005F_），按 OOXML 规则一次解码
+        if self._sst is None:
+            self._sst = [xlsx_unescape(x) for x in _xlsx_all_shared_strings(self.zf)]
+        return self._sst
+
+    def part(self, sheet: str) -> str:
+        if sheet not in self.parts:
+            raise KeyError(sheet)
+        return self.parts[sheet]
+
+    def iter_rows(self, sheet: str):
+        """(行号, 行内 XML 字节)，按 sheet 顺序"""
+        return _xlsx_rows(self.zf, self.part(sheet))
+
+    def cell(self, attrs: bytes, inner: Optional[bytes]):
+        t = _ATTR_T_RE.search(attrs) if b't="' in attrs else None
+        t = t.group(1) if t else b"n"
+        if t == b"inlineStr":
+            return xlsx_unescape(html.unescape("".join(x.decode("utf-8") for x in _T_RE.findall(inner)))) if inner else None
+        v = _V_RE.search(inner) if inner else None
+        if v is None or not v.group(1):
+            return None
+        v = v.group(1)
+        if t == b"n":
+            num = float(v) if (b"." in v or b"E" in v or b"e" in v) else int(v)
+            s = _ATTR_S_RE.search(attrs) if b's="' in attrs else None
+            if s is None:
+                return num
+            kind = self._xf_kind.get(s.group(1))
+            if kind is None:
+                xf = int(s.group(1))
+                kind = self._xf_kind[s.group(1)] = 2 if xf in self.td_xf else 1 if xf in self.date_xf else 0
+            if kind:
+                try:
+                    return from_excel(num, self.epoch, timedelta=kind == 2)
+                except (OverflowError, ValueError):
+                    return CellError("#VALUE!")
+            return num
+        if t == b"s":
+            return self.sst[int(v)]
+        if t == b"b":
+            return bool(int(v))
+        if t == b"e":
+            return CellError(html.unescape(v.decode("utf-8")))
+        if t == b"d":
+            return from_ISO8601(v.decode("ascii"))
+        return html.unescape(v.decode("utf-8"))
+
+    def row_values(self, inner: bytes) -> Dict[int, Any]:
+        """一行的 {列号: 值}（只含出现在 XML 里的单元格）"""
+        fast = _CELL_FAST_RE.findall(inner)
+        if fast and len(fast) == inner.count(b"<c ") and b"<c>" not in inner:
+            return self._fast_values(fast)
+        cells, cols, cell = {}, self._cols, self.cell
+        for attrs, body in _CELL_RE.findall(inner):
+            r = _ATTR_R_RE.search(attrs)
+            if r is None:
+                raise ValueError("单元格缺少 r= 坐标")
+            c = cols.get(r.group(1))
+            if c is None:
+                c = cols[r.group(1)] = _xml_col_index(r.group(1).decode("ascii"))
+            cells[c] = cell(attrs, body or None)
+        return cells
+
+    def _fast_values(self, matches: List[tuple]) -> Dict[int, Any]:
+        cells, cols, sst, kinds = {}, self._cols, None, self._xf_kind
+        for col, s, t, v, text in matches:
+            c = cols.get(col)
+            if c is None:
+                c = cols[col] = _xml_col_index(col.decode("ascii"))
+            if t == b"inlineStr":
+                cells[c] = xlsx_unescape(text.decode("utf-8")) if text else None
+                continue
+            if not v:
+                cells[c] = None
+                continue
+            if t == b"n" or not t:
+                num = float(v) if (b"." in v or b"E" in v or b"e" in v) else int(v)
+                kind = kinds.get(s) if s else 0
+                if kind is None:
+                    xf = int(s)
+                    kind = kinds[s] = 2 if xf in self.td_xf else 1 if xf in self.date_xf else 0
+                if kind:
+                    try:
+                        num = from_excel(num, self.epoch, timedelta=kind == 2)
+                    except (OverflowError, ValueError):
+                        num = CellError("#VALUE!")
+                cells[c] = num
+            elif t == b"s":
+                if sst is None:
+                    sst = self.sst
+                cells[c] = sst[int(v)]
+            else:
+                cells[c] = self.cell(b't="' + t + b'"', b"<v>" + v + b"</v>")
+        return cells
+
+    def header(self, rows, header_row: int) -> Optional[list]:
+        """从 iter_rows 迭代器里消费到表头行，返回按 pandas 习惯命名的表头"""
+        for r, inner in rows:
+            if r == header_row:
+                cells = self.row_values(inner)
+                return _header_names([cells.get(i) for i in range(max(cells) + 1)]) if cells else None
+            if r > header_row:
+                return None
+        return None
+
+    def frame(self, rows: List[tuple], header: list) -> pd.DataFrame:
+        """[(行号, 行内 XML)] -> 以表头命名列、行号为索引的 DataFrame（openpyxl values_only 口径）"""
+        recs = [self.row_values(inner) for _, inner in rows]
+        raw = pd.DataFrame.from_records(recs, index=[r for r, _ in rows])
+        return raw.reindex(columns=range(len(header))).set_axis(header, axis=1).infer_objects()
+
+    def _dimension(self, sheet: str):
+        with self.zf.open(self.part(sheet)) as fh:
+            return _DIMENSION_RE.search(fh.read(4096))
+
+    def max_column(self, sheet: str) -> Optional[int]:
+        """<dimension> 里的列数（openpyxl 只读模式按它补齐每行宽度）"""
+        m = self._dimension(sheet)
+        return _xml_col_index(m.group(1).decode("ascii")) + 1 if m and m.group(1) else None
+
+    def head(self, sheet: str, nrows: int):
+        """
+        前 nrows 行 -> ({行号: {列号: 值}}, 总行数估计)，表头探测用；取值同 row_values，
+        小块解压、读够即停。总行数取自 <dimension>，没有时为 None。
+        """
+        m = self._dimension(sheet)
+        rows: Dict[int, Dict[int, Any]] = {}
+        with self.zf.open(self.part(sheet)) as fh:
+            for r, inner in _xml_rows(fh, block_size=XLSX_HEAD_BLOCK):
+                if r >= nrows:
+                    break
+                rows[r] = {c: v for c, v in self.row_values(inner).items() if v is not None}
+        return rows, int(m.group(2)) if m and m.group(2) else None
+
+    def raw(self, sheet: str) -> pd.DataFrame:
+        """整表（header=None），与 pd.read_excel(engine="openpyxl", header=None) 结果一致"""
+        data: List[list] = []
+        last = -1
+        for r, inner in self.iter_rows(sheet):
+            while len(data) < r:
+                data.append([])   # 缺失的行按空行补齐
+            cells = self.row_values(inner)
+            row = []
+            if cells:
+                row = [""] * (max(cells) + 1)
+                for c, v in cells.items():
+                    row[c] = _pandas_cell(v)
+                while row and isinstance(row[-1], str) and row[-1] == "":
+                    row.pop()
+            if row:
+                last = len(data)
+            data.append(row)
+        data = data[: last + 1]
+        if not data:
+            return pd.DataFrame()
+        width = max(len(x) for x in data)
+        data = [x + [""] * (width - len(x)) for x in data]
+        return TextParser(data, header=None, skip_blank_lines=False).read()
+
+    def iter_chunks(self, sheet: str, header_row: int = 0, chunk_rows: int = 50_000,
+                    tap: Optional[Callable[[List[tuple]], Any]] = None):
+        """
+        与 WorkbookSession.iter_chunks 的 openpyxl 版本口径一致（values_only，按 dimension 补齐列宽）。
+        tap：每产出一块之前，先把这一块对应的原始 [(行号, 行内 XML)] 交给它（如按月分区算摘要）。
+        """
+        width = self.max_column(sheet)
+
+        def as_row(cells: Dict[int, Any]) -> list:
+            n = width if width is not None else (max(cells) + 1 if cells else 0)
+            return [cells.get(i) for i in range(n)]
+
+        def as_frame(buf: List[list], header: list) -> pd.DataFrame:
+            return pd.DataFrame.from_records(buf).reindex(columns=range(len(header))).set_axis(header, axis=1)
+
+        header, buf, raw, expected = None, [], [], header_row
+        for r, inner in self.iter_rows(sheet):
+            if r < header_row:
+                continue
+            cells = self.row_values(inner)
+            if header is None:
+                if r == header_row:
+                    header = _header_names(as_row(cells))
+                    expected = r + 1
+                    continue
+                header = _header_names(as_row({}))   # 表头行本身是空行
+                expected = header_row + 1
+            while expected < r:
+                buf.append(as_row({}))   # 缺失的行
+                expected += 1
+            buf.append(as_row(cells))
+            if tap is not None:
+                raw.append((r, inner))
+            expected = r + 1
+            if len(buf) >= chunk_rows:
+                if tap is not None:
+                    tap(raw)
+                    raw = []
+                yield as_frame(buf, header)
+                buf = []
+        if header is not None and buf:
+            if tap is not None:
+                tap(raw)
+            yield as_frame(buf, header)
+
+# -----------------------------
+# 数据源：按 sheet 导出的 CSV / CSV.gz / Parquet（可替代或补充工作簿）
+# -----------------------------
+SHEET_FILE_EXTS = (".parquet", ".csv.gz", ".csv")   # 同名 sheet 有多种导出时按此顺序优先
+CSV_ENCODINGS = ("utf-8-sig", "gb18030")            # ERP 导出常见编码，依次尝试
+CSV_SNIFF_BYTES = 1 << 20
+
+@dataclass
+class DataBundle:
+    """一组数据文件：工作簿（可选）+ 按 sheet 导出的文件（sheet 名取文件名，同名时以导出文件为准）"""
+    workbook: Any = None                                       # xlsx 本地路径或上传文件
+    sheet_files: Dict[str, Any] = field(default_factory=dict)  # sheet 名 -> 本地路径或上传文件
+
+def sheet_file_name(name: str) -> Optional[str]:
+    """'销售数据.csv.gz' -> '销售数据'；不是支持的导出格式返回 None"""
+    base = os.path.basename(name)
+    low = base.lower()
+    ext = next((e for e in SHEET_FILE_EXTS if low.endswith(e)), None)
+    return base[: -len(ext)] if ext else None
+
+def _add_sheet_file(bundle: DataBundle, name: str, src) -> None:
+    sheet = sheet_file_name(name)
+    if sheet is None:
+        return
+    rank = lambda n: next(i for i, e in enumerate(SHEET_FILE_EXTS) if n.lower().endswith(e))
+    old = bundle.sheet_files.get(sheet)
+    if old is None or rank(name) < rank(old if isinstance(old, str) else old.name):
+        bundle.sheet_files[sheet] = src
+
+def scan_data_dir(path: str) -> DataBundle:
+    """数据目录：第一个 .xlsx 作为工作簿（跳过 Excel 锁文件 ~$），其余可识别的导出文件按 sheet 收集"""
+    bundle = DataBundle()
+    for f in sorted(os.listdir(path)):
+        full = os.path.join(path, f)
+        if f.startswith("~$") or not os.path.isfile(full):
+            continue
+        if f.lower().endswith(".xlsx"):
+            bundle.workbook = bundle.workbook or full
+        else:
+            _add_sheet_file(bundle, f, full)
+    return bundle
+
+UPLOAD_TYPES = ["xlsx", "csv", "gz", "parquet"]
+
+def bundle_uploads(uploads) -> Any:
+    """多个上传文件 -> 数据源：只有一个工作簿时原样返回（与单文件上传一致），否则组成 DataBundle"""
+    bundle = DataBundle()
+    for up in uploads or []:
+        if up.name.lower().endswith(".xlsx"):
+            bundle.workbook = bundle.workbook or up
+        else:
+            _add_sheet_file(bundle, up.name, up)
+    if not bundle.sheet_files:
+        return bundle.workbook
+    return bundle
+
+class SheetFile:
+    """
+    一个按 sheet 导出的文件。raw()/head() 与工作簿 header=None 的原始表行号对齐（表头探测共用），
+    frame()/iter_chunks() 直接以表头行读取，只取 columns 指定的列（列投影）。
+    """
+    def __init__(self, src):
+        self.src = src
+        self.name = src if isinstance(src, str) else src.name
+        self.kind = "parquet" if self.name.lower().endswith(".parquet") else "csv"
+        self.gz = self.name.lower().endswith(".gz")
+        self._enc: Optional[str] = None
+
+    def _binary(self):
+        return self.src if isinstance(self.src, str) else io.BytesIO(self.src.getvalue())
+
+    def encoding(self) -> str:
+        """按文件开头试解码确定编码（增量解码，不受截断处的半个字符影响）"""
+        if self._enc is None:
+            with (gzip.open(self._binary()) if self.gz else self._open_bytes()) as fh:
+                sample = fh.read(CSV_SNIFF_BYTES)
+            for enc in CSV_ENCODINGS:
+                try:
+                    codecs.getincrementaldecoder(enc)().decode(sample, final=False)
+                except UnicodeDecodeError:
+                    continue
+                self._enc = enc
+                break
+            else:
+                raise ValueError(f"{self.name}：无法识别的文本编码")
+        return self._enc
+
+    def _open_bytes(self):
+        return open(self.src, "rb") if isinstance(self.src, str) else io.BytesIO(self.src.getvalue())
+
+    def _text(self):
+        fh = gzip.open(self._binary()) if self.gz else self._open_bytes()
+        return io.TextIOWrapper(fh, encoding=self.encoding(), newline="")
+
+    def _read_csv(self, header_row: int, **kw):
+        return pd.read_csv(self._binary(), encoding=self.encoding(), compression="gzip" if self.gz else None,
+                           skiprows=header_row, header=0, index_col=False, skip_blank_lines=False, **kw)
+
+    def head(self, nrows: int):
+        """前 nrows 行 -> ({行号: {列号: 值}}, 总行数估计)，口径同 XlsxStreamReader.head"""
+        if self.kind == "parquet":
+            pf = pq.ParquetFile(self._binary())
+            batch = next(pf.iter_batches(batch_size=max(nrows - 1, 1)), None)
+            body = batch.to_pylist() if batch is not None else []
+            rows = [pf.schema_arrow.names] + [list(r.values()) for r in body]
+            n_rows = pf.metadata.num_rows + 1
+        else:
+            with self._text() as fh:
+                rows = [r for _, r in zip(range(nrows), csv.reader(fh))]
+            n_rows = None
+        return {i: {j: v for j, v in enumerate(r) if v is not None and str(v).strip() != ""} for i, r in enumerate(rows)}, n_rows
+
+    def raw(self) -> pd.DataFrame:
+        """整表（header=None）：表头行也作为数据行，类型推断同 pd.read_excel(header=None)"""
+        if self.kind == "parquet":
+            df = pq.read_table(self._binary()).to_pandas()
+            data = [list(df.columns)] + df.astype(object).where(df.notna(), None).values.tolist()
+            data = [["" if v is None else v for v in r] for r in data]
+        else:
+            with self._text() as fh:
+                data = list(csv.reader(fh))
+        while data and not any(str(v).strip() for v in data[-1]):
+            data.pop()
+        if not data:
+            return pd.DataFrame()
+        width = max(len(x) for x in data)
+        data = [x + [""] * (width - len(x)) for x in data]
+        return TextParser(data, header=None, skip_blank_lines=False).read()
+
+    def header(self, header_row: int) -> List[str]:
+        if self.kind == "parquet" and header_row == 0:
+            return list(pq.ParquetFile(self._binary()).schema_arrow.names)
+        if self.kind == "parquet":
+            return list(_promote_header(self.raw(), header_row).columns)
+        return list(self._read_csv(header_row, nrows=0).columns)
+
+    def frame(self, header_row: int, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        if self.kind == "parquet" and header_row == 0:
+            return pq.read_table(self._binary(), columns=columns).to_pandas()
+        if self.kind == "parquet":
+            df = _promote_header(self.raw(), header_row)
+            return df[columns] if columns else df
+        return self._read_csv(header_row, usecols=columns)
+
+    def iter_chunks(self, header_row: int, chunk_rows: int, columns: Optional[List[str]] = None):
+        if self.kind == "parquet" and header_row == 0:
+            for batch in pq.ParquetFile(self._binary()).iter_batches(batch_size=chunk_rows, columns=columns):
+                yield batch.to_pandas()
+        elif self.kind == "parquet":
+            df = self.frame(header_row, columns)
+            for lo in range(0, len(df), chunk_rows):
+                yield df.iloc[lo: lo + chunk_rows]
+        else:
+            with self._read_csv(header_row, usecols=columns, chunksize=chunk_rows) as reader:
+                yield from reader
+
+# -----------------------------
+# 列式快照：解析结果落盘（Arrow IPC，内存映射读取）
+# -----------------------------
+SNAPSHOT_DIR = os.environ.get("BOLVA_SNAPSHOT_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".snapshots")
+SNAPSHOT_VERSION = 4   # read_* 输出口径变化时 +1，旧快照自动失效
+SNAPSHOT_KEEP = 40     # 最多保留最近 N 个指纹的快照（按 sheet 指纹落盘，约 8 份工作簿）
+
+def _snapshot_dir(fp) -> Optional[str]:
+    if feather is None or not fp or fp in ("none", "unknown"):
+        return None
+    key = hashlib.sha1(f"v{SNAPSHOT_VERSION}|{fp}".encode("utf-8")).hexdigest()[:20]
+    return os.path.join(SNAPSHOT_DIR, key)
+
+def snapshot_load(fp, name: str) -> Optional[pd.DataFrame]:
+    """按指纹读取快照；命中时通过内存映射打开，不经过 openpyxl"""
+    d = _snapshot_dir(fp)
+    if d is None:
+        return None
+    path = os.path.join(d, f"{name}.arrow")
+    if not os.path.exists(path):
+        return None
+    try:
+        return feather.read_table(path, memory_map=True).to_pandas()
+    except Exception:
+        return None
+
+def snapshot_exists(fp, name: str) -> bool:
+    d = _snapshot_dir(fp)
+    return d is not None and os.path.exists(os.path.join(d, f"{name}.arrow"))
+
+def snapshot_save(fp, name: str, df: pd.DataFrame) -> None:
+    """原子写入快照（先写临时文件再替换）；失败只跳过，不影响看板"""
+    d = _snapshot_dir(fp)
+    if d is None or not isinstance(df, pd.DataFrame) or _READ_ONLY.get() is not None:
+        return
+    try:
+        os.makedirs(d, exist_ok=True)
+        path = os.path.join(d, f"{name}.arrow")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        feather.write_feather(table, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+        _snapshot_prune()
+    except Exception:
+        pass
+
+def _snapshot_prune():
+    try:
+        dirs = [os.path.join(SNAPSHOT_DIR, x) for x in os.listdir(SNAPSHOT_DIR)]
+        # 下划线开头的是共享目录（如按月分区 _parts），不按指纹淘汰
+        dirs = sorted((x for x in dirs if os.path.isdir(x) and not os.path.basename(x).startswith("_")),
+                      key=os.path.getmtime, reverse=True)
+        for old in dirs[SNAPSHOT_KEEP:]:
+            shutil.rmtree(old, ignore_errors=True)
+    except OSError:
+        pass
+
+def with_snapshot(name: str, scalar_col: Optional[str] = None):
+    """
+    read_* 装饰器：先查列式快照，未命中再走 Excel 解析并回写快照。
+    标量结果（如银行余额）以单列单行表保存在 scalar_col 下。
+    """
+    def deco(func):
+        @wraps(func)
+        def wrapper(_book, fp=None, *args, **kwargs):
+            t0 = time.perf_counter()
+            snap = snapshot_load(fp, name)
+            if snap is not None:
+                _book.timings[f"{name}（快照）"] = time.perf_counter() - t0
+                if scalar_col is not None:
+                    return float(snap[scalar_col].iloc[0])
+                return snap
+            out = func(_book, fp, *args, **kwargs)
+            snapshot_save(fp, name, pd.DataFrame({scalar_col: [out]}) if scalar_col is not None else out)
+            return out
+        return wrapper
+    return deco
+
+# -----------------------------
+# 数据缓存：字节预算 + LRU + TTL
+# -----------------------------
+DATA_CACHE_MAX_MB = float(os.environ.get("BOLVA_CACHE_MB", "1024"))
+DATA_CACHE_TTL_S = float(os.environ.get("BOLVA_CACHE_TTL", str(6 * 3600)))
+
+def _nbytes(value) -> int:
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(index=True, deep=True))
+    if isinstance(value, tuple):
+        return sys.getsizeof(value) + sum(_nbytes(v) for v in value)
+    if isinstance(value, CustomerAnalytics):
+        return _nbytes((value.grid, value.profile))
+    return sys.getsizeof(value)
+
+class BoundedCache:
+    """
+    进程级数据缓存（所有会话共享）：
+    - 总占用超过 max_bytes 时按 LRU 淘汰（至少保留最新一条）
+    - 每条记录 ttl 秒后过期
+    - 记录所属 loader，便于侧边栏按 loader 展示占用
+    - loading(key)：同一键的并发未命中只让一个线程去加载（in-flight 去重）
+    未命中时 get 返回 self.MISS：实例放在 st.cache_resource 里跨重跑存活，
+    哨兵必须跟着实例走，不能用每次重跑都会重新创建的模块级对象比较。
+    """
+    MISS = object()
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()  # key -> (loader, value, nbytes, expires_at)
+        self._bytes = 0
+        self._inflight: Dict[Any, list] = {}  # key -> [该键的加载锁, 持有/等待的线程数]
+
+    def get(self, key):
+        with self._lock:
+            hit = self._entries.get(key)
+            if hit is None:
+                return self.MISS
+            if hit[3] < time.monotonic():
+                self._drop(key)
+                return self.MISS
+            self._entries.move_to_end(key)
+            return hit[1]
+
+    def put(self, loader: str, key, value):
+        nbytes = _nbytes(value)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (loader, value, nbytes, time.monotonic() + self.ttl)
+            self._bytes += nbytes
+            self._evict()
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry[2]
+
+    def _evict(self):
+        now = time.monotonic()
+        for key in [k for k, e in self._entries.items() if e[3] < now]:
+            self._drop(key)
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    @contextmanager
+    def loading(self, key):
+        """
+        持有 key 的加载锁：同一键同时只有一个线程在加载，其余线程在这里等它做完，
+        进来后应先再查一次缓存（多数情况下直接拿到先到者的结果）。不同键互不阻塞。
+        """
+        with self._lock:
+            slot = self._inflight.get(key)
+            if slot is None:
+                slot = self._inflight[key] = [threading.RLock(), 0]
+            slot[1] += 1
+        try:
+            with slot[0]:
+                yield
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if slot[1] == 0:
+                    del self._inflight[key]
+
+    def usage(self) -> Dict[str, Dict[str, int]]:
+        """按 loader 汇总：条数 / 字节"""
+        out: Dict[str, Dict[str, int]] = {}
+        with self._lock:
+            self._evict()
+            for loader, _, nbytes, _ in self._entries.values():
+                u = out.setdefault(loader, {"entries": 0, "bytes": 0})
+                u["entries"] += 1
+                u["bytes"] += nbytes
+        return out
+
+    @property
+    def total_bytes(self) -> int:
+        return self._bytes
+
+@st.cache_resource(show_spinner=False)
+def get_data_cache() -> BoundedCache:
+    return BoundedCache(int(DATA_CACHE_MAX_MB * 1024 * 1024), DATA_CACHE_TTL_S)
+
+@dataclass
+class ReadOnlyLoad:
+    missed: bool = False   # 块内有 loader 未命中缓存（重新解析了磁盘上的当前文件）
+
+_READ_ONLY: contextvars.ContextVar = contextvars.ContextVar("bolva_read_only", default=None)
+
+@contextmanager
+def cache_read_only(enabled: bool = True):
+    """
+    块内只读数据缓存与快照、不写入（budget_cache / snapshot_save / 并行预解析）；enabled 为 False 时 yield None。
+    用于指纹可能与磁盘上的文件对不上时（监视器还在预热新版本）：解析到的新内容不能记在旧指纹名下。
+    按月分区以内容摘要命名，不受影响。
+    """
+    if not enabled:
+        yield None
+        return
+    rec = ReadOnlyLoad()
+    token = _READ_ONLY.set(rec)
+    try:
+        yield rec
+    finally:
+        _READ_ONLY.reset(token)
+
+def budget_cache(loader: str):
+    """
+    替代 @st.cache_data 的有界缓存装饰器。
+    与 st.cache_data 相同的约定：下划线开头的参数不参与缓存键（如 _book）。
+    返回的是缓存中的同一对象（不像 st.cache_data 那样每次复制），所有会话、线程共享，只读：
+    调用方不要原地修改（改列、赋值、inplace 排序等），需要改时先 .copy()。
+    同一键的并发未命中只解析一次：后到的线程等先到者写入缓存后直接取用（BoundedCache.loading）。
+    """
+    def deco(func):
+        sig = inspect.signature(func)
+        code_token = hashlib.md5(inspect.unwrap(func).__code__.co_code).hexdigest()[:8]
+
+        def cache_key(*args, **kwargs):
+            bound = sig.bind(*args, **kwargs)
+            bound.apply_defaults()
+            if bound.arguments.get("fp") in (None, "none", "unknown"):
+                # 没有可靠指纹时不缓存，避免不同文件串用同一条缓存
+                return None
+            return (loader, code_token) + tuple((k, v) for k, v in bound.arguments.items() if not k.startswith("_"))
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace_span(func.__name__, "load") as span:
+                key = cache_key(*args, **kwargs)
+                if key is None:
+                    return func(*args, **kwargs)
+                cache = get_data_cache()
+                value = cache.get(key)
+                if span is not None:
+                    span.args["cache"] = "miss" if value is cache.MISS else "hit"
+                if value is cache.MISS:
+                    with cache.loading(key):
+                        value = cache.get(key)   # 等待期间别的线程可能已经加载好
+                        if value is not cache.MISS:
+                            if span is not None:
+                                span.args["cache"] = "waited"
+                            return value
+                        value = func(*args, **kwargs)
+                        ro = _READ_ONLY.get()
+                        if ro is None:
+                            cache.put(loader, key, value)
+                        else:
+                            ro.missed = True
+                return value
+        wrapper.cache_key = cache_key   # 供外部预热（如并行解析）按同一键写入
+        wrapper.loader = loader
+        return wrapper
+    return deco
+
+def render_cache_usage():
+    """侧边栏：当前数据缓存占用（按 loader）"""
+    cache = get_data_cache()
+    usage = cache.usage()
+    with st.expander(f"🧠 缓存占用 {cache.total_bytes / 1024**2:,.1f} / {cache.max_bytes / 1024**2:,.0f} MB", expanded=False):
+        if not usage:
+            st.caption("缓存为空。")
+        for loader, u in sorted(usage.items()):
+            st.caption(f"{loader}：{u['entries']} 条，{u['bytes'] / 1024**2:,.2f} MB")
+        st.caption(f"淘汰策略：LRU；过期时间 {cache.ttl / 3600:g} 小时")
+        figs = get_figure_cache()
+        fu = figs.usage().get("figure", {"entries": 0, "bytes": 0})
+        st.caption(f"图表：{fu['entries']} 张，{fu['bytes'] / 1024**2:,.2f} / {figs.max_bytes / 1024**2:,.0f} MB")
+
+# -----------------------------
+# 图表缓存：序列化后的 figure JSON + LRU + 字节预算
+# -----------------------------
+FIG_CACHE_MAX_MB = float(os.environ.get("BOLVA_FIG_CACHE_MB", "64"))
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache() -> BoundedCache:
+    return BoundedCache(int(FIG_CACHE_MAX_MB * 1024 * 1024), DATA_CACHE_TTL_S)
+
+def figure_key(fp, key: tuple) -> Optional[tuple]:
+    """(数据指纹, 渠道规则摘要, 图表名 + 筛选条件)；指纹不可靠时为 None（不缓存）"""
+    if fp in (None, "none", "unknown"):
+        return None
+    return ("figure", fp, CHANNEL_MATCHER.digest) + tuple(key)
+
+def figure_spec(out) -> Any:
+    return out.to_json() if isinstance(out, go.Figure) else tuple(f.to_json() for f in out)
+
+def cached_figure(fp, key: tuple, build: Callable[[], Any]):
+    """
+    按 figure_key 缓存已构建、已套样式的图表。
+    存的是 JSON 而不是 figure 对象：命中时反序列化出一份新对象，调用方可以继续 update_layout。
+    build 可返回单个 figure 或 figure 元组。
+    """
+    with trace_span(f"图表 {key[0]}", "figure") as span:
+        full_key = figure_key(fp, key)
+        if full_key is None:
+            return build()
+        cache = get_figure_cache()
+        spec = cache.get(full_key)
+        if span is not None:
+            span.args["cache"] = "miss" if spec is cache.MISS else "hit"
+        if spec is cache.MISS:
+            spec = figure_spec(build())
+            cache.put("figure", full_key, spec)
+        if isinstance(spec, str):
+            return pio.from_json(spec)
+        return tuple(pio.from_json(x) for x in spec)
+
+class FigurePrefetcher:
+    """
+    后台单线程预取：首屏渲染完成后，为未打开的分页构建图表写入图表缓存。
+    已缓存或正在构建的键直接跳过；构建失败只跳过，打开分页时按原路径构建（包括报错）。
+    """
+    def __init__(self):
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fig-prefetch")
+        self._lock = threading.Lock()
+        self._inflight = set()
+
+    def submit(self, cache: BoundedCache, jobs: List[Tuple[tuple, Callable[[], Any]]]):
+        for full_key, build in jobs:
+            with self._lock:
+                if full_key in self._inflight or cache.get(full_key) is not cache.MISS:
+                    continue
+                self._inflight.add(full_key)
+            self.pool.submit(self._run, cache, full_key, build)
+
+    def _run(self, cache: BoundedCache, full_key: tuple, build):
+        try:
+            cache.put("figure", full_key, figure_spec(build()))
+        except Exception:
+            pass
+        finally:
+            with self._lock:
+                self._inflight.discard(full_key)
+
+@st.cache_resource(show_spinner=False)
+def get_figure_prefetcher() -> FigurePrefetcher:
+    return FigurePrefetcher()
+
+def prefetch_figures(fp, figs: Dict[str, Tuple[tuple, Callable[[], Any]]]):
+    """把一组 (缓存键, 构建函数) 交给后台预取；指纹不可靠时不预取"""
+    jobs = [(figure_key(fp, key), build) for key, build in figs.values()]
+    jobs = [(k, b) for k, b in jobs if k is not None]
+    if jobs:
+        get_figure_prefetcher().submit(get_figure_cache(), jobs)
+
+# -----------------------------
+# 表头布局探测：只读清单 + 每个 sheet 前几行 XML（流式）
+# -----------------------------
+LAYOUT_HEAD_ROWS = 10   # 每个 sheet 最多看前 N 行定位表头
+
+# 各角色的 sheet / 默认表头行 / 逻辑列候选名；read_* 与探测器共用这一份口径
+ROLE_SPECS: Dict[str, Dict[str, Any]] = {
+    "annual_profit": {
+        "sheet": "年度利润", "header_row": 2,
+        "fields": {
+            "月份": ["月份", "month"],
+            "销售额": ["销售额", "营收", "revenue"],
+            "毛利率": ["毛利率", "grossmargin", "gm"],
+            "净利润": ["净利润", "netprofit"],
+            "净利率": ["净利率", "netmargin"],
+        },
+        "required": ["月份", "销售额"],
+    },
+    "sales": {
+        "sheet": "销售数据", "header_row": 0,
+        "fields": {
+            "日期": ["日期"],
+            # [Fix] 扩充客户列名，防止取错列导致 100% 集中度
+            "购货单位": ["购货单位", "客户名称", "客户", "customer", "buyer", "buyer_name"],
+            "产品名称": ["产品名称"],
+            "销售收入": ["销售收入", "收入", "revenue"],
+            "销售成本": ["销售成本", "成本", "cost"],
+            "销售毛利": ["销售毛利", "毛利", "margin"],
+            "业务员": ["业务员"],
+            "渠道": ["渠道", "channel"],
+        },
+        "required": ["日期", "购货单位", "产品名称", "销售收入"],
+    },
+    "platform": {
+        "sheet": "平台 销售费用比", "header_row": 1,
+        "fields": {
+            "平台": ["平台"],
+            "渠道": ["渠道"],
+            "销售收入": ["销售收入", "营收"],
+            "广告费": ["广告费(CNY)", "广告费（CNY）", "广告费cny", "广告费"],
+            "物流费": ["物流费(CNY)", "物流费（CNY）", "物流费"],
+            "佣金": ["佣金(CNY)", "佣金（CNY）", "佣金"],
+            "销售折扣/补贴": ["销售折扣/补贴", "折扣/补贴", "折扣补贴"],
+            "总销售费用": ["总销售费用", "销售费用合计", "总费用"],
+        },
+        "required": ["平台", "销售收入", "总销售费用"],
+    },
+    "bank": {
+        "sheet": "银行余额", "header_row": 0,
+        "fields": {"本位币(CNY)": ["本位币(CNY)", "本位币", "cny"]},
+        "required": [],
+    },
+    # 运营费用：不按 sheet 名找，凡前几行出现“日期 + 金额”表头的 sheet 都是候选（按工作簿顺序）
+    "opex": {
+        "sheet": None, "header_row": None,
+        "fields": {"日期": ["日期"], "金额": ["金额"]},
+        "required": ["日期", "金额"],
+    },
+}
+
+def resolve_cols(cols, role: str) -> Dict[str, Optional[str]]:
+    """按 ROLE_SPECS 把逻辑列解析为实际表头（pick_col 模糊匹配）"""
+    return {k: pick_col(cols, cands) for k, cands in ROLE_SPECS[role]["fields"].items()}
+
+@dataclass
+class SheetLayout:
+    role: str
+    sheet: str
+    header_row: int                      # 0 起算，对应 header=None 原始表的行号
+    columns: Dict[str, Optional[str]]    # 逻辑列 -> 实际表头
+    n_rows: Optional[int] = None         # 来自 <dimension> 的总行数估计（含表头）
+
+@dataclass
+class WorkbookLayout:
+    sheet_names: List[str]
+    roles: Dict[str, List[SheetLayout]]  # 角色 -> 命中的 sheet（按工作簿顺序）
+    n_rows: Dict[str, Optional[int]]
+
+    def get(self, role: str) -> Optional[SheetLayout]:
+        hits = self.roles.get(role) or []
+        return hits[0] if hits else None
+
+def _xml_local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+def _xml_col_index(ref: str) -> int:
+    """单元格引用 "AB12" -> 列号 27（0 起算）"""
+    n = 0
+    for ch in ref:
+        if not ch.isalpha():
+            break
+        n = n * 26 + (ord(ch.upper()) - 64)
+    return n - 1
+
+def _xml_col_letter(idx: int) -> str:
+    """列号（0 起算）-> "AB" """
+    out, n = "", idx + 1
+    while n:
+        n, rem = divmod(n - 1, 26)
+        out = chr(65 + rem) + out
+    return out
+
+def _xlsx_manifest(zf: zipfile.ZipFile) -> List[tuple]:
+    """工作簿清单：[(sheet 名, zip 内 XML 路径)]，按工作簿顺序"""
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {r.get("Id"): r.get("Target", "") for r in rels}
+    out = []
+    for el in wb.iter():
+        if _xml_local(el.tag) != "sheet":
+            continue
+        rid = next((v for k, v in el.attrib.items() if _xml_local(k) == "id"), None)
+        target = targets.get(rid, "")
+        path = target.lstrip("/") if target.startswith("/") else "xl/" + target
+        out.append((el.get("name"), path))
+    return out
+
+def _si_text(si) -> str:
+    """sharedStrings 中一个 <si> 的文本（富文本拼接，跳过拼音注音 rPh）"""
+    parts = []
+    for child in si:
+        name = _xml_local(child.tag)
+        if name == "t":
+            parts.append(child.text or "")
+        elif name == "r":
+            parts.extend(t.text or "" for t in child if _xml_local(t.tag) == "t")
+    return "".join(parts)
+
+def _row_layout(role: str, cells: Dict[int, Any]) -> Optional[Dict[str, Optional[str]]]:
+    """一行是否构成该角色的表头：必需列全部解析到且互不相同"""
+    header = [cells[k] for k in sorted(cells) if str(cells[k]).strip() != ""]
+    spec = ROLE_SPECS[role]
+    if spec["sheet"] is None:
+        # 运营费用：沿用原口径，清洗后精确包含“日期”“金额”
+        cleaned = [_clean(x) for x in header]
+        if all(k in cleaned for k in spec["required"]):
+            return {k: k for k in spec["fields"]}
         return None
+    cols = resolve_cols(header, role)
+    req = [cols[k] for k in spec["required"]]
+    if any(c is None for c in req) or len(set(req)) != len(req):
+        return None
+    return cols
+
+@budget_cache("layout")
+def detect_workbook_layout(_book: WorkbookSession, fp=None) -> WorkbookLayout:
+    """
+    识别工作簿里各 sheet 的角色、表头行与实际列名。
+    只读 workbook.xml 清单和每个 sheet 前 LAYOUT_HEAD_ROWS 行，不做完整解析。
+    """
+    t0 = time.perf_counter()
+    zf = _book.zip() if _book.source is not None else None
+    manifest = _xlsx_manifest(zf) if zf is not None else []
+    rd = _book.stream_reader() if zf is not None else None
+    heads, n_rows = {}, {}
+    for name, sf in _book.sheet_files.items():
+        heads[name], n_rows[name] = sf.head(LAYOUT_HEAD_ROWS)
+    for name, _ in manifest:
+        if name in heads:
+            continue   # 以导出文件为准
+        try:
+            if rd is None:
+                raise ValueError("no stream reader")
+            heads[name], n_rows[name] = rd.head(name, LAYOUT_HEAD_ROWS)
+        except KeyError:
+            heads[name], n_rows[name] = {}, None
+        except (ValueError, IndexError, ET.ParseError):
+            # 非常规写法（如单元格缺 r= 坐标），同 WorkbookSession.raw 退回 openpyxl 读开头几行
+            df = _book.excel().parse(sheet_name=name, header=None, nrows=LAYOUT_HEAD_ROWS)
+            heads[name] = {i: {j: v for j, v in enumerate(r) if not pd.isna(v)} for i, r in enumerate(df.values.tolist())}
+            n_rows[name] = None
+
+    roles: Dict[str, List[SheetLayout]] = {}
+    sheet_names = [name for name, _ in manifest] + [n for n in _book.sheet_files if n not in dict(manifest)]
+    for role, spec in ROLE_SPECS.items():
+        if spec["sheet"] is not None:
+            # 固定角色：按 sheet 名（精确，其次去空格）定位；优先默认表头行，否则在前几行里找
+            sheet = spec["sheet"] if spec["sheet"] in heads else next(
+                (n for n in sheet_names if _clean(n) == _clean(spec["sheet"])), None)
+            if sheet is None:
+                continue
+            rows = heads[sheet]
+            order = [spec["header_row"]] + [r for r in sorted(rows) if r != spec["header_row"]]
+            hit = next(((r, cols) for r in order if (cols := _row_layout(role, rows.get(r, {}))) is not None), None)
+            if hit is None:
+                header_row = spec["header_row"]
+                cells = rows.get(header_row, {})
+                hit = (header_row, resolve_cols([cells[k] for k in sorted(cells)], role))
+            roles[role] = [SheetLayout(role, sheet, hit[0], hit[1], n_rows.get(sheet))]
+        else:
+            for sheet in sheet_names:
+                rows = heads[sheet]
+                hit = next(((r, cols) for r in sorted(rows) if (cols := _row_layout(role, rows[r])) is not None), None)
+                if hit is not None:
+                    roles.setdefault(role, []).append(SheetLayout(role, sheet, hit[0], hit[1], n_rows.get(sheet)))
+
+    _book.timings["(表头探测)"] = time.perf_counter() - t0
+    return WorkbookLayout(sheet_names=sheet_names, roles=roles, n_rows=n_rows)
+
+@budget_cache("sheet_refs")
+def sheet_string_refs(_book: WorkbookSession, part: str, fp=None) -> np.ndarray:
+    """
+    一张 sheet 引用到的共享字符串下标（升序去重）。只与该 sheet 的 XML 有关，
+    按其 zip 条目的 CRC 缓存：共享字符串表变了、而这张表没变时不用重新扫描。
+    """
+    refs, tail = set(), b""
+    with _book.zip().open(part) as fh:
+        while True:
+            block = fh.read(XLSX_READ_BLOCK)
+            buf = tail + block
+            # 在最后一个行边界处切开，共享字符串单元格不会被块边界截断
+            k = buf.rfind(b"row>")
+            cut = len(buf) if not block else k + 4 if k >= 0 else 0
+            refs.update(map(int, _SST_REF_RE.findall(buf, 0, cut)))
+            tail = buf[cut:]
+            if not block:
+                break
+    return np.array(sorted(refs), dtype=np.int64)
+
+@budget_cache("sheet_fps")
+def sheet_fingerprints(_book: WorkbookSession, fp=None) -> Dict[str, str]:
+    """
+    各角色的 sheet 级指纹：取 zip 目录里该 sheet XML 的 CRC32 + 长度（不解压），
+    加上它引用到的共享字符串文本、样式表（日期格式）与探测到的表头布局；按 sheet 导出的文件取其文件指纹。
+    某张表改动（含只改它自己用到的文本）只换掉它自己的指纹；无法按下标解析共享字符串时，
+    该表退回把整个 sharedStrings.xml 计入。
+    非 xlsx 或清单读取失败时返回空字典，调用方退回整文件指纹。
+    """
+    try:
+        zf = _book.zip() if _book.source is not None else None
+        manifest = dict(_xlsx_manifest(zf)) if zf is not None else {}
+        lay = _book.layout()
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile, ET.ParseError):
+        return {}
+
+    def crc(part) -> str:
+        if zf is None:
+            return "-"
+        try:
+            info = zf.getinfo(part)
+        except KeyError:
+            return "-"
+        return f"{info.CRC:08x}:{info.file_size}"
+
+    def strings(part) -> str:
+        """该 sheet 引用的共享字符串（下标 + 文本）摘要"""
+        if crc("xl/sharedStrings.xml") == "-":
+            return "-"
+        try:
+            rd = _book.xml_reader()
+            sst = rd.sst if rd is not None else None
+            refs = sheet_string_refs(_book, part, fp=crc(part)) if sst is not None else None
+            if refs is not None and (not len(refs) or refs[-1] < len(sst)):
+                h = hashlib.blake2b(digest_size=16)
+                for i in refs.tolist():
+                    h.update(f"{i}\x00{sst[i]}\x00".encode("utf-8"))
+                return h.hexdigest()
+        except (OSError, KeyError, ValueError, zipfile.BadZipFile, ET.ParseError):
+            pass
+        return "sst:" + crc("xl/sharedStrings.xml")
+
+    styles = crc("xl/styles.xml")
+    out = {}
+    for role, lays in lay.roles.items():
+        sheets = [(l.sheet, l.header_row, sorted(l.columns.items(), key=str),
+                   file_fingerprint(_book.sheet_files[l.sheet].src) if l.sheet in _book.sheet_files
+                   else (crc(manifest.get(l.sheet, "")), strings(manifest.get(l.sheet, ""))))
+                  for l in lays]
+        out[role] = "sheet:" + hashlib.blake2b(repr((role, sheets, styles)).encode("utf-8"), digest_size=16).hexdigest()
+    return out
 
-    df[mcol+"_str"] = df[mcol].apply(try_parse_date)
+# -----------------------------
+# Excel 读取
+# -----------------------------
+def _role_frame(book: WorkbookSession, role: str):
+    """按探测到的布局取角色对应的表，并解析逻辑列"""
+    lay = book.layout().get(role)
+    if lay is None:
+        raise ValueError(f"未找到工作表《{ROLE_SPECS[role]['sheet']}》")
+    df = book.frame(lay.sheet, lay.header_row, role=role)
+    return df, resolve_cols(df.columns, role)
+
+@budget_cache("annual_profit")
+@with_snapshot("annual_profit")
+def read_annual_profit(_book: WorkbookSession, fp=None) -> pd.DataFrame:
+    # 表头通常在第 3 行（前两行为标题/空行），以探测结果为准
+    df, cols = _role_frame(_book, "annual_profit")
+    mcol, sales_col, gm_col, np_col, npr_col = (cols[k] for k in ["月份", "销售额", "毛利率", "净利润", "净利率"])
 
-    # 优先用数值解析（如果不为空）
-    mask_num = df[mcol+"_num"].notna()
-    if mask_num.any():
-        s_num = pd.to_datetime(df.loc[mask_num, mcol+"_num"], unit="D", origin="1899-12-30", errors="coerce")
-        df.loc[mask_num, mcol+"_str"] = s_num.dt.to_period("M").astype(str)
+    if mcol is None or sales_col is None:
+        raise ValueError("《年度利润》缺少关键列：月份 / 销售额(营收)")
 
-    df["月份"] = df[mcol+"_str"]
+    # ---- 日期兼容：日期型 + 字符串 + Excel序列号 ----
+    df["月份"] = normalize_month_keys(df[mcol])
     df = df[df["月份"].notna()].copy()
 
     out = pd.DataFrame({"月份": df["月份"], "销售额": pd.to_numeric(df[sales_col], errors="coerce")})
@@ -363,35 +1782,83 @@ def read_annual_profit(excel_file, fp=None) -> pd.DataFrame:
     if npr_col: out["净利率"] = norm_rate_series(df[npr_col])
     return out.reset_index(drop=True)
 
-@st.cache_data(show_spinner=False)
-def read_bank_balance_cny(excel_file, fp=None) -> float:
-    if hasattr(excel_file, "seek"): excel_file.seek(0)
-    bb = pd.read_excel(excel_file, sheet_name="银行余额")
-    cny_col = pick_col(bb.columns, ["本位币(CNY)", "本位币", "cny"])
+@budget_cache("bank")
+@with_snapshot("bank", scalar_col="本位币(CNY)")
+def read_bank_balance_cny(_book: WorkbookSession, fp=None) -> float:
+    bb, cols = _role_frame(_book, "bank")
+    cny_col = cols["本位币(CNY)"]
     if cny_col is None:
         return 0.0
     bb[cny_col] = pd.to_numeric(bb[cny_col], errors="coerce").fillna(0.0)
     return float(bb[cny_col].sum())
 
-def parse_month_key(v):
-    # 支持：2025-01月 / 2025年7月 / 2025/01 / 2025-01
-    s = str(v).strip()
-    s = s.replace("年", "-").replace("月", "").replace("/", "-")
-    # 处理 "2025-01" / "2025-1"
-    import re
-    m = re.search(r"(\d{4})-(\d{1,2})", s)
-    if m:
-        y, mm = m.group(1), int(m.group(2))
-        return f"{y}-{mm:02d}"
-    # 处理 excel 序列号兜底
-    try:
-        x = float(s)
-        dt = pd.to_datetime(x, unit="D", origin="1899-12-30", errors="coerce")
-        if pd.notna(dt):
-            return dt.to_period("M").strftime("%Y-%m")
-    except:
-        pass
-    return None
+# -----------------------------
+# 工具：月份归一（向量化，只处理去重后的取值）
+# -----------------------------
+_MONTH_RE = r"(\d{4})-(\d{1,2})"
+_EXCEL_EPOCH = "1899-12-30"
+
+def normalize_month_keys(values: pd.Series, excel_serial: bool = True) -> pd.Series:
+    """
+    把日期列统一成 "YYYY-MM"，无法识别的为 None。支持：
+    - 日期/时间戳
+    - 2025年7月 / 2025年07月 / 2025/01 / 2025-01月 / 2025-01 等字符串
+    - Excel 序列号（数字或数字字符串；excel_serial=False 时不识别）
+    先对列去重（factorize），只在唯一值上做解析，再按编码映射回每一行。
+    """
+    s = values if isinstance(values, pd.Series) else pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        # 整列已是日期型（流式 / XML 后端的常见情况）：直接按年月取整，不逐值格式化
+        return pd.Series(_month_labels(s), index=s.index, dtype=object)
+    codes, uniques = pd.factorize(s)
+    # 显式 object：全是日期时 pandas 会推断成 datetime64，后面的逐值判断就要逐个装箱
+    u = pd.Series(np.asarray(uniques, dtype=object), dtype=object)
+    res = pd.Series(None, index=u.index, dtype=object)
+
+    # 1) 日期型
+    is_dt = u.map(lambda x: isinstance(x, (datetime.date, np.datetime64)))
+    if is_dt.any():
+        res[is_dt] = _month_labels(pd.to_datetime(u[is_dt], errors="coerce"))
+
+    # 2) 数字：Excel 序列号
+    is_num = u.map(lambda x: isinstance(x, (int, float, np.number)) and not isinstance(x, (bool, np.bool_)))
+    rest = ~(is_dt | is_num)
+
+    # 3) 字符串：年/月/斜杠 统一成 "-" 后取 YYYY-M(M)
+    txt = u[rest].astype(str).str.strip().str.replace("年", "-", regex=False).str.replace("月", "", regex=False).str.replace("/", "-", regex=False)
+    m = txt.str.extract(_MONTH_RE)
+    hit = m[0].notna()
+    res[hit[hit].index] = (m.loc[hit, 0] + "-" + m.loc[hit, 1].str.zfill(2)).to_numpy(dtype=object)
+
+    if excel_serial:
+        serial = pd.Series(np.nan, index=u.index)
+        serial[is_num] = pd.to_numeric(u[is_num], errors="coerce")
+        miss = hit[~hit].index
+        serial[miss] = pd.to_numeric(txt[miss], errors="coerce")
+        serial = serial.where(np.isfinite(serial))
+        if serial.notna().any():
+            dt = pd.to_datetime(serial.dropna(), unit="D", origin=_EXCEL_EPOCH, errors="coerce")
+            ok = dt.notna()
+            res[dt.index[ok]] = _month_labels(dt[ok])
+
+    res = res.where(res.notna(), None)
+    out = res.to_numpy(dtype=object).take(codes) if len(res) else np.full(len(codes), None, dtype=object)
+    out[codes < 0] = None
+    return pd.Series(out, index=s.index, dtype=object)
+
+def _month_labels(dt: pd.Series) -> np.ndarray:
+    """datetime64 列 -> "YYYY-MM"（object 数组，NaT 为 None）：先取整数期间码去重，只格式化不同的月份"""
+    per = (dt.dt.year * 12 + dt.dt.month - 1).to_numpy(dtype=np.float64, na_value=np.nan)
+    codes, uniques = pd.factorize(per)
+    labels = np.array([f"{int(p) // 12:04d}-{int(p) % 12 + 1:02d}" for p in uniques], dtype=object)
+    out = labels.take(codes) if len(labels) else np.full(len(codes), None, dtype=object)
+    out[codes < 0] = None
+    return out
+
+def month_period(key) -> int:
+    """'YYYY-MM' → 整数期间码 year*12 + month-1（相邻月份码差 1，可直接做区间比较）"""
+    y, m = str(key).split("-")[:2]
+    return int(y) * 12 + int(m) - 1
 
 def render_insight_module(title, insight_list):
     """
@@ -416,40 +1883,170 @@ def render_data_insufficient(section_name, missing_fields):
     st.warning(f"⚠️ {section_name}：数据不足，无法生成洞察")
     st.caption(f"需要补齐字段/数据源：{', '.join(missing_fields)}")
 
+# -----------------------------
+# 渠道规则表：按购货单位关键词归渠道（新增渠道只改这里）
+# -----------------------------
+@dataclass(frozen=True)
+class ChannelRule:
+    name: str                              # 渠道名（无地区限定时直接使用）
+    keywords: Tuple[str, ...]              # 购货单位包含任一关键词即命中（不区分大小写）
+    priority: int                          # 同时命中多条规则时取数值最小者
+    regions: Tuple[Tuple[Tuple[str, ...], str], ...] = ()  # 地区限定：((关键词, ...), 渠道名)，按顺序取第一个命中的
+    region_default: Optional[str] = None   # 有地区限定但都未命中时的渠道名
+
+CHANNEL_RULES: List[ChannelRule] = [
+    ChannelRule("Juvera", ("juvera",), priority=10),
+    ChannelRule("TikTok", ("tiktok",), priority=20,
+                regions=((("us",), "TikTok-US"),), region_default="TikTok-UK"),
+    ChannelRule("亚马逊", ("amazon", "亚马逊"), priority=30,
+                regions=((("us", "美国"), "亚马逊-US"),), region_default="亚马逊-UK"),
+    ChannelRule("Shopify", ("shopify",), priority=40),
+]
+CHANNEL_OTHER = "其他"
+
+class ChannelMatcher:
+    """
+    规则表编译成一个正则（前瞻分组，重叠的关键词也能全部取到），
+    只对去重后的购货单位分类，再按编码广播回每一行。
+    """
+    def __init__(self, rules: List[ChannelRule]):
+        self.rules = sorted(rules, key=lambda r: r.priority)
+        self.rank: Dict[str, int] = {}
+        for i, r in enumerate(self.rules):
+            for kw in r.keywords:
+                self.rank.setdefault(kw.lower(), i)
+        alts = "|".join(re.escape(k) for k in sorted(self.rank, key=len, reverse=True))
+        self.pattern = re.compile(f"(?=({alts}))") if alts else None
+        self.region_patterns = [
+            [(re.compile("|".join(re.escape(k.lower()) for k in kws)), label) for kws, label in r.regions]
+            for r in self.rules
+        ]
+        self.digest = hashlib.md5(repr(self.rules).encode("utf-8")).hexdigest()[:12]
+
+    def matches(self, x) -> bool:
+        return self.pattern is not None and self.pattern.search(str(x).strip().lower()) is not None
+
+    def classify(self, names: pd.Series) -> pd.Series:
+        if isinstance(names.dtype, pd.CategoricalDtype):
+            codes, uniques = names.cat.codes.to_numpy(), names.cat.categories
+        else:
+            codes, uniques = pd.factorize(names)
+        t = pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.strip().str.lower()
+        labels = np.full(len(t), CHANNEL_OTHER, dtype=object)
+        if self.pattern is not None and len(t):
+            hit = t.str.findall(self.pattern).map(lambda ks: min((self.rank[k] for k in ks), default=-1)).to_numpy()
+            for i, r in enumerate(self.rules):
+                m = hit == i
+                if not m.any():
+                    continue
+                if not r.regions:
+                    labels[m] = r.name
+                    continue
+                sub = t[m]
+                lab = np.full(len(sub), r.region_default or r.name, dtype=object)
+                todo = np.ones(len(sub), dtype=bool)
+                for pat, label in self.region_patterns[i]:
+                    got = sub.str.contains(pat).to_numpy() & todo
+                    lab[got] = label
+                    todo &= ~got
+                labels[m] = lab
+        out = labels[np.maximum(codes, 0)] if len(labels) else np.full(len(codes), CHANNEL_OTHER, dtype=object)
+        out[codes < 0] = CHANNEL_OTHER
+        return pd.Series(out, index=names.index, dtype=object)
+
+CHANNEL_MATCHER = ChannelMatcher(CHANNEL_RULES)
+
 def is_channel_token(x: str) -> bool:
-    t = str(x).strip().lower()
-    return any(k in t for k in ["tiktok", "amazon", "shopify", "juvera", "亚马逊"])
+    return CHANNEL_MATCHER.matches(x)
 
 
 def map_channel(x: str) -> str:
-    t = str(x).strip().lower()
-    if "juvera" in t: return "Juvera"
-    if "tiktok" in t: return "TikTok-US" if "us" in t else "TikTok-UK"
-    if "amazon" in t or "亚马逊" in t:
-        return "亚马逊-US" if ("us" in t or "美国" in t) else "亚马逊-UK"
-    if "shopify" in t: return "Shopify"
-    return "其他"
-
-
-@st.cache_data(show_spinner=False)
-def read_sales(excel_file, fp=None):
-    if hasattr(excel_file, "seek"): excel_file.seek(0)
-    s = pd.read_excel(excel_file, sheet_name="销售数据")
-
-    date_col = pick_col(s.columns, ["日期"])
-    # [Fix] 扩充客户列名，防止取错列导致 100% 集中度
-    b_col    = pick_col(s.columns, ["购货单位", "客户名称", "客户", "customer", "buyer", "buyer_name"])
-    prod_col = pick_col(s.columns, ["产品名称"])
-    rev_col  = pick_col(s.columns, ["销售收入", "收入", "revenue"])
-    cost_col = pick_col(s.columns, ["销售成本", "成本", "cost"])
-    margin_col = pick_col(s.columns, ["销售毛利", "毛利", "margin"])
-    rep_col  = pick_col(s.columns, ["业务员"])
-    chan_col = pick_col(s.columns, ["渠道", "channel"])
+    return CHANNEL_MATCHER.classify(pd.Series([x], dtype=object)).iloc[0]
+
+
+@budget_cache("sales")
+def read_sales(_book: WorkbookSession, fp=None, rules: str = CHANNEL_MATCHER.digest) -> pd.DataFrame:
+    # 渠道在快照之后再归类：规则变了（rules 摘要变化）只重跑这一步，不重新解析 Excel
+    return attach_channels(_read_sales_base(_book, fp))
+
+def attach_channels(base: pd.DataFrame) -> pd.DataFrame:
+    """在清洗后的销售表上按渠道规则表补“渠道”列"""
+    out = base.copy()
+    out.insert(1, "渠道", CHANNEL_MATCHER.classify(out["购货单位"]))
+    if out["业务类型"].isna().all():
+        # 没有渠道列时，业务类型沿用映射出的平台名称
+        out["业务类型"] = out["渠道"]
+    return compact_sales(out)
+
+SALES_DIMENSIONS = ["月份", "渠道", "业务类型", "购货单位", "产品名称", "业务员"]
+
+def compact_sales(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    销售事实表的紧凑形态：
+    - 维度列转为分类（int 码 + 共享字典），字典按取值排序，groupby 结果顺序与字符串一致
+    - 期间：月份的整数期间码（见 month_period），季度/区间筛选直接比较整数
+    度量列保持 float64/int64，汇总口径不变。
+    """
+    out = df.copy(deep=False)
+    for c in SALES_DIMENSIONS:
+        if c not in out.columns:
+            continue
+        col = out[c]
+        if not isinstance(col.dtype, pd.CategoricalDtype):
+            col = col.astype("category")
+        else:
+            # 已编码（流式缓冲）：只重排字典并换码，取值类型按 astype("category") 的口径重新推断
+            cats = col.cat.categories
+            order = cats.argsort()
+            remap = np.empty(len(cats), dtype=np.int32)
+            remap[order] = np.arange(len(cats), dtype=np.int32)
+            codes = col.cat.codes.to_numpy()
+            codes = np.where(codes < 0, -1, remap[np.maximum(codes, 0)] if len(cats) else -1)
+            col = pd.Series(pd.Categorical.from_codes(codes, categories=pd.Index(cats[order].tolist())), index=col.index)
+        out[c] = col
+    if "月份" in out.columns:
+        months = out["月份"].cat
+        per = np.fromiter((month_period(m) for m in months.categories), dtype=np.int32, count=len(months.categories))
+        codes = months.codes.to_numpy()
+        out["期间"] = np.where(codes < 0, -1, per[np.maximum(codes, 0)] if len(per) else -1).astype(np.int32)
+    return out
+
+def decode_dims(df: pd.DataFrame) -> pd.DataFrame:
+    """聚合结果（行数很少）把分类列解码回原始取值，图表/表格口径与未压缩时一致"""
+    for c in df.columns:
+        if isinstance(df[c].dtype, pd.CategoricalDtype):
+            df[c] = df[c].astype(df[c].cat.categories.dtype)
+    return df
+
+@with_snapshot("sales")
+def _read_sales_base(_book: WorkbookSession, fp=None) -> pd.DataFrame:
+    # 大表走流式：按块清洗、追加到紧凑列缓冲，峰值内存接近最终结果
+    lay = _book.layout().get("sales")
+    # 快照里存的也是紧凑形态（Arrow 字典列），加载后无需重新编码
+    if lay is not None and lay.n_rows and lay.n_rows >= SALES_STREAM_MIN_ROWS:
+        # 大表：优先按月分区增量导入（只重解析新增/变动的月份），条件不满足时退回流式
+        out = _read_sales_partitioned(_book, lay)
+        if out is None:
+            out = _read_sales_streaming(_book, lay)
+        return compact_sales(out)
+    s, cols = _role_frame(_book, "sales")
+    return compact_sales(_normalize_sales(s, cols))
+
+def _normalize_sales(s: pd.DataFrame, cols: Dict[str, Optional[str]]) -> pd.DataFrame:
+    """销售明细清洗（整表或流式的单块均可）：月份 / 数值列归一，渠道由 read_sales 按规则表补上"""
+    date_col = cols["日期"]
+    b_col    = cols["购货单位"]
+    prod_col = cols["产品名称"]
+    rev_col  = cols["销售收入"]
+    cost_col = cols["销售成本"]
+    margin_col = cols["销售毛利"]
+    rep_col  = cols["业务员"]
+    chan_col = cols["渠道"]
 
     if date_col is None or b_col is None or prod_col is None or rev_col is None:
         raise ValueError("《销售数据》缺少关键列：日期/购货单位/产品名称/销售收入")
 
-    s["月份"] = s[date_col].apply(parse_month_key)
+    s["月份"] = normalize_month_keys(s[date_col])
     s = s[s["月份"].notna()].copy()
 
     s[rev_col] = pd.to_numeric(s[rev_col], errors="coerce").fillna(0.0)
@@ -469,19 +2066,15 @@ def read_sales(excel_file, fp=None):
     s[prod_col] = s[prod_col].astype(str).str.strip()
     s[b_col]    = s[b_col].astype(str).str.strip()
 
-    # 渠道：映射出的平台名称
-    s["渠道_mapped"] = s[b_col].apply(map_channel)
-    
-    # 业务类型
+    # 业务类型（缺渠道列时留空，由 read_sales 用映射出的平台名称补齐）
     if chan_col:
         s["业务类型"] = s[chan_col].astype(str).str.strip()
     else:
-        s["业务类型"] = s["渠道_mapped"] 
+        s["业务类型"] = np.nan
 
     # 客户：直接输出购货单位名字
     out = pd.DataFrame({
         "月份": s["月份"],
-        "渠道": s["渠道_mapped"],
         "业务类型": s["业务类型"],
         "购货单位": s[b_col],
         "产品名称": s[prod_col],
@@ -506,23 +2099,345 @@ def read_sales(excel_file, fp=None):
 
     return out
 
-@st.cache_data(show_spinner=False)
-def read_platform_selling_exp(excel_file, fp=None) -> pd.DataFrame:
-    if hasattr(excel_file, "seek"): excel_file.seek(0)
-    pf = pd.ExcelFile(excel_file)
-    raw = pd.read_excel(excel_file, sheet_name="平台 销售费用比")
-    header = raw.iloc[0].tolist()
-    df = raw.iloc[1:].copy()
-    df.columns = header
-
-    platform_col = pick_col(df.columns, ["平台"])
-    channel_col  = pick_col(df.columns, ["渠道"])
-    sales_col    = pick_col(df.columns, ["销售收入", "营收"])
-    ads_col      = pick_col(df.columns, ["广告费(CNY)", "广告费（CNY）", "广告费cny", "广告费"])
-    ship_col     = pick_col(df.columns, ["物流费(CNY)", "物流费（CNY）", "物流费"])
-    comm_col     = pick_col(df.columns, ["佣金(CNY)", "佣金（CNY）", "佣金"])
-    disc_col     = pick_col(df.columns, ["销售折扣/补贴", "折扣/补贴", "折扣补贴"])
-    total_col    = pick_col(df.columns, ["总销售费用", "销售费用合计", "总费用"])
+SALES_STREAM_MIN_ROWS = int(os.environ.get("BOLVA_STREAM_MIN_ROWS", "200000"))  # 超过该行数的销售表走流式
+SALES_STREAM_CHUNK = 50_000
+
+class _ColumnBuffer:
+    """
+    流式追加用的紧凑列缓冲：
+    - 数值列：预分配 float64，按需倍增（各块都是整数时最终还原为 int64，与整表读取一致）
+    - 文本列：全局字典编码（int32 码 + 去重后的取值），重复字符串只存一份
+    - 类型由第一块推断；前面各块全空（推断为数值）、后面某块出现文本的列，改为字典编码后继续追加
+    """
+    def __init__(self, capacity: int):
+        self.n = 0
+        self.capacity = max(int(capacity), 1024)
+        self.num: Dict[str, np.ndarray] = {}
+        self.codes: Dict[str, np.ndarray] = {}
+        self.dicts: Dict[str, Dict[Any, int]] = {}
+        self.dtypes: Dict[str, Any] = {}
+        self.order: List[str] = []
+
+    def _reserve(self, k: int):
+        if self.n + k <= self.capacity:
+            return
+        while self.capacity < self.n + k:
+            self.capacity *= 2
+        for store in (self.num, self.codes):
+            for c, arr in store.items():
+                grown = np.empty(self.capacity, dtype=arr.dtype)
+                grown[: self.n] = arr[: self.n]
+                store[c] = grown
+
+    def append(self, chunk: pd.DataFrame):
+        if not self.order:
+            self.order = list(chunk.columns)
+            for c in self.order:
+                self.dtypes[c] = chunk[c].dtype
+                if self._numeric(chunk[c].dtype):
+                    self.num[c] = np.empty(self.capacity, dtype=np.float64)
+                else:
+                    self.codes[c] = np.empty(self.capacity, dtype=np.int32)
+                    self.dicts[c] = {}
+        k = len(chunk)
+        if k == 0:
+            return
+        for c in [c for c in self.num if not self._numeric(chunk[c].dtype)]:
+            self._promote(c)
+        self._reserve(k)
+        lo, hi = self.n, self.n + k
+        for c, arr in self.num.items():
+            if not pd.api.types.is_integer_dtype(chunk[c].dtype):
+                self.dtypes[c] = np.dtype(np.float64)
+            arr[lo:hi] = chunk[c].to_numpy(dtype=np.float64, na_value=np.nan)
+        for c, arr in self.codes.items():
+            local, uniques = pd.factorize(chunk[c])
+            d = self.dicts[c]
+            remap = np.fromiter((d.setdefault(u, len(d)) for u in uniques), dtype=np.int32, count=len(uniques))
+            arr[lo:hi] = np.where(local < 0, -1, remap[np.maximum(local, 0)] if len(remap) else -1)
+        self.n = hi
+
+    @staticmethod
+    def _numeric(dt) -> bool:
+        return pd.api.types.is_numeric_dtype(dt) and not pd.api.types.is_bool_dtype(dt)
+
+    def _promote(self, c: str):
+        """数值列 -> 字典编码：已追加的值（多为空值）按原类型编入字典"""
+        done = pd.Series(self.num.pop(c)[: self.n]).astype(self.dtypes[c])
+        local, uniques = pd.factorize(done)
+        self.dicts[c] = {u: i for i, u in enumerate(uniques)}
+        codes = np.empty(self.capacity, dtype=np.int32)
+        codes[: self.n] = local
+        self.codes[c] = codes
+        self.dtypes[c] = np.dtype(object)
+
+    def to_frame(self, categorical: bool = False) -> pd.DataFrame:
+        """categorical=True 时文本列直接以分类返回（不解码成逐行字符串）"""
+        data = {}
+        for c in self.order:
+            if c in self.num:
+                data[c] = self.num[c][: self.n].astype(self.dtypes[c], copy=False)
+            else:
+                cats = pd.Index(list(self.dicts[c].keys()), dtype=object).astype(self.dtypes[c])
+                col = pd.Series(pd.Categorical.from_codes(self.codes[c][: self.n], categories=cats))
+                data[c] = col if categorical else col.astype(self.dtypes[c])
+        return pd.DataFrame(data)
+
+def _read_sales_streaming(book: WorkbookSession, lay: SheetLayout) -> pd.DataFrame:
+    buf = _ColumnBuffer(capacity=lay.n_rows or SALES_STREAM_CHUNK)
+    cols = None
+    for chunk in book.iter_chunks(lay.sheet, lay.header_row, SALES_STREAM_CHUNK, role="sales"):
+        if cols is None:
+            cols = resolve_cols(chunk.columns, "sales")
+        buf.append(_normalize_sales(chunk, cols))
+    if cols is None:
+        raise ValueError("《销售数据》为空")
+    return buf.to_frame(categorical=True)
+
+# -----------------------------
+# 销售数据按月分区：增量导入
+# -----------------------------
+SALES_PART_DIR = os.path.join(SNAPSHOT_DIR, "_parts")
+SALES_PART_KEEP = 240      # 分区文件按最近使用保留的个数（约 20 份工作簿 × 12 个月）
+SALES_PART_LAYOUT = 2      # 分区文件结构 / 摘要口径变化时 +1
+
+_SST_CELL_RE = re.compile(rb'(t="s"[^>]*>\s*<(?:\w+:)?v>)(\d+)(?=<)')
+
+def _sales_part_path(digest: str) -> str:
+    return os.path.join(SALES_PART_DIR, f"{digest}.arrow")
+
+def _sales_parts_exist() -> bool:
+    try:
+        return any(x.endswith(".arrow") for x in os.listdir(SALES_PART_DIR))
+    except OSError:
+        return False
+
+def _sales_part_write(path: str, df: pd.DataFrame):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="uncompressed")
+    os.replace(tmp, path)
+
+def _sales_part_prune():
+    try:
+        parts = [os.path.join(SALES_PART_DIR, x) for x in os.listdir(SALES_PART_DIR) if x.endswith(".arrow")]
+        for old in sorted(parts, key=os.path.getmtime, reverse=True)[SALES_PART_KEEP:]:
+            os.remove(old)
+    except OSError:
+        pass
+
+def clear_source_snapshots(source, fp) -> int:
+    """
+    强制刷新：删掉当前数据源的列式快照（整文件指纹 + 各角色 sheet 指纹各一个目录）和销售按月分区，
+    下次取数从 Excel 重新解析。分区按内容寻址、各数据源共用，无法只挑出本数据源的，整个目录清空。
+    返回删除的快照目录数。
+    """
+    fps = {fp}
+    try:
+        with WorkbookSession(source, fp=fp) as book:
+            fps |= {book.role_fp(role) for role in ROLE_SPECS}
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile, ET.ParseError):
+        pass   # 打不开就只清整文件指纹的快照
+    removed = 0
+    for d in filter(None, map(_snapshot_dir, fps)):
+        if os.path.isdir(d):
+            shutil.rmtree(d, ignore_errors=True)
+            removed += 1
+    shutil.rmtree(SALES_PART_DIR, ignore_errors=True)
+    return removed
+
+class _SalesPartScan:
+    """
+    按月分区的摘要计算（不解析日期以外的单元格）：
+    - 月份：逐行只取日期列，同一种写法只解析一次（日期序列号按整数部分缓存）
+    - 摘要：各月按行序累计行 XML，共享字符串引用换成文本后再计入，Excel 重排 sharedStrings 不会让各月失效；
+      单元格坐标原样计入（逐格改写行号的代价与解析相当），在某月中间插入行会让其后各月重新解析
+    """
+    HASH_ROWS = 4096
+
+    def __init__(self, rd: XlsxStreamReader, header: list, cols: Dict[str, Optional[str]]):
+        self.rd = rd
+        letter = _xml_col_letter(header.index(cols["日期"])).encode("ascii")
+        self.fast_re = re.compile(rb'<c r="' + letter + rb'\d+"(?: s="(\d+)")?(?: t="(\w+)")?(?:/>|><v>(\d+)(\.\d+)?</v></c>)')
+        self.date_re = re.compile(rb'<(?:\w+:)?c\b([^>]*\br="' + letter + rb'\d+"[^>]*?)(?:/>|>(.*?)</(?:\w+:)?c>)', re.S)
+        self.salt = repr((SNAPSHOT_VERSION, SALES_PART_LAYOUT, header, cols, rd.styles_token,
+                          hashlib.md5(_normalize_sales.__code__.co_code).hexdigest())).encode("utf-8")
+        self.month_of: Dict[Any, Optional[str]] = {None: None}
+        self.hashers: Dict[str, Any] = {}
+        self.counts: Dict[str, int] = {}
+        self._sst: Optional[List[bytes]] = None
+
+    def months(self, batch: List[tuple]) -> List[Optional[str]]:
+        keys, todo = [], {}
+        fast_re, known = self.fast_re, self.month_of
+        for _, inner in batch:
+            c = fast_re.search(inner)
+            if c is not None and not (c.group(4) or b"").startswith(b".9999999"):
+                # 序列号的年月只取决于整数部分（小数进位到次日的极端值除外，走下面的逐格路径）
+                key = c.group(1, 2, 3)
+            else:
+                c = self.date_re.search(inner)
+                key = (_ATTR_R_RE.sub(b"", c.group(1)), c.group(2)) if c else None
+            keys.append(key)
+            if key not in known and key not in todo:
+                c = self.date_re.search(inner)
+                todo[key] = self.rd.cell(c.group(1), c.group(2))
+        if todo:
+            known.update(zip(todo, normalize_month_keys(pd.Series(list(todo.values()), dtype=object)).tolist()))
+        return [known[k] for k in keys]
+
+    def canonical(self, inners: List[bytes]) -> bytes:
+        """一组行 -> 摘要用的规范字节（每行以换行结尾，摘要与分批方式无关）"""
+        if self._sst is None:
+            self._sst = [html.escape(x, quote=False).encode("utf-8") for x in self.rd.sst]
+        parts = _SST_CELL_RE.split(b"\n".join(inners) + b"\n")
+        sst = self._sst
+        parts[2::3] = [sst[int(i)] for i in parts[2::3]]
+        return b"".join(parts)
+
+    def update(self, batch: List[tuple]) -> List[Optional[str]]:
+        """一批 (行号, 行内 XML)：定月份并累计各月摘要，返回每行的月份（无法识别为 None）"""
+        months = self.months(batch)
+        groups: Dict[str, List[bytes]] = {}
+        for (_, inner), m in zip(batch, months):
+            if m is not None:
+                groups.setdefault(m, []).append(inner)
+        for m, inners in groups.items():
+            h = self.hashers.setdefault(m, hashlib.blake2b(self.salt, digest_size=16))
+            for i in range(0, len(inners), self.HASH_ROWS):   # 分段规范化，控制临时内存
+                h.update(self.canonical(inners[i:i + self.HASH_ROWS]))
+            self.counts[m] = self.counts.get(m, 0) + len(inners)
+        return months
+
+    def digests(self) -> Dict[str, str]:
+        return {m: h.hexdigest() for m, h in self.hashers.items()}
+
+def _batched(rows, n: int):
+    batch = []
+    for item in rows:
+        batch.append(item)
+        if len(batch) >= n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _read_sales_partitioned(book: WorkbookSession, lay: SheetLayout) -> Optional[pd.DataFrame]:
+    """
+    销售数据按月分区增量导入，分区文件以该月内容摘要命名（内容寻址，见 _SalesPartScan）。
+    - 分区目录为空（首次导入）：与流式读取相同的单遍解析，顺带累计各月摘要，读完后写出各月分区
+    - 否则第一遍只定月份、算摘要；摘要已存在的月份直接复用分区文件，第二遍只解析新增/变动月份的行，
+      按块解析，某个月的行读完就写出它的分区（不缓存整月的原始 XML）
+    返回清洗后的整表（行序与 sheet 一致）；列式存储不可用或 XML 不是常规写法时返回 None。
+    """
+    rd = book.xml_reader()
+    if feather is None or rd is None or lay.sheet in book.sheet_files:
+        return None
+    t0 = time.perf_counter()
+    try:
+        rows = rd.iter_rows(lay.sheet)
+        header = rd.header(rows, lay.header_row)
+        if not header:
+            return None
+        cols = resolve_cols(header, "sales")
+        if cols["日期"] is None:
+            return None
+        scan = _SalesPartScan(rd, header, cols)
+        os.makedirs(SALES_PART_DIR, exist_ok=True)
+
+        if not _sales_parts_exist():
+            # 首次导入：就是流式读取，只是每块原始行顺带交给 scan 累计摘要
+            rows.close()
+            buf = _ColumnBuffer(capacity=lay.n_rows or SALES_STREAM_CHUNK)
+            for chunk in rd.iter_chunks(lay.sheet, lay.header_row, SALES_STREAM_CHUNK, tap=scan.update):
+                buf.append(_normalize_sales(chunk, cols))
+            if not scan.counts:
+                return None
+            out = buf.to_frame(categorical=True)
+            month = out["月份"]
+            for m, d in scan.digests().items():
+                mask = (month == m).to_numpy()
+                if mask.sum() == scan.counts[m]:
+                    _sales_part_write(_sales_part_path(d), decode_dims(out[mask].reset_index(drop=True)))
+            book.timings[f"{lay.sheet}（分区：首次导入 {len(scan.counts)} 月）"] = time.perf_counter() - t0
+            _sales_part_prune()
+            return out
+
+        row_months: List[Optional[str]] = []
+        for batch in _batched(rows, SALES_STREAM_CHUNK):
+            row_months += scan.update(batch)
+        if not scan.counts:
+            return None
+        digests = scan.digests()
+        stale = {m for m, d in digests.items() if not os.path.exists(_sales_part_path(digests[m]))}
+
+        if stale:
+            left = {m: scan.counts[m] for m in stale}
+            pending: List[tuple] = []
+            parsed: Dict[str, List[pd.DataFrame]] = {m: [] for m in stale}
+            done: List[str] = []
+
+            def flush():
+                df = _normalize_sales(rd.frame(pending, header), cols)
+                for m, part in df.groupby("月份", sort=False):
+                    parsed[m].append(part)
+                pending.clear()
+                for m in done:
+                    _sales_part_write(_sales_part_path(digests[m]), pd.concat(parsed.pop(m), ignore_index=True))
+                done.clear()
+
+            body = (x for x in rd.iter_rows(lay.sheet) if x[0] > lay.header_row)
+            for (r, inner), m in zip(body, row_months):
+                if m not in left:
+                    continue
+                pending.append((r, inner))
+                left[m] -= 1
+                if not left[m]:
+                    done.append(m)
+                if done or len(pending) >= SALES_STREAM_CHUNK:
+                    flush()
+            if pending or done or parsed:
+                return None   # 两遍读到的行对不上（读取期间文件被改写）
+
+        buf = _ColumnBuffer(capacity=len(row_months))
+        ordered = sorted(digests)
+        for m in ordered:
+            path = _sales_part_path(digests[m])
+            df = feather.read_table(path, memory_map=True).to_pandas()
+            if len(df) != scan.counts[m]:
+                return None
+            buf.append(df)
+            if m not in stale:
+                os.utime(path)
+        out = buf.to_frame(categorical=True)
+    except (OSError, KeyError, ValueError, IndexError, zipfile.BadZipFile, ET.ParseError):
+        return None
+    _sales_part_prune()
+
+    # 分区按月份顺序拼接；sheet 不是按日期排序时，按第一遍记下的各行月份还原行序
+    ix = {m: i for i, m in enumerate(ordered)}
+    codes = np.fromiter((ix[m] for m in row_months if m is not None), dtype=np.int32)
+    if len(codes) and (np.diff(codes) < 0).any():
+        order = np.argsort(codes, kind="stable")
+        inverse = np.empty_like(order)
+        inverse[order] = np.arange(len(order))
+        out = out.take(inverse).reset_index(drop=True)
+    book.timings[f"{lay.sheet}（分区：复用 {len(digests) - len(stale)} 月 / 解析 {len(stale)} 月）"] = time.perf_counter() - t0
+    return out
+
+@budget_cache("platform")
+@with_snapshot("platform")
+def read_platform_selling_exp(_book: WorkbookSession, fp=None) -> pd.DataFrame:
+    # 表头通常在第 2 行（第 1 行为标题），以探测结果为准
+    df, cols = _role_frame(_book, "platform")
+
+    platform_col = cols["平台"]
+    channel_col  = cols["渠道"]
+    sales_col    = cols["销售收入"]
+    ads_col      = cols["广告费"]
+    ship_col     = cols["物流费"]
+    comm_col     = cols["佣金"]
+    disc_col     = cols["销售折扣/补贴"]
+    total_col    = cols["总销售费用"]
 
     if platform_col is None or sales_col is None or total_col is None:
         raise ValueError("《平台 销售费用比》缺少关键列：平台 / 销售收入 / 总销售费用")
@@ -560,47 +2475,24 @@ def read_platform_selling_exp(excel_file, fp=None) -> pd.DataFrame:
 
     return out.reset_index(drop=True)
 
-import datetime
-
 def _clean(s):
     return str(s).strip().replace(" ", "").replace("\u3000", "")
 
 def _to_number(x):
     return pd.to_numeric(str(x).replace(",", "").strip(), errors="coerce")
 
-def _parse_month_key(v):
-    # 支持：2025年1月 / 2025年01月 / 2025-01 / 2025/01
-    s = str(v).strip()
-    s = s.replace("年", "-").replace("月", "").replace("/", "-")
-    m = re.search(r"(\d{4})-(\d{1,2})", s)
-    if not m:
-        return None
-    y, mm = int(m.group(1)), int(m.group(2))
-    return f"{y}-{mm:02d}"
-
-@st.cache_data(show_spinner=False)
-def read_opex(excel_file, fp=None):
+@budget_cache("opex")
+@with_snapshot("opex")
+def read_opex(_book: WorkbookSession, fp=None):
     """
     在整个Excel里自动寻找“日期+金额”表头的sheet，并读取为 月份-运营费用 数据。
     """
-    if hasattr(excel_file, "seek"): excel_file.seek(0)
-    xf = pd.ExcelFile(excel_file)
-
-    for sh in xf.sheet_names:
-        # 只看前10行（足够定位表头）
-        raw = pd.read_excel(xf, sheet_name=sh, header=None, nrows=10).fillna("")
-        # 扫描“日期/金额”所在行
-        header_row = None
-        for i in range(len(raw)):
-            row = [_clean(x) for x in raw.iloc[i].tolist()]
-            if ("日期" in row) and ("金额" in row):
-                header_row = i
-                break
-        if header_row is None:
+    # 候选 sheet 与表头行由布局探测给出（只读前几行 XML），这里只完整解析命中的 sheet
+    for lay in _book.layout().roles.get("opex", []):
+        header_row = lay.header_row
+        full = _book.raw(lay.sheet)
+        if len(full) <= header_row:
             continue
-
-        # 找到后，重新从该sheet完整读取
-        full = pd.read_excel(xf, sheet_name=sh, header=None)
         cols = [_clean(x) for x in full.iloc[header_row].tolist()]
         df = full.iloc[header_row+1:].copy()
         df.columns = cols
@@ -612,7 +2504,7 @@ def read_opex(excel_file, fp=None):
         df["金额"] = df["金额"].apply(_to_number)
         df = df[df["金额"].notna()].copy()
 
-        df["月份"] = df["日期"].apply(_parse_month_key)
+        df["月份"] = normalize_month_keys(df["日期"], excel_serial=False)
         df = df[df["月份"].notna()].copy()
 
         out = df.groupby("月份", as_index=False)["金额"].sum()
@@ -625,19 +2517,418 @@ def read_opex(excel_file, fp=None):
     # 全都没找到
     return pd.DataFrame()
 
+ROLE_LOADERS = {
+    "annual_profit": read_annual_profit,
+    "bank": read_bank_balance_cny,
+    "sales": read_sales,
+    "platform": read_platform_selling_exp,
+    "opex": read_opex,
+}
+
 # -----------------------------
-# 业务逻辑：季度筛选
+# 并行解析（可选）：进程池预热各 sheet，大销售表按行区间切分
 # -----------------------------
-def quarter_filter_month_str(df: pd.DataFrame, quarter: str, month_col: str = "月份") -> pd.DataFrame:
-    if quarter == "全年":
-        return df
-    qmap = {
-        "Q1": ["2025-01", "2025-02", "2025-03"],
-        "Q2": ["2025-04", "2025-05", "2025-06"],
-        "Q3": ["2025-07", "2025-08", "2025-09"],
-        "Q4": ["2025-10", "2025-11", "2025-12"],
-    }
-    return df[df[month_col].isin(qmap[quarter])].copy()
+PARSE_WORKERS = int(os.environ.get("BOLVA_PARSE_WORKERS", "0"))             # 0/1 = 关闭，按顺序解析
+PARSE_SPLIT_MIN_ROWS = int(os.environ.get("BOLVA_PARSE_SPLIT_ROWS", "100000"))  # 销售表每个行区间至少这么多行
+
+@st.cache_resource(show_spinner=False)
+def get_parse_pool(workers: int) -> ProcessPoolExecutor:
+    # spawn：子进程不继承 streamlit 主进程的线程与锁；入口在独立模块 parse_worker 里
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+def run_parse_task(task: dict):
+    """子进程内执行一个解析任务，返回 (结果, 耗时)；由 parse_worker.run 调用。工作簿按路径打开"""
+    if task["kind"] == "sales_rows":
+        # 销售表的一个字节区间：只读已解压 sheet XML 里属于自己的那一段，不从第一行扫起
+        t0 = time.perf_counter()
+        lo, hi, first_row = task["range"]
+        header = task["header"]
+        with zipfile.ZipFile(task["src"]) as zf, open(task["xml"], "rb") as fh:
+            rd = XlsxStreamReader(zf)
+            fh.seek(lo)
+            rows = [x for x in _xml_rows(fh, first_row, hi - lo) if x[0] > task["header_row"]]
+            out = _normalize_sales(rd.frame(rows, header), resolve_cols(header, "sales"))
+        span = f"{rows[0][0] + 1}:{rows[-1][0] + 1}" if rows else "-"
+        return out, {f"销售数据[{span}]（并行）": time.perf_counter() - t0}
+    with WorkbookSession(task["src"], fp=task["fp"]) as book:
+        # 跳过进程内的数据缓存层（结果回主进程缓存），快照照常读写
+        value = ROLE_LOADERS[task["role"]].__wrapped__(book, fp=task["role_fp"])
+        return value, {f"{k}（并行）": v for k, v in book.timings.items()}
+
+_ROW_START_RE = re.compile(rb"<(?:\w+:)?row\b([^>]*)>")
+
+def _split_sheet_xml(zf: zipfile.ZipFile, part: str, path: str, parts: int) -> Optional[List[Tuple[int, int, int]]]:
+    """
+    把 sheet XML 解压到 path，按字节大致均分成 parts 段，切点挪到最近的 </row> 之后。
+    返回 [(起始字节, 结束字节, 段内第一行的行号)]；切点后的行没有 r= 坐标（无法得知行号）时返回 None。
+    """
+    with zf.open(part) as src, open(path, "wb") as dst:
+        shutil.copyfileobj(src, dst, XLSX_READ_BLOCK)
+    size = os.path.getsize(path)
+    cuts = [(0, 0)]
+    with open(path, "rb") as fh:
+        for k in range(1, parts):
+            pos = max(k * size // parts, cuts[-1][0])
+            fh.seek(pos)
+            window = fh.read(1 << 16)
+            end = _ROW_END_RE.search(window)
+            nxt = _ROW_START_RE.search(window, end.end()) if end else None
+            if nxt is None:
+                break   # 已到 sheetData 末尾（或单行超过窗口），后面不再切
+            r = _ATTR_R_RE.search(nxt.group(1))
+            if r is None:
+                return None
+            cuts.append((pos + end.end(), int(r.group(2)) - 1))
+    ends = [c for c, _ in cuts[1:]] + [size]
+    return [(lo, hi, row) for (lo, row), hi in zip(cuts, ends)]
+
+def _sales_split_tasks(book: WorkbookSession, lay: SheetLayout, src: str, tmp: str, parts: int) -> List[dict]:
+    """大销售表按整行字节区间拆成 parts 个任务；取不到 XML 后端或无法切分时返回空列表（整表作为一个任务）"""
+    rd = book.xml_reader()
+    if rd is None:
+        return []
+    try:
+        rows = rd.iter_rows(lay.sheet)
+        header = rd.header(rows, lay.header_row)
+        rows.close()
+        xml = os.path.join(tmp, "sales.xml")
+        ranges = _split_sheet_xml(book.zip(), rd.part(lay.sheet), xml, parts) if header else None
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        logger.exception("《销售数据》按区间切分失败，整表作为一个并行任务")
+        return []
+    if not ranges or len(ranges) < 2:
+        return []
+    return [{"kind": "sales_rows", "src": src, "xml": xml, "header_row": lay.header_row, "header": header, "range": rg}
+            for rg in ranges]
+
+def prefetch_parallel(book: WorkbookSession, workers: int) -> None:
+    """
+    冷启动时把未命中缓存/快照的 sheet 分发到进程池解析，结果按原缓存键写回数据缓存，
+    随后 load_all_dashboard_data 的顺序流程全部命中缓存。
+    子进程按路径读取：上传文件先写一次临时文件；大销售表在主进程解压一次、按整行字节区间切给各进程。
+    任一任务失败记日志后跳过，留给顺序流程按原逻辑处理（包括报错提示）。
+    """
+    if _READ_ONLY.get() is not None:
+        return  # 子进程会照常写快照，只读取数时不分发
+    tmp = None
+    try:
+        cache = get_data_cache()
+        pending = {}
+        for role, loader in ROLE_LOADERS.items():
+            role_fp = book.role_fp(role)
+            key = loader.cache_key(book, fp=role_fp)
+            if key is None or cache.get(key) is not cache.MISS or snapshot_exists(role_fp, role):
+                continue
+            pending[role] = (loader, role_fp, key)
+        if not pending or book.sheet_files:
+            return  # 按 sheet 导出的文件走列投影读取，本身很快，不分发到进程池
+
+        lay = book.layout().get("sales")
+        rows = (lay.n_rows or 0) - lay.header_row - 1 if lay is not None else 0
+        n_split = min(workers, rows // PARSE_SPLIT_MIN_ROWS) if "sales" in pending else 0
+        if len(pending) < 2 and n_split < 2:
+            return
+        tmp = tempfile.mkdtemp(prefix="bolva-parse-")
+        src = book.source
+        if not isinstance(src, str):
+            src = os.path.join(tmp, "workbook.xlsx")
+            with open(src, "wb") as f:
+                f.write(book.source.getvalue())
+
+        tasks = [("sales_rows", t) for t in (_sales_split_tasks(book, lay, src, tmp, n_split) if n_split >= 2 else [])]
+        split = bool(tasks)
+        tasks += [(role, {"kind": "role", "src": src, "fp": book.fp, "role": role, "role_fp": role_fp})
+                  for role, (_, role_fp, _) in pending.items() if not (role == "sales" and split)]
+        if len(tasks) < 2:
+            return
+
+        import parse_worker
+        t0 = time.perf_counter()
+        pool = get_parse_pool(workers)
+        futures = [(name, pool.submit(parse_worker.run, task)) for name, task in tasks]
+        chunks = []
+        for name, fut in futures:
+            try:
+                value, timings = fut.result()
+            except Exception:
+                logger.exception("并行解析任务失败（%s），留给顺序解析", name)
+                if name == "sales_rows":
+                    chunks = None
+                continue
+            book.timings.update(timings)
+            if name == "sales_rows":
+                if chunks is not None:
+                    chunks.append(value)
+            else:
+                cache.put(pending[name][0].loader, pending[name][2], value)
+        if split and chunks:
+            _, sales_fp, sales_key = pending["sales"]
+            base = compact_sales(pd.concat(chunks))
+            snapshot_save(sales_fp, "sales", base)
+            cache.put("sales", sales_key, attach_channels(base))
+        book.timings[f"(并行解析 {len(tasks)} 个任务 / {workers} 进程)"] = time.perf_counter() - t0
+    except Exception:
+        logger.exception("并行预解析失败，退回顺序解析")   # 并行只是加速手段
+    finally:
+        if tmp is not None:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+# -----------------------------
+# 业务逻辑：季度筛选
+# -----------------------------
+QUARTER_MONTHS = {"Q1": (1, 2, 3), "Q2": (4, 5, 6), "Q3": (7, 8, 9), "Q4": (10, 11, 12)}
+
+def primary_year(df: pd.DataFrame, month_col: str = "月份") -> Optional[int]:
+    """表里行数最多的年份（同样多时取较晚的一年）；没有可识别的月份时为 None"""
+    if month_col == "月份" and "期间" in df.columns:
+        per = df["期间"].to_numpy()
+        ok = per >= 0
+        # 立方体每行代表多条明细，按“行数”加权
+        years = pd.Series(row_weights(df).to_numpy()[ok]).groupby(per[ok] // 12).sum()
+    elif month_col in df.columns:
+        years = pd.to_numeric(df[month_col].astype(str).str[:4], errors="coerce").dropna().astype(int).value_counts()
+    else:
+        return None
+    if years.empty:
+        return None
+    counts = years
+    return int(counts[counts == counts.max()].index.max())
+
+def quarter_filter_month_str(df: pd.DataFrame, quarter: str, month_col: str = "月份", year: Optional[int] = None) -> pd.DataFrame:
+    """按季度筛选 "YYYY-MM" 月份；year 缺省时取表里的主年份（见 primary_year）"""
+    coded = month_col == "月份" and "期间" in df.columns   # 紧凑销售表 / 上卷表（可以只有期间码）
+    if quarter == "全年" or not (coded or month_col in df.columns):
+        return df
+    if year is None:
+        year = primary_year(df, month_col)
+    months = [f"{year}-{m:02d}" for m in QUARTER_MONTHS[quarter]] if year is not None else []
+    if coded:
+        # 紧凑销售表：按整数期间码筛选
+        return df[df["期间"].isin([month_period(m) for m in months])].copy()
+    return df[df[month_col].isin(months)].copy()
+
+# -----------------------------
+# 销售汇总立方体：月份 × 渠道 × 业务类型 × 客户 × 产品 × 业务员
+# -----------------------------
+CUBE_MEASURES = ["销售收入", "销售毛利", "销售成本"]
+
+def sales_cube_frame(sales: pd.DataFrame) -> pd.DataFrame:
+    """
+    销售事实表 -> 按全部维度（含期间）汇总的立方体，列结构与紧凑销售表相同，另加“行数”。
+    - 维度保持分类类型、保留空值组，上卷后的合计与直接汇总明细一致
+    - 度量按 min_count=1 汇总：整组缺失（如无毛利列）时仍为 NaN，口径不变
+    """
+    keys = [c for c in SALES_DIMENSIONS + ["期间"] if c in sales.columns]
+    measures = [c for c in CUBE_MEASURES if c in sales.columns]
+    g = sales.groupby(keys, observed=True, dropna=False, sort=True)
+    out = g[measures].sum(min_count=1)
+    out["行数"] = g.size().astype(np.int64)
+    return out.reset_index()
+
+@budget_cache("sales_cube")
+def sales_cube(_book: WorkbookSession, fp=None, rules: str = CHANNEL_MATCHER.digest) -> pd.DataFrame:
+    """一份数据源的销售立方体，按销售 sheet 的指纹（及渠道规则摘要）缓存，切换筛选只做上卷"""
+    return sales_cube_frame(read_sales(_book, fp=fp, rules=rules))
+
+# 看板各视图用到的小型上卷表：(维度, 是否按季度)。客户数大，客户表按季度汇总（期间记为季度首月）
+ROLLUP_KEYS: Dict[str, Tuple[List[str], bool]] = {
+    "channel": (["月份", "渠道", "业务类型"], False),    # 渠道趋势、区间合计、B2B/B2C
+    "customer": (["购货单位", "渠道", "业务类型"], True),  # 客户分析（CustomerAnalytics）
+    "product": (["月份", "产品名称", "渠道"], False),    # Top 产品
+    "rep": (["月份", "业务员"], False),                  # 业务员
+}
+
+class SalesRollups(NamedTuple):
+    """
+    由销售立方体一次上卷出的几张小表（每张都带“期间”“行数”，可直接按季度筛选、按行数加权）。
+    立方体按全部维度汇总，行数接近明细；侧边栏切换只在这几张表上筛选 / 汇总。
+    """
+    channel: pd.DataFrame
+    customer: pd.DataFrame
+    product: pd.DataFrame
+    rep: pd.DataFrame
+
+    @property
+    def empty(self) -> bool:
+        return self.channel.empty
+
+    def slice(self, quarter: str, year: Optional[int]) -> "SalesRollups":
+        """各表按同一季度筛选"""
+        return SalesRollups(*(quarter_filter_month_str(x, quarter, "月份", year=year) for x in self))
+
+def sales_rollups_frame(cube: pd.DataFrame) -> SalesRollups:
+    """立方体 -> SalesRollups（与立方体同样保留空值组、度量按 min_count=1 汇总，合计口径不变）"""
+    measures = [c for c in CUBE_MEASURES if c in cube.columns]
+    per = cube["期间"].to_numpy()
+    quarterly = np.where(per >= 0, per - per % 3, per).astype(np.int32)
+    out = {}
+    for name, (keys, by_quarter) in ROLLUP_KEYS.items():
+        keys = [c for c in keys if c in cube.columns]
+        d = cube.assign(期间=quarterly) if by_quarter else cube
+        g = d.groupby(keys + ["期间"], observed=True, dropna=False, sort=True)
+        r = g[measures].sum(min_count=1)
+        r["行数"] = g["行数"].sum()
+        out[name] = r.reset_index()
+    return SalesRollups(**out)
+
+@budget_cache("sales_rollups")
+def sales_rollups(_book: WorkbookSession, fp=None, rules: str = CHANNEL_MATCHER.digest) -> SalesRollups:
+    """看板读取的销售数据：按销售 sheet 的指纹缓存上卷表（立方体本身也照常缓存，供多年度对比使用）"""
+    return sales_rollups_frame(sales_cube(_book, fp=fp, rules=rules))
+
+def row_weights(df: pd.DataFrame) -> pd.Series:
+    """每行代表的明细行数：立方体取“行数”，明细表每行计 1"""
+    if "行数" in df.columns:
+        return df["行数"]
+    return pd.Series(1, index=df.index, dtype=np.int64)
+
+def dominant_value(df: pd.DataFrame, key: str, col: str) -> pd.Series:
+    """
+    每个 key 下出现次数最多的 col 取值（按明细行数计，空值不计；并列取排序靠前者），
+    与对明细逐组 x.mode()[0] 的口径一致
+    """
+    n = df[[key, col]].assign(_n=row_weights(df)).groupby([key, col], observed=True)["_n"].sum()
+    n = n[n > 0].reset_index()
+    n = n.sort_values("_n", ascending=False, kind="stable").drop_duplicates(key)
+    n = decode_dims(n)
+    return n.set_index(key)[col]
+
+# -----------------------------
+# 多年度对比：按月对齐的同比 / 环比
+# -----------------------------
+COMPARE_DIMENSIONS = ["渠道", "产品名称", "购货单位", "业务员"]
+COMPARE_METRICS = ["销售收入", "销售毛利"]
+COMPARE_ALL = "全部"
+
+def month_store_frame(sales: pd.DataFrame) -> pd.DataFrame:
+    """销售事实表 -> 按 (维度, 取值, 期间) 汇总的长表（维度“全部”为整体合计）"""
+    s = sales[sales["期间"] >= 0]
+    parts = [s.groupby("期间")[COMPARE_METRICS].sum(min_count=1).reset_index().assign(维度=COMPARE_ALL, 取值=COMPARE_ALL)]
+    for dim in COMPARE_DIMENSIONS:
+        if dim not in s.columns:
+            continue
+        g = decode_dims(s.groupby([dim, "期间"], observed=True)[COMPARE_METRICS].sum(min_count=1).reset_index())
+        parts.append(g.rename(columns={dim: "取值"}).assign(维度=dim))
+    out = pd.concat(parts, ignore_index=True)
+    out["取值"] = out["取值"].astype(str)
+    return out[["维度", "取值", "期间"] + COMPARE_METRICS]
+
+@budget_cache("month_store")
+def sales_month_store(_book: WorkbookSession, fp=None, rules: str = CHANNEL_MATCHER.digest) -> pd.DataFrame:
+    """
+    一份数据源的月度汇总（多年度对比的存储单元），按该数据源销售 sheet 的指纹缓存：
+    加入新的年份只汇总新数据源，往年直接命中缓存，不重新解析。
+    """
+    return month_store_frame(sales_cube(_book, fp=fp, rules=rules))
+
+def load_month_store(sources: List[Any]) -> pd.DataFrame:
+    """
+    多个年度数据源 -> 一张按月份索引的汇总表。各数据源按主年份排序后合并，
+    同一 (维度, 取值, 期间) 在多份数据里重复出现时以较新年份的数据源为准。
+    """
+    stores = []
+    for src in sources:
+        with WorkbookSession(src, fp=file_fingerprint(src)) as book:
+            store = sales_month_store(book, fp=book.role_fp("sales"))
+        per = store["期间"].to_numpy()
+        stores.append((pd.Series(per // 12).mode().max() if len(per) else 0, store))
+    if not stores:
+        return pd.DataFrame(columns=["维度", "取值", "期间"] + COMPARE_METRICS)
+    merged = pd.concat([x for _, x in sorted(stores, key=lambda x: x[0])], ignore_index=True)
+    return merged.drop_duplicates(["维度", "取值", "期间"], keep="last").sort_values(["维度", "取值", "期间"], ignore_index=True)
+
+def period_deltas(store: pd.DataFrame, dim: str = COMPARE_ALL, grain: str = "month") -> pd.DataFrame:
+    """
+    同比 / 环比：把汇总表按 (取值, 期间) 与自身平移后做两次左连接——
+    上年同期（月度平移 12 个月 / 季度平移 4 个季度，即按月份或季度对齐）与上一期。
+    grain="quarter" 时先把月份汇总到季度。不重新读取任何年份的数据。
+    """
+    d = store[store["维度"] == dim]
+    if grain == "quarter":
+        key, span = d["期间"] // 12 * 4 + d["期间"] % 12 // 3, 4
+    else:
+        key, span = d["期间"], 12
+    cur = d.assign(_k=key).groupby(["取值", "_k"], as_index=False)[COMPARE_METRICS].sum(min_count=1)
+    base = cur[["取值", "_k"] + COMPARE_METRICS]
+    out = (cur.merge(base.assign(_k=base["_k"] + span).rename(columns={m: f"{m}_上年同期" for m in COMPARE_METRICS}), on=["取值", "_k"], how="left")
+              .merge(base.assign(_k=base["_k"] + 1).rename(columns={m: f"{m}_上期" for m in COMPARE_METRICS}), on=["取值", "_k"], how="left"))
+    for m in COMPARE_METRICS:
+        out[f"{m}_同比"] = safe_div(out[m] - out[f"{m}_上年同期"], out[f"{m}_上年同期"].abs())
+        out[f"{m}_环比"] = safe_div(out[m] - out[f"{m}_上期"], out[f"{m}_上期"].abs())
+    out["年"] = (out["_k"] // span).astype(int)
+    if grain == "quarter":
+        out["季度"] = (out["_k"] % span + 1).astype(int)
+        out["期间"] = out["年"].astype(str) + "Q" + out["季度"].astype(str)
+    else:
+        out["月"] = (out["_k"] % span + 1).astype(int)
+        out["期间"] = out["年"].astype(str) + "-" + out["月"].map("{:02d}".format)
+    return out.drop(columns="_k")
+
+def yoy_summary(store: pd.DataFrame, dim: str, year: int, quarter: str = "全年") -> pd.DataFrame:
+    """某年（或某季度）各取值的合计与上年同期对比：月份先按所选区间筛选，再与上年同样月份对齐汇总"""
+    months = QUARTER_MONTHS.get(quarter, tuple(range(1, 13)))
+    d = store[store["维度"] == dim]
+    d = d[(d["期间"] % 12 + 1).isin(months)]
+    cur = d[d["期间"] // 12 == year].groupby("取值")[COMPARE_METRICS].sum(min_count=1)
+    prev = d[d["期间"] // 12 == year - 1].groupby("取值")[COMPARE_METRICS].sum(min_count=1)
+    out = cur.join(prev, how="outer", rsuffix="_上年同期")
+    for m in COMPARE_METRICS:
+        out[f"{m}_同比"] = safe_div(out[m] - out[f"{m}_上年同期"], out[f"{m}_上年同期"].abs())
+    return out.sort_values("销售收入", ascending=False).reset_index()
+
+@traced("figure")
+def yoy_trend_chart(d: pd.DataFrame, grain: str) -> go.Figure:
+    """各年一条线，横轴为月份（或季度），同一月份上下对齐"""
+    x = "季度" if grain == "quarter" else "月"
+    m = d.assign(营收_M=d["销售收入"] / 1_000_000.0, 年份=d["年"].astype(str))
+    fig = px.line(m, x=x, y="营收_M", color="年份", markers=True, template=TEMPLATE,
+                  title=f"销售收入｜各年按{'季度' if grain == 'quarter' else '月份'}对齐",
+                  custom_data=["期间", "销售收入_同比"])
+    fig.update_traces(hovertemplate="%{customdata[0]}<br>营收：¥%{y:,.2f}M<br>同比：%{customdata[1]:+.1%}<extra></extra>")
+    fig.update_layout(height=360)
+    fig.update_xaxes(dtick=1)
+    fig.update_yaxes(title_text="营收（M CNY）")
+    return apply_plot_style(fig)
+
+@st.fragment
+@traced("panel")
+def render_yoy_panel(sources: List[Any], quarter: str, year: Optional[int]):
+    """多年度同比 / 环比面板：当前数据源 + 往年数据源，各自按指纹缓存；切换维度 / 粒度只重跑本面板"""
+    try:
+        store = load_month_store(sources)
+    except Exception as e:
+        st.warning(f"读取往年数据失败：{e}（同比分析不可用）")
+        return
+    st.markdown('<div class="panel">', unsafe_allow_html=True)
+    st.subheader(f"多年度对比｜同比 / 环比（{quarter}）")
+    c1, c2 = st.columns([1, 1])
+    dim = c1.selectbox("对比维度", [COMPARE_ALL] + COMPARE_DIMENSIONS, key="yoy_dim")
+    grain = "quarter" if c2.radio("粒度", ["月", "季度"], horizontal=True, key="yoy_grain") == "季度" else "month"
+
+    @lru_cache(maxsize=None)
+    def total():
+        return period_deltas(store, COMPARE_ALL, grain)
+
+    # 趋势图按（各数据源指纹, 粒度, 维度, 指标, 区间）缓存；任一数据源指纹不可靠时不缓存
+    fps = tuple(file_fingerprint(src) for src in sources)
+    fig_fp = None if any(f in ("none", "unknown") for f in fps) else fps
+    st.plotly_chart(cached_figure(fig_fp, ("yoy_trend", grain, COMPARE_ALL, "销售收入", quarter), lambda: yoy_trend_chart(total(), grain)),
+                    use_container_width=True)
+
+    if dim == COMPARE_ALL:
+        t = total()
+        t = t[t["年"] == year] if year is not None else t
+        if quarter != "全年":
+            t = t[t["季度"] == int(quarter[1])] if grain == "quarter" else t[t["月"].isin(QUARTER_MONTHS[quarter])]
+        cols = ["期间", "销售收入", "销售收入_上年同期", "销售收入_同比", "销售收入_环比", "销售毛利", "销售毛利_同比"]
+    else:
+        t = yoy_summary(store, dim, year, quarter).head(20) if year is not None else pd.DataFrame()
+        cols = ["取值", "销售收入", "销售收入_上年同期", "销售收入_同比", "销售毛利", "销售毛利_同比"]
+    view = t.reindex(columns=cols).rename(columns={"取值": dim})
+    render_table(view, money=[c for c in cols if c.startswith(("销售收入", "销售毛利")) and not c.endswith(("_同比", "_环比"))],
+                 signed_percent=[c for c in cols if c.endswith(("_同比", "_环比"))], key="yoy_table", hide_index=True, height=320)
+    st.caption("口径：各年数据按月份（季度）对齐后做同比；环比为相邻月份（季度）。往年数据在侧边栏“往年数据”中添加。")
+    st.markdown("</div>", unsafe_allow_html=True)
 
 # -----------------------------
 # 组件：KPI 卡
@@ -658,6 +2949,87 @@ def kpi_card(label, value, yoy_text="", icon="◼", help_text=""):
         unsafe_allow_html=True
     )
 
+# -----------------------------
+# 组件：数据表（数值列保持原始类型，格式交给前端；大表服务端分页）
+# -----------------------------
+TABLE_PAGE_ROWS = int(os.environ.get("BOLVA_TABLE_PAGE_ROWS", "200"))
+MONEY_FMT = "¥%,.2f"
+MILLION_FMT = "¥%,.2fM"
+PCT_FMT = "%.1f%%"
+SIGNED_PCT_FMT = "%+.1f%%"
+
+TABLE_ORIGINAL_ORDER = "原始顺序"
+
+def table_page(df: pd.DataFrame, page: int, page_rows: int, sort_by: Optional[str] = None, descending: bool = True) -> pd.DataFrame:
+    """整表按 sort_by 排序（数值列按数值，空值排最后；None 保持原顺序）后取第 page 页（1 起算）"""
+    if sort_by is not None and sort_by in df.columns:
+        df = df.sort_values(sort_by, ascending=not descending, kind="stable", na_position="last")
+    return df.iloc[(page - 1) * page_rows:page * page_rows]
+
+def render_table(df: pd.DataFrame, money=(), millions=(), percent=(), signed_percent=(), ratio=(),
+                 page_rows: int = TABLE_PAGE_ROWS, key: Optional[str] = None, **kwargs):
+    """
+    st.dataframe 的统一入口：不再逐格转成字符串，只声明列格式（¥ 千分位 / M / %），
+    浏览器端按数值排序。percent / signed_percent 传入比例（0.123），这里整列 ×100 后显示为 12.3%。
+    超过 page_rows 行时只把当前页发给前端，页码控件用 key 区分；此时浏览器里点表头只能排当前页，
+    所以另给排序列 / 方向控件，在服务端对整表排序后再分页。
+    """
+    view = df
+    if len(df) > page_rows:
+        pages = -(-len(df) // page_rows)
+        k = (lambda name: f"{key}_{name}") if key else (lambda name: None)
+        c1, c2, c3 = st.columns([2, 1, 2])
+        with c1:
+            sort_by = st.selectbox("排序列（整表）", [TABLE_ORIGINAL_ORDER] + list(df.columns), key=k("sort"))
+        with c2:
+            descending = st.radio("方向", ["降序", "升序"], horizontal=True, key=k("desc"),
+                                  disabled=sort_by == TABLE_ORIGINAL_ORDER) == "降序"
+        with c3:
+            page = st.number_input(f"页码（共 {pages} 页 / {len(df):,} 行，每页 {page_rows} 行）",
+                                   min_value=1, max_value=pages, value=1, step=1, key=k("page"))
+        view = table_page(df, int(page), page_rows, None if sort_by == TABLE_ORIGINAL_ORDER else sort_by, descending)
+    view = view.copy()
+    cfg = {}
+    for cols, fmt, scale in ((money, MONEY_FMT, 1), (millions, MILLION_FMT, 1e-6), (percent, PCT_FMT, 100),
+                             (signed_percent, SIGNED_PCT_FMT, 100), (ratio, "%,.2f", 1)):
+        for c in cols:
+            if c not in view.columns:
+                continue
+            view[c] = pd.to_numeric(view[c], errors="coerce").astype(float) * scale
+            cfg[c] = st.column_config.NumberColumn(c, format=fmt)
+    st.dataframe(view, column_config=cfg, use_container_width=True, **kwargs)
+
+# -----------------------------
+# 组件：性能剖析面板（瀑布图 + Chrome trace 导出）
+# -----------------------------
+TRACE_COLORS = {"run": CHARCOAL, "load": GOLD, "tab": "#b9b2a6", "panel": "#b9b2a6", "figure": "#8d7b68",
+                "compute": "#6f8f72", "insight": "#7a8fa6", "roadmap": "#a66f6f"}
+
+def trace_waterfall_chart(trace: RunTrace) -> go.Figure:
+    spans = trace.spans
+    labels = [f"{'　' * s.depth}{s.name}" + (f"（{s.args['cache']}）" if "cache" in s.args else "") for s in spans]
+    fig = go.Figure(go.Bar(
+        y=list(range(len(spans))), x=[s.dur * 1000 for s in spans], base=[s.start * 1000 for s in spans],
+        orientation="h", marker=dict(color=[TRACE_COLORS.get(s.cat, GOLD) for s in spans]),
+        customdata=[[lab.strip("　"), s.cat, s.start * 1000] for lab, s in zip(labels, spans)],
+        hovertemplate="%{customdata[0]}<br>类别：%{customdata[1]}<br>开始：%{customdata[2]:,.1f} ms<br>耗时：%{x:,.1f} ms<extra></extra>",
+    ))
+    fig.update_layout(title=f"本次刷新耗时瀑布（共 {spans[0].dur:.2f}s）", height=max(260, 22 * len(spans) + 90), showlegend=False)
+    fig.update_yaxes(tickvals=list(range(len(spans))), ticktext=labels, autorange="reversed")
+    fig.update_xaxes(title_text="毫秒（相对刷新开始）")
+    return apply_plot_style(fig)
+
+def render_trace_panel(trace: RunTrace):
+    """页面底部：本次完整刷新的阶段耗时（面板内控件的局部重跑不记录）"""
+    if not trace.spans:
+        return
+    with st.expander(f"🐞 性能剖析：本次刷新 {trace.spans[0].dur:.2f}s，{len(trace.spans) - 1} 个阶段", expanded=True):
+        st.plotly_chart(trace_waterfall_chart(trace), use_container_width=True)
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        st.download_button("导出 Chrome trace（JSON）", trace.chrome_trace(), file_name=f"bolva-trace-{stamp}.json",
+                           mime="application/json", help="用 chrome://tracing 或 ui.perfetto.dev 打开，可附到性能工单")
+        st.caption("口径：仅记录完整刷新；（hit / miss）为数据缓存或图表缓存命中情况；后台预取与文件监视不计入。")
+
 # -----------------------------
 # 图表：营收 & 净利率（双轴）+ 2026预测
 # -----------------------------
@@ -728,10 +3100,10 @@ def rev_np_forecast_chart(df_profit: pd.DataFrame, df_forecast: pd.DataFrame = N
 # -----------------------------
 # 图表：渠道趋势（按季度筛选）
 # -----------------------------
-def channel_trend_chart(sales: pd.DataFrame, channel: str, quarter: str) -> go.Figure:
-    m = sales.groupby(["月份", "渠道"], as_index=False)["销售收入"].sum()
+def channel_trend_chart(sales: pd.DataFrame, channel: str, quarter: str, year: Optional[int] = None) -> go.Figure:
+    m = decode_dims(sales.groupby(["月份", "渠道"], as_index=False, observed=True)["销售收入"].sum())
     m = m[m["渠道"] == channel].copy()
-    m = quarter_filter_month_str(m, quarter, "月份")
+    m = quarter_filter_month_str(m, quarter, "月份", year=year)
     m["营收_M"] = m["销售收入"] / 1_000_000.0
 
     fig = px.line(m, x="月份", y="营收_M", title=f"{channel}｜月度趋势（{quarter}）", markers=True, template=TEMPLATE)
@@ -748,8 +3120,9 @@ def channel_trend_chart(sales: pd.DataFrame, channel: str, quarter: str) -> go.F
 # -----------------------------
 # 产品贡献：Top8 + Others（横向条形）
 # -----------------------------
+@traced("compute")
 def top_products(sales: pd.DataFrame, topn: int = 5) -> pd.DataFrame:
-    g = sales.groupby("产品名称", as_index=False)["销售收入"].sum().sort_values("销售收入", ascending=False)
+    g = decode_dims(sales.groupby("产品名称", as_index=False, observed=True)["销售收入"].sum()).sort_values("销售收入", ascending=False)
     top = g.head(topn).copy()
     others = g.iloc[topn:]["销售收入"].sum()
     if others > 0:
@@ -778,44 +3151,61 @@ def product_bar_chart(top_df: pd.DataFrame) -> go.Figure:
 # -----------------------------
 # 客户&业务员：Top10
 # -----------------------------
-def top_customers(sales: pd.DataFrame, topn: int = 10, sort_by: str = "销售收入") -> pd.DataFrame:
-    # 1. 基础聚合
-    g = sales.groupby("购货单位", as_index=False).agg({
-        "销售收入": "sum",
-        "销售毛利": "sum",
-        "业务类型": lambda x: x.mode()[0] if not x.mode().empty else "B2B"
-    })
-    
-    # 2. 计算毛利率
-    g["毛利率"] = safe_div(g["销售毛利"], g["销售收入"])
-    
-    # 3. 确定主渠道
-    def get_main_channel(cust_name):
-        c_data = sales[sales["购货单位"] == cust_name]
-        c_grp = c_data.groupby("渠道")["销售收入"].sum().sort_values(ascending=False)
-        if c_grp.empty: return "未知"
-        top_chan = c_grp.index[0]
-        top_rev = c_grp.iloc[0]
-        total_rev = c_grp.sum()
-        if total_rev > 0 and (top_rev / total_rev) < 0.6:
-            return "Multi"
-        return top_chan
-
-    g["渠道"] = g["购货单位"].apply(get_main_channel)
-    
-    # 4. 排序并取 TopN
-    g = g.sort_values(sort_by, ascending=False).head(topn).reset_index(drop=True)
+class CustomerAnalytics:
+    """
+    客户分析引擎：对一个数据切片（明细或销售立方体）只做一次 客户 × 渠道 × 业务类型 分组，
+    收入、毛利、毛利率、主业务类型、主渠道（Multi 规则）及业务类型构成都从这张小表派生。
+    """
+    MULTI_SHARE = 0.6   # 单一渠道占比低于此值记为 Multi
+
+    def __init__(self, sales: pd.DataFrame):
+        g = sales.assign(行数=row_weights(sales)).groupby(["购货单位", "渠道", "业务类型"], observed=True, dropna=False)
+        self.grid = g[["销售收入", "销售毛利", "行数"]].sum().reset_index()
+        self.total_rev = self.grid["销售收入"].sum()
+        self.total_gp = self.grid["销售毛利"].sum()
+        self.profile = self._profile()
+
+    def _profile(self) -> pd.DataFrame:
+        grid = self.grid
+        p = decode_dims(grid.groupby("购货单位", as_index=False, observed=True)[["销售收入", "销售毛利"]].sum())
+        p["业务类型"] = p["购货单位"].map(dominant_value(grid, "购货单位", "业务类型")).fillna("B2B")
+        p["毛利率"] = safe_div(p["销售毛利"], p["销售收入"])
+
+        # 主渠道：客户内收入最高的渠道；客户收入为正且该渠道占比不足 MULTI_SHARE 时记为 Multi
+        cc = decode_dims(grid.groupby(["购货单位", "渠道"], as_index=False, observed=True)["销售收入"].sum())
+        top = cc.sort_values("销售收入", ascending=False, kind="stable").drop_duplicates("购货单位").set_index("购货单位")
+        total = cc.groupby("购货单位")["销售收入"].sum().reindex(top.index)
+        multi = (total > 0) & (top["销售收入"] / total < self.MULTI_SHARE)
+        p["渠道"] = p["购货单位"].map(top["渠道"].astype(object).where(~multi, "Multi")).fillna("未知")
+        return p
+
+    def type_mix(self, names: list) -> pd.DataFrame:
+        """指定客户按业务类型拆分的收入"""
+        d = self.grid[self.grid["购货单位"].isin(names)]
+        return decode_dims(d.groupby(["购货单位", "业务类型"], as_index=False, observed=True)["销售收入"].sum())
+
+@budget_cache("customer_analytics")
+def customer_analytics(_cust_q: pd.DataFrame, fp=None, quarter: str = "") -> CustomerAnalytics:
+    """
+    按（数据指纹, 季度）缓存的 CustomerAnalytics：客户面板每次片段重跑与后台预取共用同一个引擎，
+    不再各自重新分组。指纹不可靠时直接构建、不缓存。
+    """
+    return CustomerAnalytics(_cust_q)
+
+@traced("compute")
+def top_customers(ca: CustomerAnalytics, topn: Optional[int] = 10, sort_by: str = "销售收入") -> pd.DataFrame:
+    # 排序并取 TopN（聚合、毛利率、主渠道均由 CustomerAnalytics 一次算好）；topn=None 返回全部客户
+    g = ca.profile.sort_values(sort_by, ascending=False)
+    if topn is not None:
+        g = g.head(topn)
+    g = g.reset_index(drop=True)
     g.index = g.index + 1
     
-    # 5. 计算累计占比（基于当前 TopN 还是 全局？）
-    # 用户要求：累计占比（收入）和 累计占比（毛利）
-    total_rev_all = sales["销售收入"].sum()
-    total_gp_all = sales["销售毛利"].sum()
-    
-    g["占比(收入)"] = g["销售收入"] / total_rev_all if total_rev_all else 0.0
+    # 累计占比（收入 / 毛利）：分母为当前切片的全部客户
+    g["占比(收入)"] = g["销售收入"] / ca.total_rev if ca.total_rev else 0.0
     g["累计占比(收入)"] = g["占比(收入)"].cumsum()
     
-    g["占比(毛利)"] = g["销售毛利"] / total_gp_all if total_gp_all else 0.0
+    g["占比(毛利)"] = g["销售毛利"] / ca.total_gp if ca.total_gp else 0.0
     g["累计占比(毛利)"] = g["占比(毛利)"].cumsum()
     
     return g
@@ -849,14 +3239,9 @@ def customer_pareto_chart(cust_df: pd.DataFrame) -> go.Figure:
     fig.update_yaxes(title_text="累计占比", tickformat=".0%", secondary_y=True, range=[0, 1.1])
     return apply_plot_style(fig)
 
-def customer_efficiency_matrix(sales: pd.DataFrame, top_cust_names: list) -> go.Figure:
+def customer_efficiency_matrix(ca: CustomerAnalytics, top_cust_names: list) -> go.Figure:
     # 仅针对 Top10 客户
-    d = sales[sales["购货单位"].isin(top_cust_names)].groupby("购货单位", as_index=False).agg({
-        "销售收入": "sum",
-        "销售毛利": "sum",
-        "业务类型": lambda x: x.mode()[0] if not x.mode().empty else "B2B"
-    })
-    d["毛利率"] = safe_div(d["销售毛利"], d["销售收入"])
+    d = ca.profile[ca.profile["购货单位"].isin(top_cust_names)]
     
     fig = px.scatter(
         d, x="销售收入", y="毛利率", size="销售毛利", color="业务类型",
@@ -880,9 +3265,95 @@ def customer_efficiency_matrix(sales: pd.DataFrame, top_cust_names: list) -> go.
     )
     return apply_plot_style(fig)
 
-def customer_channel_dist_chart(sales: pd.DataFrame, top_cust_names: list) -> go.Figure:
+# 全部客户效率矩阵：WebGL 散点；客户数超过上限时，收入靠后的长尾按网格聚合成单个点
+POPULATION_POINT_LIMIT = int(os.environ.get("BOLVA_MATRIX_POINTS", "2000"))
+POPULATION_BINS = 40
+POPULATION_MARGIN_CLIP = (-1.0, 1.0)   # 极小收入客户的毛利率可能极端，纵轴按此区间截断（悬停显示实际值）
+
+def population_split(ca: CustomerAnalytics, limit: int = POPULATION_POINT_LIMIT, bins: int = POPULATION_BINS):
+    """
+    (逐个绘制的客户, 长尾客户)：按收入降序，前 limit 名逐个绘制；
+    长尾附带 log10(收入) × 毛利率 的网格坐标 bx / by 与网格编号 bin（= bx * bins + by），绘图聚合与框选回查共用。
+    """
+    p = ca.profile[ca.profile["销售收入"] > 0].sort_values("销售收入", ascending=False)
+    head, tail = p.iloc[:limit], p.iloc[limit:]
+    if tail.empty:
+        return head, tail.assign(lx=0.0, y=0.0, bx=0, by=0, bin=0)
+    lo, hi = POPULATION_MARGIN_CLIP
+    lx = np.log10(tail["销售收入"].to_numpy())
+    y = np.clip(tail["毛利率"].fillna(0.0).to_numpy(), lo, hi)
+    span = max(lx.max() - lx.min(), 1e-9)
+    bx = np.minimum(((lx - lx.min()) / span * bins).astype(int), bins - 1)
+    by = np.minimum(((y - lo) / (hi - lo) * bins).astype(int), bins - 1)
+    return head, tail.assign(lx=lx, y=y, bx=bx, by=by, bin=bx * bins + by)
+
+def customer_population_matrix(ca: CustomerAnalytics, limit: int = POPULATION_POINT_LIMIT, bins: int = POPULATION_BINS) -> go.Figure:
+    """
+    全部客户的 收入 × 毛利率（横轴对数）。收入前 limit 名逐个绘制（可悬停、框选/套索到具体客户），
+    其余按 log10(收入) × 毛利率 的 bins×bins 网格在服务端聚合，点大小表示客户数；
+    聚合点的 customdata 是网格编号，框选后由 selected_buyers 还原成其中的客户。
+    坐标用 float32 数组，序列化为紧凑的 typed array。
+    """
+    head, tail = population_split(ca, limit, bins)
+    lo, hi = POPULATION_MARGIN_CLIP
+    fig = go.Figure()
+
+    if not tail.empty:
+        g = tail.rename(columns={"销售收入": "rev", "销售毛利": "gp"})
+        g = g.groupby(["bx", "by"]).agg(n=("lx", "size"), lx=("lx", "mean"), y=("y", "mean"), rev=("rev", "sum"),
+                                        gp=("gp", "sum"), bin=("bin", "first"))
+        text = [f"长尾 {n} 个客户<br>收入合计：{fmt_money(r)}<br>加权毛利率：{gp / r:.1%}"
+                for n, r, gp in zip(g["n"], g["rev"], g["gp"])]
+        fig.add_trace(go.Scattergl(
+            x=np.power(10.0, g["lx"].to_numpy()).astype(np.float32), y=g["y"].to_numpy(np.float32),
+            customdata=g[["bin"]].to_numpy(),
+            mode="markers", name=f"长尾（{len(tail):,} 个，已聚合）", text=text,
+            marker=dict(size=np.minimum(4 + 3 * np.sqrt(g["n"].to_numpy()), 30).astype(np.float32),
+                        color="rgba(141,123,104,0.35)", line=dict(width=0)),
+            hovertemplate="%{text}<extra></extra>",
+        ))
+
+    palette = [GOLD, CHARCOAL, "#8d7b68", "#6b8fa3", "#b5656b", "#7a9a6b"]
+    for i, (kind, d) in enumerate(head.groupby("业务类型", sort=True)):
+        fig.add_trace(go.Scattergl(
+            x=d["销售收入"].to_numpy(np.float32), y=np.clip(d["毛利率"].fillna(0.0).to_numpy(np.float32), lo, hi),
+            customdata=d[["购货单位", "毛利率"]].astype(object).to_numpy(),
+            mode="markers", name=str(kind),
+            marker=dict(size=6, color=palette[i % len(palette)], opacity=0.75, line=dict(width=0)),
+            hovertemplate="%{customdata[0]}<br>收入：¥%{x:,.0f}<br>毛利率：%{customdata[1]:.1%}<extra></extra>",
+        ))
+
+    fig.update_layout(
+        title=f"全部客户效率矩阵（{len(head) + len(tail):,} 个客户，Revenue vs Margin %）", template=TEMPLATE, height=520, dragmode="lasso",
+    )
+    fig.update_xaxes(type="log", title_text="销售收入（对数）")
+    fig.update_yaxes(tickformat=".0%", title_text="毛利率", range=[lo - 0.05, hi + 0.05])
+    return apply_plot_style(fig)
+
+def selected_buyers(event, ca: Optional[CustomerAnalytics] = None, limit: int = POPULATION_POINT_LIMIT,
+                    bins: int = POPULATION_BINS) -> List[str]:
+    """
+    st.plotly_chart 选择事件 -> 选中的客户名。逐个绘制的点 customdata 为 [客户, 毛利率]；
+    长尾聚合点为 [网格编号]，按 population_split 的分箱还原成其中的全部客户（需传入绘图用的 ca / limit / bins）。
+    """
+    points = (event or {}).get("selection", {}).get("points", [])
+    names, cells = [], set()
+    for pt in points:
+        cd = pt.get("customdata")
+        if not cd:
+            continue
+        if len(cd) == 1:
+            cells.add(int(cd[0]))
+        else:
+            names.append(cd[0])
+    if cells and ca is not None:
+        _, tail = population_split(ca, limit, bins)
+        names += tail.loc[tail["bin"].isin(cells), "购货单位"].tolist()
+    return list(dict.fromkeys(names))
+
+def customer_channel_dist_chart(ca: CustomerAnalytics, top_cust_names: list) -> go.Figure:
     # Top10 客户按 业务类型 (B2B/B2C) 堆叠
-    d = sales[sales["购货单位"].isin(top_cust_names)].groupby(["购货单位", "业务类型"], as_index=False)["销售收入"].sum()
+    d = ca.type_mix(top_cust_names)
     
     fig = px.bar(
         d, x="购货单位", y="销售收入", color="业务类型",
@@ -894,13 +3365,14 @@ def customer_channel_dist_chart(sales: pd.DataFrame, top_cust_names: list) -> go
     fig.update_layout(height=450)
     return apply_plot_style(fig)
 
+@traced("compute")
 def top_salesreps(sales: pd.DataFrame, topn: int = 10) -> pd.DataFrame:
     if "业务员" not in sales.columns or sales["业务员"].isna().all():
         return pd.DataFrame()
-    g = sales.dropna(subset=["业务员"]).groupby("业务员", as_index=False).agg({
+    g = decode_dims(sales.dropna(subset=["业务员"]).groupby("业务员", as_index=False, observed=True).agg({
         "销售收入": "sum",
         "销售毛利": "sum"
-    })
+    }))
     g = g.sort_values("销售收入", ascending=False).head(topn).reset_index(drop=True)
     g.index = g.index + 1
     total = sales["销售收入"].sum()
@@ -985,6 +3457,7 @@ def platform_charts(df: pd.DataFrame) -> tuple[go.Figure, go.Figure]:
 # -----------------------------
 # 动态洞察逻辑生成器
 # -----------------------------
+@traced("insight")
 def get_revenue_trend_insights(profit_q, df_forecast, quarter, forecast_mode):
     if profit_q.empty:
         return [{"headline": "数据缺失：营收趋势无法分析", "detail": "口径：年度利润表<br>缺损字段：月份, 销售额"}]
@@ -1007,6 +3480,7 @@ def get_revenue_trend_insights(profit_q, df_forecast, quarter, forecast_mode):
         })
     return res
 
+@traced("insight")
 def get_channel_trend_insights(sales_q, channel):
     if sales_q.empty:
         return [{"headline": "数据不足", "detail": "缺损字段：销售数据/渠道"}]
@@ -1026,6 +3500,7 @@ def get_channel_trend_insights(sales_q, channel):
     })
     return res
 
+@traced("insight")
 def get_product_insights(top_products_df, total_rev):
     if top_products_df.empty: return []
     
@@ -1039,6 +3514,7 @@ def get_product_insights(top_products_df, total_rev):
     })
     return res
 
+@traced("insight")
 def get_opex_insights(opex_df):
     if opex_df.empty:
         return [{"headline": "运营费用数据欠缺", "detail": "建议补齐《运营费用》表中的“日期”与“金额”字段。"}]
@@ -1052,6 +3528,7 @@ def get_opex_insights(opex_df):
         "detail": f"**口径**：费用报表汇总（本位币 CNY）<br>**关键数字**：单月最高支出出现在 {max_m}。<br>**建议动作**：对固定支出进行常态化对标，寻找 5%-10% 的优化空间。"
     }]
 
+@traced("insight")
 def get_platform_grid_insights(df):
     if df.empty: return []
     
@@ -1069,6 +3546,7 @@ def get_platform_grid_insights(df):
         }
     ]
 
+@traced("insight")
 def get_customer_decision_insights(cust, sales_q):
     if cust.empty: return []
     
@@ -1086,6 +3564,7 @@ def get_customer_decision_insights(cust, sales_q):
         }
     ]
 
+@traced("insight")
 def get_salesrep_insights(reps_df):
     if reps_df.empty:
         return [{"headline": "业务员数据缺失", "detail": "缺损字段：销售数据/业务员。请确保原始表中存在该列。"}]
@@ -1131,6 +3610,7 @@ def _fmt_num(x: Optional[float]) -> str:
     # 金额/数量按需要自行改格式
     return f"{x:,.2f}"
 
+@traced("roadmap")
 def build_roadmap_actions(metrics: Dict[str, Any], quarter: str, channel: str, scenario: str) -> Dict[str, List[RoadmapItem]]:
     """
     metrics: 当前筛选口径下的指标字典（都从数据算出来，不要硬编码）
@@ -1582,479 +4062,514 @@ def rYG(value, green_cond, yellow_cond):
     return "🔴"
 
 # -----------------------------
-# 主程序
+# 本地文件监视：保存后后台重算，完成后整体切换
 # -----------------------------
-def main():
-    inject_css()
+WATCH_DEBOUNCE_S = 2.0   # Excel 保存会连续触发多次事件，静默这么久才算保存完成
+WATCH_POLL_S = 3.0       # 各会话轮询新版本的间隔（只跑侧边栏的小片段）
+WATCH_IDLE_S = 60.0      # 没有任何会话轮询这么久（路径已不再被选中 / 页面已关闭）就停掉监视线程
+WATCH_RETRIES = 3        # 预热出错时重试的次数，用完后直接切到新指纹，交给前台按原逻辑解析、报错
 
-    # 侧边栏：强制刷新 & 数据源
-    with st.sidebar:
-        st.markdown("## 系统控制")
-        if st.button("🔄 强制刷新取数", use_container_width=True):
-            st.cache_data.clear()
+def warm_dashboard_data(path: str, fp: str) -> None:
+    """
+    后台线程里预热一份新数据（写入数据缓存与快照）；不调用任何 st.* 界面函数。
+    预热的是前台 load_all_dashboard_data 实际读取的对象：销售数据是上卷表（明细、立方体随之写入缓存）。
+    """
+    with WorkbookSession(path, fp=fp) as book:
+        for role, loader in ROLE_LOADERS.items():
+            try:
+                (sales_rollups if role == "sales" else loader)(book, fp=book.role_fp(role))
+            except Exception:
+                pass  # 出错的表留给前台按原逻辑报错
+
+class _WorkbookEventHandler(FileSystemEventHandler):
+    def __init__(self, watcher: "WorkbookWatcher"):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_any_event(self, event):
+        paths = (getattr(event, "src_path", ""), getattr(event, "dest_path", ""))
+        if any(p and self.watcher.matches(os.path.abspath(os.fsdecode(p))) for p in paths):
+            self.watcher.touch()
+
+class WorkbookWatcher:
+    """
+    监视本地工作簿或数据目录（进程级，所有会话共享）：
+    - 监视所在目录（Excel 通过临时文件改名保存），事件按 WATCH_DEBOUNCE_S 去抖
+    - 保存完成后在后台线程预热新指纹的数据，期间各会话继续使用旧数据
+    - 预热完成才切换 fp 并递增 version（原子切换），会话轮询到新版本后重跑
+    - 记录各会话最近一次使用的时间，由 WatcherPool 停掉没人再用的监视器
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.fp = file_fingerprint(path)
+        self.version = 0
+        self.pending = False
+        self.updated_at: Optional[datetime.datetime] = None
+        self._lock = threading.Lock()
+        self._timer: Optional[threading.Timer] = None
+        self._stopped = False
+        self._failures = 0                  # 连续预热失败次数
+        self._seen: Dict[str, float] = {}   # 会话 -> 最近一次使用（time.monotonic）
+        self.is_dir = os.path.isdir(path)
+        self._observer = Observer()
+        self._observer.schedule(_WorkbookEventHandler(self), path if self.is_dir else os.path.dirname(path) or ".", recursive=False)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def matches(self, p: str) -> bool:
+        """事件路径是否涉及被监视的数据：工作簿本身，或数据目录里的 xlsx / 导出文件"""
+        if not self.is_dir:
+            return p == self.path
+        name = os.path.basename(p)
+        return os.path.dirname(p) == self.path and (name.lower().endswith(".xlsx") or sheet_file_name(name) is not None)
+
+    def current(self) -> tuple:
+        """(已完成预热的 fp, version)"""
+        with self._lock:
+            return self.fp, self.version
+
+    def seen(self, session: str):
+        with self._lock:
+            self._seen[session] = time.monotonic()
+
+    def release(self, session: str):
+        with self._lock:
+            self._seen.pop(session, None)
+
+    def idle(self, now: float) -> bool:
+        with self._lock:
+            return all(now - t > WATCH_IDLE_S for t in self._seen.values())
+
+    def stop(self):
+        """停掉 Observer 线程与未触发的去抖定时器；进行中的预热照常完成"""
+        with self._lock:
+            self._stopped = True
+            self.pending = False
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        self._observer.stop()
+
+    def touch(self):
+        with self._lock:
+            if self._stopped:
+                return
+            self.pending = True
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = threading.Timer(WATCH_DEBOUNCE_S, self._reload)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _reload(self):
+        """
+        去抖后的预热（定时器线程）。任何异常都不能让 pending 停在 True：
+        否则各会话一直按“未切换”只读缓存取数，每次重跑都重新解析却不写缓存。
+        """
+        try:
+            self._warm()
+        except Exception:
+            logger.exception("预热工作簿新版本失败：%s", self.path)
+            with self._lock:
+                self._failures += 1
+                retry = self._failures <= WATCH_RETRIES
+            if retry:
+                self.touch()   # 稍后再试
+                return
+            # 放弃预热：直接切到磁盘上的指纹，前台不再只读，按原逻辑解析并报错
+            try:
+                fp = file_fingerprint(self.path)
+            except Exception:
+                fp = "none"
+            self._adopt(fp)
+
+    def _warm(self):
+        fp = file_fingerprint(self.path)
+        if fp == "none":
+            return self._settle()  # 文件暂时不存在（改名保存的中间态），等下一次事件
+        if fp == self.current()[0]:
+            return self._settle()
+        workbook = scan_data_dir(self.path).workbook if self.is_dir else self.path
+        try:
+            if workbook is not None:
+                with zipfile.ZipFile(workbook):
+                    pass
+        except (OSError, zipfile.BadZipFile):
+            return self.touch()  # 还没写完，稍后再试
+        warm_dashboard_data(self.path, fp)
+        if file_fingerprint(self.path) != fp:
+            return self.touch()  # 预热期间又被保存，以最新一次为准
+        self._adopt(fp)
+
+    def _adopt(self, fp: str):
+        """切换到新指纹并递增 version（文件不存在时只结束等待）"""
+        with self._lock:
+            if fp != "none":
+                self.fp = fp
+                self.version += 1
+                self.updated_at = datetime.datetime.now()
+            self.pending = False
+            self._failures = 0
+
+    def _settle(self):
+        with self._lock:
+            self.pending = False
+
+class WatcherPool:
+    """
+    进程级的监视器表（所有会话共享），按路径复用 WorkbookWatcher。
+    会话换了路径时释放旧路径；某路径没有任何会话使用 / 轮询超过 WATCH_IDLE_S 就停掉并移除它的监视器。
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._watchers: Dict[str, WorkbookWatcher] = {}
+
+    def get(self, path: str, session: str) -> Optional[WorkbookWatcher]:
+        with self._lock:
+            w = self._watchers.get(path)
+            if w is None:
+                try:
+                    w = self._watchers[path] = WorkbookWatcher(path)
+                except OSError:
+                    return None
+            w.seen(session)
+            self._sweep()
+            return w
+
+    def release(self, path: str, session: str):
+        with self._lock:
+            w = self._watchers.get(path)
+            if w is not None:
+                w.release(session)
+            self._sweep()
+
+    def sweep(self):
+        with self._lock:
+            self._sweep()
+
+    def _sweep(self):
+        now = time.monotonic()
+        for path, w in list(self._watchers.items()):
+            if w.idle(now):
+                w.stop()
+                del self._watchers[path]
+
+    def paths(self) -> List[str]:
+        with self._lock:
+            return list(self._watchers)
+
+@st.cache_resource(show_spinner=False)
+def get_watcher_pool() -> WatcherPool:
+    return WatcherPool()
+
+def get_workbook_watcher(path: str, session: str) -> Optional[WorkbookWatcher]:
+    if Observer is None:
+        return None
+    return get_watcher_pool().get(path, session)
+
+def render_watch_status(watcher: WorkbookWatcher, session: str):
+    """侧边栏小片段：定时轮询监视器版本，有新数据就整页重跑（轮询同时表明本会话仍在使用该路径）"""
+    @st.fragment(run_every=WATCH_POLL_S)
+    def _poll():
+        watcher.seen(session)
+        get_watcher_pool().sweep()
+        if watcher.current()[1] != st.session_state.get("_watch_version"):
             st.rerun()
-            
-        st.markdown("---")
-        st.markdown("## 数据源")
-
-        if is_cloud():
-            # Cloud Mode
-            excel_path = None
-            upload = st.sidebar.file_uploader("📂 上传Excel数据源 (2025年全年.xlsx)", type=["xlsx"])
-            if not upload:
-                st.info("☁️ 云端模式：请上传 Excel 文件以开始分析。")
-                st.stop()
+        if watcher.pending:
+            st.caption("⏳ 检测到文件变更，后台解析中…")
+        elif watcher.updated_at is not None:
+            st.caption(f"👀 自动刷新已开启（上次更新 {watcher.updated_at:%H:%M:%S}）")
         else:
-            # Local Mode
-            # 更新为用户提供的最新确切路径
-            default_path = r"D:\财务工作\09-财务报表\2025年\季度、年度报表\2025年度报表\2025年全年.xlsx"
-            excel_path = st.sidebar.text_input("本地Excel路径（优先）", value=default_path)
-            upload = st.sidebar.file_uploader("或上传 2025年全年.xlsx", type=["xlsx"])
+            st.caption("👀 自动刷新已开启：保存 Excel 后自动更新")
+    _poll()
 
-    # 尝试读取数据
-    used = None
-    fp = None
-    
-    if is_cloud():
-        # Cloud: upload is guaranteed by st.stop() above
-        used = upload
-        if upload is not None:
-             fp = file_fingerprint(upload) # 计算 Cloud 上传文件的指纹
-    else:
-        # Local logic
-        if excel_path and os.path.exists(excel_path):
-            used = excel_path
-            fp = file_fingerprint(excel_path)
-        elif upload is not None:
-            used = upload
-            fp = file_fingerprint(upload) # 计算 Local 上传文件的指纹
-        else:
-            st.warning("未找到本地路径文件，也未上传Excel。请检查路径或上传文件。")
-            st.stop()
+# -----------------------------
+# 分页：懒加载（只计算当前分页）
+# -----------------------------
+TAB_LABELS = ["经营总览", "费用分析", "客户&业务员分析"]
+# 默认开启：切换分页时重跑并只渲染选中的分页；设为 0 恢复三个分页每次全部计算
+# 依赖 st.tabs(key=, on_change="rerun") 与 TabContainer.open；Streamlit 版本不支持时自动关闭
+LAZY_TABS = os.environ.get("BOLVA_LAZY_TABS", "1") != "0" and "on_change" in inspect.signature(st.tabs).parameters
 
-    # 统一读取
-    data = load_all_dashboard_data(used, fp=fp)
-    annual_profit = data["annual_profit"]
-    cash_cny = data["cash_cny"]
-    sales = data["sales"]
-    platform = data["platform"]
-    opex_df = data["opex_df"]
+# -----------------------------
+# 分页图表清单：名称 -> (缓存键, 构建函数)，页面渲染与后台预取共用同一份
+# -----------------------------
+FORECAST_MULTIPLIERS = {"悲观 (-10%)": 0.9, "保守 (+10%)": 1.1, "基准 (+30%)": 1.3, "进取 (+50%)": 1.5}
 
-    # 侧边栏：交互控件
-    st.sidebar.markdown("## 交互控制")
-    quarter = st.sidebar.selectbox("营收&净利率趋势（2025）查看区间", ["全年", "Q1", "Q2", "Q3", "Q4"], index=0)
-    
-    # 新增 Sidebar 输入
-    st.sidebar.markdown("---")
-    st.sidebar.markdown("### 💰 2026 预算设定")
-    
-    # 预测模式 (Existing)
-    forecast_mode = st.sidebar.radio(
-        "2026年 销售收入预测",
-        ["悲观 (-10%)", "保守 (+10%)", "基准 (+30%)", "进取 (+50%)"],
-        index=2
-    )
-    
-    st.sidebar.caption(
-        "· 悲观 (-10%): 假设营收同比下降 10%\n"
-        "· 保守 (+10%): 假设营收同比增长 10%\n"
-        "· 基准 (+30%): 假设营收同比增长 30%\n"
-        "· 进取 (+50%): 假设营收同比增长 50%"
-    )
+def add_one_year(m_str):
+    # 假设格式 YYYY-MM
+    try:
+        y, m = m_str.split("-")
+        return f"{int(y)+1}-{int(m):02d}"
+    except (AttributeError, ValueError):
+        return m_str
+
+def forecast_frame(annual_profit: pd.DataFrame, profit_q: pd.DataFrame, quarter: str, forecast_mode: str) -> Optional[pd.DataFrame]:
+    """2026 预测：当年各月销售额 × 情景倍率（保持季节性），月份 +1 年，跟随“查看区间”筛选"""
+    if forecast_mode == "不预测":
+        return None
+    rate = FORECAST_MULTIPLIERS.get(forecast_mode, 1.0)
+    # 季度视图直接基于 profit_q 生成：预测月份（+1 年）不在原表里，quarter_filter_month_str 筛选不到
+    out = (annual_profit if quarter == "全年" else profit_q)[["月份", "销售额"]].copy()
+    out["销售额"] = out["销售额"] * rate
+    out["月份"] = out["月份"].apply(add_one_year)
+    return out
 
-    # [New] Marketing Budget Input
-    st.sidebar.markdown("###### 核心渠道季度预算 (用于 Roadmap)")
-    input_budget = st.sidebar.number_input(
-        "请输入 Q1/Q2... 预算 (CNY)",
-        min_value=0.0,
-        value=0.0,
-        step=10000.0,
-        format="%.0f",
-        help="用于计算‘预算迁移执行率’。若为 0，则该指标显示数据不足。"
-    )
+def overview_figures(annual_profit, profit_q, sales, top8, quarter, channel, forecast_mode, year) -> Dict[str, tuple]:
+    return {
+        "rev_np": (("rev_np", quarter, forecast_mode),
+                   lambda: rev_np_forecast_chart(profit_q, forecast_frame(annual_profit, profit_q, quarter, forecast_mode))),
+        "channel_trend": (("channel_trend", quarter, channel),
+                          lambda: channel_trend_chart(sales.channel, channel, quarter, year=year)),
+        "top_products": (("top_products", quarter),
+                         lambda: product_bar_chart(top8).update_layout(title=f"Top8 Product Contribution ({quarter})")),
+    }
 
-    channel = st.sidebar.selectbox("核心渠道趋势", ["亚马逊-US", "TikTok-US", "Juvera", "Shopify", "其他"], index=0)
-    marketing_delta = st.sidebar.slider("营销费用率变化（预测年度利润）", -10.0, 10.0, 0.0, 0.5) / 100.0
+def platform_view(platform: pd.DataFrame, selected: str = "全部平台", sort_by: str = "总销售费用率") -> pd.DataFrame:
+    """平台面板的数据：按平台筛选、补红黄绿灯号并排序"""
+    # 兼容原有逻辑：platforms 需为列表
+    if selected == "全部平台":
+         platforms = sorted(platform["平台"].unique().tolist())
+    else:
+         platforms = [selected]
 
-    st.sidebar.caption("说明：净利润动态模拟 = 基准净利润 −（年度营收 × 营销费率变化）")
+    d = platform.copy()
+    if platforms:
+        d = d[d["平台"].isin(platforms)].copy()
 
-    # -----------------------------
-    # 动态 KPI 计算 (Top Level)
-    # -----------------------------
-    # 季度过滤
-    profit_q = quarter_filter_month_str(annual_profit, quarter, "月份")
+    # 红黄绿灯号
+    d["总费用灯"] = d["总销售费用率"].apply(lambda v: rYG(v, lambda x: x < 0.45, lambda x: 0.45 <= x <= 0.55))
+    d["ROAS灯"] = d["ROAS"].apply(lambda v: rYG(v, lambda x: x > 5, lambda x: 3 <= x <= 5))
+    d["物流灯"] = d["物流费率"].apply(lambda v: rYG(v, lambda x: x < 0.15, lambda x: 0.15 <= x <= 0.25))
 
-    # 1. 营收
-    q_rev = float(profit_q["销售额"].sum())
-    
-    # 2. 净利润 (q_np)
-    if "净利润" in profit_q.columns:
-        q_np = float(profit_q["净利润"].sum())
-    elif "净利率" in profit_q.columns:
-        q_np = (profit_q["销售额"] * profit_q["净利率"]).sum()
+    # 排序
+    if sort_by in ["ROAS", "贡献利润率"]:
+        d = d.sort_values(sort_by, ascending=False)
     else:
-        q_np = np.nan
-
-    # 3. 净利率 (基准)
-    base_margin = (q_np / q_rev) if q_rev and not np.isnan(q_np) else np.nan
-
-    # 动态模拟 (营销费率滑块)
-    dyn_np = q_np - (q_rev * marketing_delta) if not np.isnan(q_np) else np.nan
-    dyn_margin = (dyn_np / q_rev) if q_rev and not np.isnan(dyn_np) else np.nan
+        d = d.sort_values(sort_by, ascending=False)
+    return d
 
-    # -----------------------------
-    # 页面主体
-    # -----------------------------
-    # 标题
-    st.markdown(
-        f"""
-        <div class="h1">BOLVA CEO 2025 年度经营决策看板 <span class="badge">Strategic AI Console</span></div>
-        """,
-        unsafe_allow_html=True
+def platform_cost_chart(row: pd.Series, psel: str) -> go.Figure:
+    comp = pd.DataFrame({
+        "费用项":["广告费","物流费","佣金","折扣/补贴"],
+        "金额":[row["广告费"], row["物流费"], row["佣金"], row["销售折扣/补贴"]],
+    })
+    fig = px.bar(comp, x="费用项", y="金额", title=f"{psel}｜费用构成（金额）", template=TEMPLATE)
+    fig.update_traces(
+        marker_color="rgba(201,166,107,0.8)", # 珠光香槟金
+        marker_line_color="rgba(201,166,107,1)",
+        marker_line_width=1,
+        hovertemplate="费用项：%{x}<br>金额：¥%{y:,.2f}<extra></extra>"
     )
-    
-    # 顶部战略指南针
-    render_strategic_header(annual_profit, sales, platform)
+    fig.update_layout(height=300)
+    return apply_plot_style(fig)
 
-    tab1, tab2, tab3 = st.tabs(["经营总览", "费用分析", "客户&业务员分析"])
+def platform_figures(d: pd.DataFrame, selected: str, sort_by: str, psel: Optional[str] = None) -> Dict[str, tuple]:
+    figs = {"platform": (("platform", selected, sort_by), lambda: platform_charts(d))}
+    if psel is not None:
+        row = d[d["平台"] == psel].iloc[0]
+        figs["platform_cost"] = (("platform_cost", psel), lambda: platform_cost_chart(row, psel))
+    return figs
+
+def opex_trend_chart(opex_q: pd.DataFrame, quarter: str) -> go.Figure:
+    fig_opex = px.bar(opex_q, x="月份", y="运营费用", title=f"运营费用｜月度趋势 ({quarter})", template=TEMPLATE)
+    fig_opex.update_traces(marker_color="rgba(201,166,107,0.6)", hovertemplate="月份：%{x}<br>费用：¥%{y:,.2f}<extra></extra>")
+    fig_opex.update_layout(height=260, margin=dict(t=30, b=0))
+    return apply_plot_style(fig_opex)
+
+def expense_figures(platform: pd.DataFrame, opex_q: pd.DataFrame, quarter: str) -> Dict[str, tuple]:
+    """费用分析页的默认视图（全部平台、按总销售费用率排序、第一个平台的快照）"""
+    figs = {}
+    if not platform.empty:
+        d = platform_view(platform)
+        figs.update(platform_figures(d, "全部平台", "总销售费用率", d["平台"].iloc[0] if len(d) else None))
+    if not opex_q.empty:
+        figs["opex"] = (("opex", quarter), lambda: opex_trend_chart(opex_q, quarter))
+    return figs
+
+def customer_figures(sales_q: pd.DataFrame, quarter: str, sort_by: str = "销售收入", fp=None) -> Dict[str, tuple]:
+    @lru_cache(maxsize=None)
+    def top():
+        a = customer_analytics(sales_q, fp=fp, quarter=quarter)
+        return a, top_customers(a, topn=10, sort_by=sort_by)
+
+    names = lambda: top()[1]["购货单位"].tolist()
+    return {
+        "pareto": (("customer_pareto", quarter, sort_by), lambda: customer_pareto_chart(top()[1])),
+        "matrix": (("customer_matrix", quarter, sort_by), lambda: customer_efficiency_matrix(top()[0], names())),
+        "mix": (("customer_mix", quarter, sort_by), lambda: customer_channel_dist_chart(top()[0], names())),
+    }
 
-    # -------------------------
-    # Tab1：经营总览
-    # -------------------------
-    with tab1:
-        # KPI 四卡
-        c1, c2, c3, c4 = st.columns(4)
-        with c1:
-            kpi_card("REVENUE", fmt_m(q_rev/1_000_000.0), f"({quarter})", "📈", f"{quarter} 营收合计")
-        with c2:
-            delta_np_m = (dyn_np - q_np)/1_000_000.0 if not np.isnan(dyn_np) and not np.isnan(q_np) else np.nan
-            kpi_card("NET PROFIT", fmt_m(dyn_np/1_000_000.0) if not np.isnan(dyn_np) else "—",
-                     f"Δ {fmt_m(delta_np_m)}" if not np.isnan(delta_np_m) else "", "💰", "净利润动态模拟（营销费率滑块）")
-        with c3:
-            # Cash 只有当前余额，无法按季度回溯，维持原样
-            kpi_card("CASH", fmt_m(cash_cny/1_000_000.0), "(Current)", "🏦", "银行余额（当前本位币汇总）")
-        with c4:
-            kpi_card("MARGIN", fmt_pct(dyn_margin) if not np.isnan(dyn_margin) else "—",
-                     f"基准 {fmt_pct(base_margin)}" if not np.isnan(base_margin) else "", "％", f"{quarter} 净利率（动态）")
+def salesrep_bar_chart(reps: pd.DataFrame, quarter: str) -> go.Figure:
+    fig = px.bar(reps, x="业务员", y="销售收入", title=f"业务员销售额（Top10, {quarter}）", template=TEMPLATE)
+    fig.update_traces(hovertemplate="业务员：%{x}<br>销售收入：¥%{y:,.2f}<extra></extra>")
+    fig.update_layout(height=380)
+    return apply_plot_style(fig)
 
-        st.write("")
-        st.write("")
-        st.write("")
+def salesrep_figures(sales_q: pd.DataFrame, quarter: str) -> Dict[str, tuple]:
+    return {"salesreps": (("salesreps", quarter), lambda: salesrep_bar_chart(top_salesreps(sales_q, topn=10), quarter))}
 
-        # 图表布局：左（营收&毛利率 + 渠道趋势）右（Top8产品贡献 + 月度快照）
-        left, right = st.columns([1.55, 1.0])
+# -----------------------------
+# 页面片段：面板内控件只重跑所在面板（st.fragment）
+# -----------------------------
+@st.fragment
+@traced("panel")
+def render_platform_panel(platform: pd.DataFrame, fp):
+    """费用分析｜平台面板：平台筛选 / 排序 / 单平台快照只重跑本面板"""
+    if platform.empty:
+        st.info("未读取到《平台 销售费用比》，请检查工作表名称/表头列名。")
+    else:
+        st.markdown('<div class="panel">', unsafe_allow_html=True)
+        st.subheader("各平台｜年度费用指标（数据源无月份，不支持季度筛选）")
+
+        col_a, col_b, col_c = st.columns([1.4, 1.2, 1.4])
+        with col_a:
+            # 平台筛选：改为下拉单选 (Selectbox)
+            all_platforms = ["全部平台"] + sorted(platform["平台"].unique().tolist())
+            selected_platform = st.selectbox("平台筛选", all_platforms, index=0)
+        with col_b:
+            sort_by = st.selectbox("排序方式", ["总销售费用率", "ROAS", "贡献利润率"], index=0)
+        with col_c:
+            st.markdown(
+                "<span title='总费用率>55%红；45-55黄；<45绿'>ⓘ 总费用率阈值</span> ｜ "
+                "<span title='ROAS<3红；3-5黄；>5绿'>ⓘ ROAS阈值</span> ｜ "
+                "<span title='物流费率>25%红'>ⓘ 物流费率阈值</span>",
+                unsafe_allow_html=True
+            )
+
+        d = platform_view(platform, selected_platform, sort_by)
+
+        show_cols = [
+            "平台","渠道","销售收入","总销售费用","总销售费用率","ROAS","贡献利润率",
+            "广告费率","物流费率","佣金率","折扣/补贴率",
+            "总费用灯","ROAS灯","物流灯"
+        ]
+        render_table(d[show_cols], money=["销售收入","总销售费用"],
+                     percent=["总销售费用率","贡献利润率","广告费率","物流费率","佣金率","折扣/补贴率"],
+                     ratio=["ROAS"], key="platform_table", height=360)
+        st.markdown("</div>", unsafe_allow_html=True)
 
-        with left:
+        st.write("")
+        fig1, fig2 = cached_figure(fp, *platform_figures(d, selected_platform, sort_by)["platform"])
+        l, r = st.columns([1.3, 1.0])
+        with l:
             st.markdown('<div class="panel">', unsafe_allow_html=True)
-            
-            # 2026 预测数据生成 + 交互控制更新
-            df_forecast_2026 = None
-            if forecast_mode != "不预测":
-                # 简单的 multiplier
-                multipliers = {"悲观 (-10%)": 0.9, "保守 (+10%)": 1.1, "基准 (+30%)": 1.3, "进取 (+50%)": 1.5}
-                rate = multipliers.get(forecast_mode, 1.0)
-                
-                # 生成 2026 全年 (基于 2025 每月 * rate) -> 保持季节性
-                df_full_2026 = annual_profit[["月份", "销售额"]].copy()
-                df_full_2026["销售额"] = df_full_2026["销售额"] * rate
-                
-                # 月份 +1 年
-                def add_one_year(m_str):
-                    # 假设格式 YYYY-MM
-                    try:
-                        y, m = m_str.split("-")
-                        return f"{int(y)+1}-{int(m):02d}"
-                    except:
-                        return m_str
-                
-                df_full_2026["月份"] = df_full_2026["月份"].apply(add_one_year)
-                
-                # ✅ 关键交互：2026数据也跟随“查看区间”筛选
-                if quarter == "全年":
-                    df_forecast_2026 = df_full_2026
-                else:
-                    # 复用筛选函数逻辑（Q1筛选会找 2025-01..03，这里需要转换一下思路）
-                    # quarter_filter_month_str 里面用的是 hardcode 的 "2025-01"
-                    # 所以如果直接传 2026的月份进去，会筛选不到。
-                    
-                    # 修正策略：
-                    # 1. 先把 annual_profit (2025) 筛选出对应季度 profit_q
-                    # 2. 基于 profit_q 直接生成 2026 预测
-                    
-                    # 重新基于 profit_q 生成
-                    df_forecast_2026 = profit_q[["月份", "销售额"]].copy()
-                    df_forecast_2026["销售额"] = df_forecast_2026["销售额"] * rate
-                    df_forecast_2026["月份"] = df_forecast_2026["月份"].apply(add_one_year)
-
-            st.plotly_chart(rev_np_forecast_chart(profit_q, df_forecast_2026), use_container_width=True)
-            render_insight_module("营收与预测", get_revenue_trend_insights(profit_q, df_forecast_2026, quarter, forecast_mode))
+            st.plotly_chart(fig1, use_container_width=True)
+            render_insight_module("平台费用效率", get_platform_grid_insights(d))
             st.markdown("</div>", unsafe_allow_html=True)
 
             st.write("")
             st.markdown('<div class="panel">', unsafe_allow_html=True)
-            st.plotly_chart(channel_trend_chart(sales, channel, quarter), use_container_width=True)
-            sales_q = quarter_filter_month_str(sales, quarter, "月份")
-            render_insight_module("渠道趋势", get_channel_trend_insights(sales_q, channel))
+            st.plotly_chart(fig2, use_container_width=True)
+            render_insight_module("费用结构洞察", [
+                {"headline": "关注高占比物流费率", "detail": "若物流费率高于 25%，建议检查超重/超尺寸计费是否准确。"},
+                {"headline": "佣金结构对标", "detail": "对标各平台佣金政策，评估是否可以通过调整 SKU 组合降低整体扣费率。"}
+            ])
             st.markdown("</div>", unsafe_allow_html=True)
 
-        with right:
-            # [Fix] 联动 Quarter 筛选
-            Top8 = top_products(sales_q, topn=8)
-
+        with r:
             st.markdown('<div class="panel">', unsafe_allow_html=True)
-            # 动态标题
-            t_prod = f"Top8 Product Contribution ({quarter})"
-            st.plotly_chart(product_bar_chart(Top8).update_layout(title=t_prod), use_container_width=True)
-            render_insight_module("产品贡献", get_product_insights(Top8, sales_q["销售收入"].sum()))
-            st.caption("口径：销售数据按产品名称汇总（Top8 + Others）。悬停条形可查看金额。")
+            st.subheader("单个平台快照（点击ⓘ）")
+            psel = st.selectbox("选择平台", d["平台"].tolist(), index=0)
+            row = d[d["平台"] == psel].iloc[0]
+
+            m1, m2, m3 = st.columns(3)
+            with m1:
+                st.metric("总销售费用率", f"{row['总销售费用率']*100:.1f}%")
+            with m2:
+                st.metric("ROAS", f"{row['ROAS']:.2f}" if pd.notnull(row["ROAS"]) else "—")
+            with m3:
+                st.metric("贡献利润率", f"{row['贡献利润率']*100:.1f}%")
+
+            with st.popover("ⓘ 指标解释"):
+                st.write("- 总销售费用率 = 总销售费用 / 销售收入")
+                st.write("- ROAS = 销售收入 / 广告费")
+                st.write("- 贡献利润率 = (销售收入 - 总销售费用) / 销售收入（仅扣销售费用，不含COGS）")
+
+            st.plotly_chart(cached_figure(fp, *platform_figures(d, selected_platform, sort_by, psel)["platform_cost"]), use_container_width=True)
+            render_insight_module(f"{psel} 深度诊断", [
+                {"headline": "费用平衡性检查", "detail": "检查当前广告费与销量的弹性关系，若广告增长快于销量，建议降低非核心词竞价。"}
+            ])
             st.markdown("</div>", unsafe_allow_html=True)
 
-            st.write("")
-            st.markdown('<div class="panel">', unsafe_allow_html=True)
-            st.subheader("月度快照（年度利润）")
-            snap = profit_q.copy()
-            snap["销售额"] = snap["销售额"].map(lambda x: f"¥{x/1_000_000:,.2f}M")
-            if "毛利率" in snap.columns: snap["毛利率"] = snap["毛利率"].map(lambda x: f"{x*100:.1f}%" if pd.notnull(x) else "")
-            if "净利润" in snap.columns: snap["净利润"] = snap["净利润"].map(lambda x: f"¥{x/1_000_000:,.2f}M" if pd.notnull(x) else "")
-            if "净利率" in snap.columns: snap["净利率"] = snap["净利率"].map(lambda x: f"{x*100:.1f}%" if pd.notnull(x) else "")
-            st.dataframe(snap, use_container_width=True, height=280)
-            st.markdown("</div>", unsafe_allow_html=True)
+@st.fragment
+@traced("panel")
+def render_customer_panel(sales_q: pd.DataFrame, quarter: str, fp):
+    """客户经营洞察：切换 Top10 排序依据只重跑本面板"""
+    st.markdown('<div class="panel">', unsafe_allow_html=True)
+    st.subheader(f"客户经营洞察 ({quarter})")
+    # B2B / B2C 总收入汇总 (基于业务类型列)
+    b2b_rev = sales_q[sales_q["业务类型"].str.upper() == "B2B"]["销售收入"].sum()
+    b2c_rev = sales_q[sales_q["业务类型"].str.upper() == "B2C"]["销售收入"].sum()
+    
+    c_k1, c_k2, c_k3 = st.columns([1, 1, 2])
+    with c_k1:
+        kpi_card("B2B 总收入", fmt_money(b2b_rev), "", "🏢", "筛选区间内 B2B 渠道销售额总計")
+    with c_k2:
+        kpi_card("B2C 总收入", fmt_money(b2c_rev), "", "🛒", "筛选区间内 B2C 渠道销售額總計")
+    with c_k3:
+        st.write("")
 
-    # -------------------------
-    # Tab2：费用分析
-    # -------------------------
-    with tab2:
+    col_ctrl1, col_ctrl2 = st.columns([1, 2])
+    with col_ctrl1:
+        sort_by = st.radio("Top10 排序依据", ["销售收入", "销售毛利"], index=0, horizontal=True)
+    with col_ctrl2:
+        st.caption("✨ 提示：主渠道显示为 Multi 表示该客户在单一渠道占比低于 60%。")
+        show_all = st.toggle("显示全部客户（明细分页 + 全量效率矩阵）", key="cust_all")
 
-        if platform.empty:
-            st.info("未读取到《平台 销售费用比》，请检查工作表名称/表头列名。")
-        else:
-            st.markdown('<div class="panel">', unsafe_allow_html=True)
-            st.subheader("各平台｜年度费用指标（数据源无月份，不支持季度筛选）")
-
-            col_a, col_b, col_c = st.columns([1.4, 1.2, 1.4])
-            with col_a:
-                # 平台筛选：改为下拉单选 (Selectbox)
-                all_platforms = ["全部平台"] + sorted(platform["平台"].unique().tolist())
-                selected_platform = st.selectbox("平台筛选", all_platforms, index=0)
-                
-                # 兼容原有逻辑：platforms 需为列表
-                if selected_platform == "全部平台":
-                     platforms = sorted(platform["平台"].unique().tolist())
-                else:
-                     platforms = [selected_platform]
-            with col_b:
-                sort_by = st.selectbox("排序方式", ["总销售费用率", "ROAS", "贡献利润率"], index=0)
-            with col_c:
-                st.markdown(
-                    "<span title='总费用率>55%红；45-55黄；<45绿'>ⓘ 总费用率阈值</span> ｜ "
-                    "<span title='ROAS<3红；3-5黄；>5绿'>ⓘ ROAS阈值</span> ｜ "
-                    "<span title='物流费率>25%红'>ⓘ 物流费率阈值</span>",
-                    unsafe_allow_html=True
-                )
-
-            d = platform.copy()
-            if platforms:
-                d = d[d["平台"].isin(platforms)].copy()
-
-            # 红黄绿灯号
-            d["总费用灯"] = d["总销售费用率"].apply(lambda v: rYG(v, lambda x: x < 0.45, lambda x: 0.45 <= x <= 0.55))
-            d["ROAS灯"] = d["ROAS"].apply(lambda v: rYG(v, lambda x: x > 5, lambda x: 3 <= x <= 5))
-            d["物流灯"] = d["物流费率"].apply(lambda v: rYG(v, lambda x: x < 0.15, lambda x: 0.15 <= x <= 0.25))
-
-            # 排序
-            if sort_by in ["ROAS", "贡献利润率"]:
-                d = d.sort_values(sort_by, ascending=False)
-            else:
-                d = d.sort_values(sort_by, ascending=False)
-
-            show_cols = [
-                "平台","渠道","销售收入","总销售费用","总销售费用率","ROAS","贡献利润率",
-                "广告费率","物流费率","佣金率","折扣/补贴率",
-                "总费用灯","ROAS灯","物流灯"
-            ]
-            show = d[show_cols].copy()
-
-            # 格式化
-            for c in ["销售收入","总销售费用"]:
-                show[c] = show[c].map(fmt_money)
-            for c in ["总销售费用率","贡献利润率","广告费率","物流费率","佣金率","折扣/补贴率"]:
-                show[c] = show[c].map(lambda x: f"{x*100:.1f}%" if pd.notnull(x) else "")
-            show["ROAS"] = show["ROAS"].map(lambda x: f"{x:,.2f}" if pd.notnull(x) else "")
-
-            st.dataframe(show, use_container_width=True, height=360)
-            st.markdown("</div>", unsafe_allow_html=True)
-
-            st.write("")
-            fig1, fig2 = platform_charts(d)
-            l, r = st.columns([1.3, 1.0])
-            with l:
-                st.markdown('<div class="panel">', unsafe_allow_html=True)
-                st.plotly_chart(fig1, use_container_width=True)
-                render_insight_module("平台费用效率", get_platform_grid_insights(d))
-                st.markdown("</div>", unsafe_allow_html=True)
+    cust_ca = customer_analytics(sales_q, fp=fp, quarter=quarter)
+    cust = top_customers(cust_ca, topn=10, sort_by=sort_by)
 
-                st.write("")
-                st.markdown('<div class="panel">', unsafe_allow_html=True)
-                st.plotly_chart(fig2, use_container_width=True)
-                render_insight_module("费用结构洞察", [
-                    {"headline": "关注高占比物流费率", "detail": "若物流费率高于 25%，建议检查超重/超尺寸计费是否准确。"},
-                    {"headline": "佣金结构对标", "detail": "对标各平台佣金政策，评估是否可以通过调整 SKU 组合降低整体扣费率。"}
-                ])
-                st.markdown("</div>", unsafe_allow_html=True)
-
-            with r:
-                st.markdown('<div class="panel">', unsafe_allow_html=True)
-                st.subheader("单个平台快照（点击ⓘ）")
-                psel = st.selectbox("选择平台", d["平台"].tolist(), index=0)
-                row = d[d["平台"] == psel].iloc[0]
-
-                m1, m2, m3 = st.columns(3)
-                with m1:
-                    st.metric("总销售费用率", f"{row['总销售费用率']*100:.1f}%")
-                with m2:
-                    st.metric("ROAS", f"{row['ROAS']:.2f}" if pd.notnull(row["ROAS"]) else "—")
-                with m3:
-                    st.metric("贡献利润率", f"{row['贡献利润率']*100:.1f}%")
-
-                with st.popover("ⓘ 指标解释"):
-                    st.write("- 总销售费用率 = 总销售费用 / 销售收入")
-                    st.write("- ROAS = 销售收入 / 广告费")
-                    st.write("- 贡献利润率 = (销售收入 - 总销售费用) / 销售收入（仅扣销售费用，不含COGS）")
-
-                comp = pd.DataFrame({
-                    "费用项":["广告费","物流费","佣金","折扣/补贴"],
-                    "金额":[row["广告费"], row["物流费"], row["佣金"], row["销售折扣/补贴"]],
-                })
-                fig = px.bar(comp, x="费用项", y="金额", title=f"{psel}｜费用构成（金额）", template=TEMPLATE)
-                fig.update_traces(
-                    marker_color="rgba(201,166,107,0.8)", # 珠光香槟金
-                    marker_line_color="rgba(201,166,107,1)",
-                    marker_line_width=1,
-                    hovertemplate="费用项：%{x}<br>金额：¥%{y:,.2f}<extra></extra>"
-                )
-                fig.update_layout(height=300)
-                st.plotly_chart(apply_plot_style(fig), use_container_width=True)
-                render_insight_module(f"{psel} 深度诊断", [
-                    {"headline": "费用平衡性检查", "detail": "检查当前广告费与销量的弹性关系，若广告增长快于销量，建议降低非核心词竞价。"}
-                ])
-                st.markdown("</div>", unsafe_allow_html=True)
-        if opex_df.empty:
-            st.info("💡 未读取到有效的运营费用数据（请检查《运营费用》表中的“日期”与“金额”列）。")
-        else:
-            st.markdown('<div class="panel">', unsafe_allow_html=True)
-            st.subheader(f"运营费用分析 ({quarter})")
+    if cust.empty:
+        st.warning("当前筛选条件下未发现有效的销售记录。")
+    else:
+        # 明细表：默认 Top10；打开“显示全部客户”后列出全部客户（按页下发）
+        table = top_customers(cust_ca, topn=None, sort_by=sort_by) if show_all else cust
+        render_table(table[["购货单位", "业务类型", "销售收入", "销售毛利", "毛利率", "累计占比(收入)", "累计占比(毛利)"]].rename(columns={"业务类型": "渠道"}),
+                     money=["销售收入", "销售毛利"], percent=["毛利率", "累计占比(收入)", "累计占比(毛利)"], key="cust_table", height=340)
 
-            # [Fix] 联动 Quarter 筛选
-            opex_q = quarter_filter_month_str(opex_df, quarter, "月份")
-
-            # 简单 KPI
-            total_opex = opex_q["运营费用"].sum()
-            c_op1, c_op2 = st.columns([1, 3])
-            with c_op1:
-                st.metric(f"运营费用合计 ({quarter})", fmt_money(total_opex))
-            with c_op2:
-                fig_opex = px.bar(opex_q, x="月份", y="运营费用", title=f"运营费用｜月度趋势 ({quarter})", template=TEMPLATE)
-                fig_opex.update_traces(marker_color="rgba(201,166,107,0.6)", hovertemplate="月份：%{x}<br>费用：¥%{y:,.2f}<extra></extra>")
-                fig_opex.update_layout(height=260, margin=dict(t=30, b=0))
-                st.plotly_chart(apply_plot_style(fig_opex), use_container_width=True)
-                render_insight_module("运营费用", get_opex_insights(opex_q))
-            st.markdown("</div>", unsafe_allow_html=True)
-            st.write("")
-            
-    # -------------------------
-    # Tab3：客户&业务员分析
-    # -------------------------
-    with tab3:
-        st.markdown('<div class="panel">', unsafe_allow_html=True)
-        st.subheader(f"客户经营洞察 ({quarter})")
-        
-        # 核心筛选过滤
-        sales_q = quarter_filter_month_str(sales, quarter, "月份")
+        st.write("")
         
-        # B2B / B2C 总收入汇总 (基于业务类型列)
-        b2b_rev = sales_q[sales_q["业务类型"].str.upper() == "B2B"]["销售收入"].sum()
-        b2c_rev = sales_q[sales_q["业务类型"].str.upper() == "B2C"]["销售收入"].sum()
+        # 图表：帕累托 + 效率矩阵
+        figs = customer_figures(sales_q, quarter, sort_by, fp=fp)
+        c1, c2 = st.columns(2)
+        with c1:
+            st.plotly_chart(cached_figure(fp, *figs["pareto"]), use_container_width=True)
+        with c2:
+            st.plotly_chart(cached_figure(fp, *figs["matrix"]), use_container_width=True)
         
-        c_k1, c_k2, c_k3 = st.columns([1, 1, 2])
-        with c_k1:
-            kpi_card("B2B 总收入", fmt_money(b2b_rev), "", "🏢", "筛选区间内 B2B 渠道销售额总計")
-        with c_k2:
-            kpi_card("B2C 总收入", fmt_money(b2c_rev), "", "🛒", "筛选区间内 B2C 渠道销售額總計")
-        with c_k3:
+        if show_all:
             st.write("")
-
-        col_ctrl1, col_ctrl2 = st.columns([1, 2])
-        with col_ctrl1:
-            sort_by = st.radio("Top10 排序依据", ["销售收入", "销售毛利"], index=0, horizontal=True)
-        with col_ctrl2:
-            st.caption("✨ 提示：主渠道显示为 Multi 表示该客户在单一渠道占比低于 60%。")
-
-        cust = top_customers(sales_q, topn=10, sort_by=sort_by)
-
-        if cust.empty:
-            st.warning("当前筛选条件下未发现有效的销售记录。")
-        else:
-            # 数据美化展示
-            cust_show = cust.copy()
-            cust_show["销售收入"] = cust_show["销售收入"].map(fmt_money)
-            cust_show["销售毛利"] = cust_show["销售毛利"].map(fmt_money)
-            cust_show["毛利率"] = cust_show["毛利率"].map(lambda x: f"{x*100:.1f}%")
-            cust_show["累计占比(收入)"] = cust_show["累计占比(收入)"].map(lambda x: f"{x*100:.1f}%")
-            cust_show["累计占比(毛利)"] = cust_show["累计占比(毛利)"].map(lambda x: f"{x*100:.1f}%")
-            
-            st.dataframe(cust_show[["购货单位", "业务类型", "销售收入", "销售毛利", "毛利率", "累计占比(收入)", "累计占比(毛利)"]].rename(columns={"业务类型": "渠道"}), 
-                         use_container_width=True, height=340)
-
-            st.write("")
-            
-            # 图表：帕累托 + 效率矩阵
-            c1, c2 = st.columns(2)
-            with c1:
-                st.plotly_chart(customer_pareto_chart(cust), use_container_width=True)
-            with c2:
-                st.plotly_chart(customer_efficiency_matrix(sales_q, cust["购货单位"].tolist()), use_container_width=True)
-            
-            st.write("")
-            st.plotly_chart(customer_channel_dist_chart(sales_q, cust["购货单位"].tolist()), use_container_width=True)
-
-            # 统一洞察模块
-            render_insight_module("客户经营", get_customer_decision_insights(cust, sales_q))
-
-        st.markdown("</div>", unsafe_allow_html=True)
+            render_customer_population(cust_ca, quarter, fp)
 
         st.write("")
+        st.plotly_chart(cached_figure(fp, *figs["mix"]), use_container_width=True)
 
-        st.markdown('<div class="panel">', unsafe_allow_html=True)
-        st.subheader(f"业务员销售分析 ({quarter})")
-
-        repN = 10
-        # [Fix] 联动 Quarter 筛选
-        reps = top_salesreps(sales_q, topn=repN)
-
-        if reps.empty:
-            st.warning("未检测到有效数据，或筛选区间内无数据。")
-        else:
-            reps_show = reps.copy()
-            reps_show["销售收入"] = reps_show["销售收入"].map(fmt_money)
-            reps_show["销售毛利"] = reps_show["销售毛利"].map(fmt_money)
-            reps_show["占比"] = reps_show["占比"].map(lambda x: f"{x*100:.1f}%")
-            reps_show["毛利率"] = reps_show["毛利率"].map(lambda x: f"{x*100:.1f}%")
-            
-            st.dataframe(reps_show[["业务员", "销售收入", "销售毛利", "毛利率", "占比"]], use_container_width=True, height=320)
+        # 统一洞察模块
+        render_insight_module("客户经营", get_customer_decision_insights(cust, sales_q))
 
-            fig = px.bar(reps, x="业务员", y="销售收入", title=f"业务员销售额（Top10, {quarter}）", template=TEMPLATE)
-            fig.update_traces(hovertemplate="业务员：%{x}<br>销售收入：¥%{y:,.2f}<extra></extra>")
-            fig.update_layout(height=380)
-            st.plotly_chart(apply_plot_style(fig), use_container_width=True)
-            render_insight_module("业务员绩效", get_salesrep_insights(reps))
+    st.markdown("</div>", unsafe_allow_html=True)
 
-        st.markdown("</div>", unsafe_allow_html=True)
+def render_customer_population(ca: CustomerAnalytics, quarter: str, fp):
+    """全部客户效率矩阵 + 套索/框选明细（在客户面板片段内，选择只重跑本面板）"""
+    fig = cached_figure(fp, ("customer_population", quarter, POPULATION_POINT_LIMIT), lambda: customer_population_matrix(ca))
+    event = st.plotly_chart(fig, use_container_width=True, key="cust_population_chart",
+                            on_select="rerun", selection_mode=("points", "box", "lasso"))
+    names = selected_buyers(event, ca)
+    if not names:
+        st.caption(f"口径：收入前 {POPULATION_POINT_LIMIT:,} 名客户逐个绘制，其余按网格聚合；用套索/框选圈出客户（含聚合点内的客户）查看明细。")
+        return
+    sel = ca.profile[ca.profile["购货单位"].isin(names)].sort_values("销售收入", ascending=False)
+    st.caption(f"已选 {len(sel):,} 个客户：收入合计 {fmt_money(sel['销售收入'].sum())}")
+    render_table(sel[["购货单位", "业务类型", "渠道", "销售收入", "销售毛利", "毛利率"]], money=["销售收入", "销售毛利"],
+                 percent=["毛利率"], key="cust_selected", hide_index=True, height=260)
 
-    # 底部战略行动建议 (New Grand Finale)
-    # 底部战略行动建议 (New Grand Finale - CFO Upgrade)
-    # 底部战略行动建议 (New Grand Finale - CEO Roadmap)
-    # -------------------------
-    # 1. 准备 Metrics (基于当前筛选 Quarter / Channel)
+# -----------------------------
+# 路线图指标（底部行动清单的输入）
+# -----------------------------
+@traced("roadmap")
+def roadmap_metrics(sales, annual_profit, profit_q, platform, opex_df, cash_cny, quarter, channel, year, input_budget) -> Dict[str, Any]:
+    """按当前季度 / 渠道筛选计算路线图所需指标；取不到的指标为 None（对应任务不生成）"""
     _gm = None
     _npr = None
     _total_sm_rate = None
@@ -2067,11 +4582,16 @@ def main():
     
     # A) 基础数据筛选
     # 销售数据：同时受 Quarter 和 Channel 影响
-    sales_q = quarter_filter_month_str(sales, quarter, "月份")
-    sales_q_c = sales_q.copy()
-    if channel != "其他" and channel != "全部": 
-         if "所有" not in channel and "全部" not in channel:
-             sales_q_c = sales_q_c[sales_q_c["渠道"] == channel]
+    # sales 为 SalesRollups：合计取渠道表，Top1 客户 / 产品取各自的上卷表，都按同一渠道筛选
+    sales_q = sales.slice(quarter, year)
+
+    def in_channel(df: pd.DataFrame) -> pd.DataFrame:
+        if channel != "其他" and channel != "全部":
+             if "所有" not in channel and "全部" not in channel:
+                 return df[df["渠道"] == channel]
+        return df
+
+    sales_q_c = in_channel(sales_q.channel).copy()
 
     # B) 计算 Growth / Margin 类指标 (GM, Top1)
     # 强制数值化，防 bug
@@ -2099,8 +4619,8 @@ def main():
                        _gm = _g_est / _r_p
         
         # Top1 Customer (Strict Weighted)
-        if "购货单位" in sales_q_c.columns and _rev_s > 0:
-            cust_g = sales_q_c.groupby("购货单位")["销售收入"].sum().sort_values(ascending=False)
+        if _rev_s > 0:
+            cust_g = in_channel(sales_q.customer).groupby("购货单位", observed=True)["销售收入"].sum().sort_values(ascending=False)
             if not cust_g.empty:
                 _share = cust_g.iloc[0] / _rev_s
                 # [Fix] 如果占比 100% (说明只有1个客户或列取错了)，视为无效数据，不生成误导建议
@@ -2112,8 +4632,8 @@ def main():
             _top1_cust = None
 
         # Top1 Product
-        if "产品名称" in sales_q_c.columns and _rev_s > 0:
-            prod_g = sales_q_c.groupby("产品名称")["销售收入"].sum().sort_values(ascending=False)
+        if _rev_s > 0:
+            prod_g = in_channel(sales_q.product).groupby("产品名称", observed=True)["销售收入"].sum().sort_values(ascending=False)
             if not prod_g.empty:
                 _top1_prod = prod_g.iloc[0] / _rev_s
 
@@ -2191,7 +4711,7 @@ def main():
     _gm_npr_gap = None
     
     # 计算 OpEx Ratio (Quarterly)
-    opex_q = quarter_filter_month_str(opex_df, quarter, "月份")
+    opex_q = quarter_filter_month_str(opex_df, quarter, "月份", year=year)
     if not opex_q.empty and not profit_q.empty:
          _op_sum = opex_q["运营费用"].sum()
          _rev_p = pd.to_numeric(profit_q["销售额"], errors="coerce").sum()
@@ -2226,10 +4746,349 @@ def main():
         "opex_ratio": _opex_ratio,
         "gm_npr_gap": _gm_npr_gap,
     }
+    return metrics
+
+# -----------------------------
+# 主程序
+# -----------------------------
+def main():
+    inject_css()
+
+    # 侧边栏：强制刷新 & 数据源
+    with st.sidebar:
+        st.markdown("## 系统控制")
+        if st.button("🔄 强制刷新取数", use_container_width=True, help="清空内存缓存、图表缓存，以及当前数据源的落盘快照与销售分区"):
+            st.cache_data.clear()
+            get_data_cache().clear()
+            get_figure_cache().clear()
+            st.session_state["_force_refresh"] = True   # 数据源在下方确定后再删它的快照
+            st.rerun()
+        st.toggle("🐞 性能剖析（调试）", key="debug_trace", help="记录本次刷新各阶段耗时（取数、read_*、图表、洞察、路线图），页面底部显示瀑布图，可导出 Chrome trace")
+            
+        st.markdown("---")
+        st.markdown("## 数据源")
+
+        if is_cloud():
+            # Cloud Mode
+            excel_path = None
+            upload = bundle_uploads(st.sidebar.file_uploader(
+                "📂 上传Excel数据源 (2025年全年.xlsx)，或按 sheet 导出的 CSV / Parquet", type=UPLOAD_TYPES, accept_multiple_files=True))
+            if not upload:
+                st.info("☁️ 云端模式：请上传 Excel 文件以开始分析。")
+                st.stop()
+        else:
+            # Local Mode
+            # 更新为用户提供的最新确切路径
+            default_path = r"D:\财务工作\09-财务报表\2025年\季度、年度报表\2025年度报表\2025年全年.xlsx"
+            excel_path = st.sidebar.text_input("本地Excel路径或数据目录（优先）", value=default_path,
+                                               help="数据目录：放工作簿和/或按 sheet 导出的文件（如 销售数据.csv / 销售数据.parquet），同名 sheet 以导出文件为准")
+            upload = bundle_uploads(st.sidebar.file_uploader(
+                "或上传 2025年全年.xlsx / 按 sheet 导出的 CSV、Parquet", type=UPLOAD_TYPES, accept_multiple_files=True))
+
+        # 往年数据（可选）：用于同比 / 环比，每个数据源按自己的指纹独立缓存
+        compare_sources: List[Any] = []
+        if not is_cloud():
+            lines = st.sidebar.text_area("往年数据（可选，每行一个工作簿或数据目录）", value="", height=68)
+            for p in (x.strip().strip('"') for x in lines.splitlines()):
+                if p and os.path.exists(p):
+                    compare_sources.append(p)
+                elif p:
+                    st.sidebar.caption(f"⚠️ 未找到：{p}")
+        compare_sources += st.sidebar.file_uploader("上传往年工作簿（可选，可多选，用于同比）", type=["xlsx"], accept_multiple_files=True) or []
+
+    # 尝试读取数据
+    used = None
+    fp = None
+    watcher = None
+    stale = False
+    # 本会话上次监视的路径不再使用（换了路径 / 改为上传）时释放，没有其他会话在用就停掉它的监视线程
+    session = st.session_state.setdefault("_watch_session", os.urandom(8).hex())
+    watch_path = os.path.abspath(excel_path) if not is_cloud() and excel_path and os.path.exists(excel_path) else None
+    prev_path = st.session_state.get("_watch_path")
+    if prev_path and prev_path != watch_path and Observer is not None:
+        get_watcher_pool().release(prev_path, session)
+    st.session_state["_watch_path"] = watch_path
+    
+    if is_cloud():
+        # Cloud: upload is guaranteed by st.stop() above
+        used = upload
+        if upload is not None:
+             fp = file_fingerprint(upload) # 计算 Cloud 上传文件的指纹
+    else:
+        # Local logic
+        if excel_path and os.path.exists(excel_path):
+            used = excel_path
+            watcher = get_workbook_watcher(watch_path, session)
+            if watcher is not None:
+                # 用监视器确认过（已预热完）的指纹，保存过程中不会读到半截文件
+                fp, st.session_state["_watch_version"] = watcher.current()
+                # 文件已变、新版本还没预热完：缓存未命中时读到的是新内容，不能写在旧指纹名下
+                stale = watcher.pending or file_fingerprint(excel_path) != fp
+                if stale and not watcher.pending:
+                    watcher.touch()   # 漏掉了保存事件：补一次预热
+            else:
+                fp = file_fingerprint(excel_path)
+        elif upload is not None:
+            used = upload
+            fp = file_fingerprint(upload) # 计算 Local 上传文件的指纹
+        else:
+            st.warning("未找到本地路径文件，也未上传Excel。请检查路径或上传文件。")
+            st.stop()
+
+    if st.session_state.pop("_force_refresh", False):
+        clear_source_snapshots(used, fp)
+
+    # 统一读取
+    with trace_span("取数", "load"), cache_read_only(stale) as ro:
+        data = load_all_dashboard_data(used, fp=fp)
+    if ro is not None and ro.missed:
+        fp = None   # 本次读到了磁盘上的新内容：图表也不按旧指纹缓存 / 预取
+    annual_profit = data["annual_profit"]
+    cash_cny = data["cash_cny"]
+    sales = data["sales"]  # 销售上卷表（见 SalesRollups），下方各视图按需取其中一张
+    platform = data["platform"]
+    opex_df = data["opex_df"]
+
+    with st.sidebar.expander("⏱️ 取数耗时", expanded=False):
+        if data["parse_timings"]:
+            for sh, sec in data["parse_timings"].items():
+                st.caption(f"{sh}：{sec:.2f}s")
+        else:
+            st.caption("本次刷新全部命中缓存，未解析 Excel。")
+    with st.sidebar:
+        render_cache_usage()
+        if watcher is not None:
+            render_watch_status(watcher, session)
+
+    # 侧边栏：交互控件（季度筛选按数据的主年份，不写死年份）
+    year = primary_year(annual_profit) or primary_year(sales.channel)
+    st.sidebar.markdown("## 交互控制")
+    quarter = st.sidebar.selectbox(f"营收&净利率趋势（{year}）查看区间", ["全年", "Q1", "Q2", "Q3", "Q4"], index=0)
+    
+    # 新增 Sidebar 输入
+    st.sidebar.markdown("---")
+    st.sidebar.markdown("### 💰 2026 预算设定")
+    
+    # 预测模式 (Existing)
+    forecast_mode = st.sidebar.radio(
+        "2026年 销售收入预测",
+        ["悲观 (-10%)", "保守 (+10%)", "基准 (+30%)", "进取 (+50%)"],
+        index=2
+    )
+    
+    st.sidebar.caption(
+        "· 悲观 (-10%): 假设营收同比下降 10%\n"
+        "· 保守 (+10%): 假设营收同比增长 10%\n"
+        "· 基准 (+30%): 假设营收同比增长 30%\n"
+        "· 进取 (+50%): 假设营收同比增长 50%"
+    )
+
+    # [New] Marketing Budget Input
+    st.sidebar.markdown("###### 核心渠道季度预算 (用于 Roadmap)")
+    input_budget = st.sidebar.number_input(
+        "请输入 Q1/Q2... 预算 (CNY)",
+        min_value=0.0,
+        value=0.0,
+        step=10000.0,
+        format="%.0f",
+        help="用于计算‘预算迁移执行率’。若为 0，则该指标显示数据不足。"
+    )
+
+    channel = st.sidebar.selectbox("核心渠道趋势", ["亚马逊-US", "TikTok-US", "Juvera", "Shopify", "其他"], index=0)
+    marketing_delta = st.sidebar.slider("营销费用率变化（预测年度利润）", -10.0, 10.0, 0.0, 0.5) / 100.0
+
+    st.sidebar.caption("说明：净利润动态模拟 = 基准净利润 −（年度营收 × 营销费率变化）")
+
+    # -----------------------------
+    # 动态 KPI 计算 (Top Level)
+    # -----------------------------
+    # 季度过滤
+    profit_q = quarter_filter_month_str(annual_profit, quarter, "月份", year=year)
+
+    # 1. 营收
+    q_rev = float(profit_q["销售额"].sum())
+    
+    # 2. 净利润 (q_np)
+    if "净利润" in profit_q.columns:
+        q_np = float(profit_q["净利润"].sum())
+    elif "净利率" in profit_q.columns:
+        q_np = (profit_q["销售额"] * profit_q["净利率"]).sum()
+    else:
+        q_np = np.nan
+
+    # 3. 净利率 (基准)
+    base_margin = (q_np / q_rev) if q_rev and not np.isnan(q_np) else np.nan
+
+    # 动态模拟 (营销费率滑块)
+    dyn_np = q_np - (q_rev * marketing_delta) if not np.isnan(q_np) else np.nan
+    dyn_margin = (dyn_np / q_rev) if q_rev and not np.isnan(dyn_np) else np.nan
+
+    # -----------------------------
+    # 页面主体
+    # -----------------------------
+    # 标题
+    st.markdown(
+        f"""
+        <div class="h1">BOLVA CEO 2025 年度经营决策看板 <span class="badge">Strategic AI Console</span></div>
+        """,
+        unsafe_allow_html=True
+    )
+    
+    # 顶部战略指南针
+    render_strategic_header(annual_profit, sales, platform)
+
+    # 核心筛选过滤（各分页与底部路线图共用）
+    sales_q = sales.slice(quarter, year)
+    opex_q = quarter_filter_month_str(opex_df, quarter, "月份", year=year)
+
+    # 各分页的图表清单；懒加载模式下只渲染当前分页，其余分页在首屏之后后台预取
+    # Top8 只算一次：产品图（含后台预取）与产品洞察共用
+    Top8 = top_products(sales_q.product, topn=8)
+    figs_overview = overview_figures(annual_profit, profit_q, sales, Top8, quarter, channel, forecast_mode, year)
+    sections = [
+        lambda: figs_overview,
+        lambda: expense_figures(platform, opex_q, quarter),
+        lambda: {**customer_figures(sales_q.customer, quarter, fp=fp), **salesrep_figures(sales_q.rep, quarter)},
+    ]
+    if LAZY_TABS:
+        tabs = st.tabs(TAB_LABELS, key="nav", on_change="rerun")
+    else:
+        tabs = st.tabs(TAB_LABELS)
+    tab1, tab2, tab3 = tabs
+
+    # -------------------------
+    # Tab1：经营总览
+    # -------------------------
+    with tab1, trace_span(f"分页 {TAB_LABELS[0]}", "tab"):
+        if getattr(tab1, "open", None) is not False:   # 旧版 Streamlit 的分页没有 open
+            # KPI 四卡
+            c1, c2, c3, c4 = st.columns(4)
+            with c1:
+                kpi_card("REVENUE", fmt_m(q_rev/1_000_000.0), f"({quarter})", "📈", f"{quarter} 营收合计")
+            with c2:
+                delta_np_m = (dyn_np - q_np)/1_000_000.0 if not np.isnan(dyn_np) and not np.isnan(q_np) else np.nan
+                kpi_card("NET PROFIT", fmt_m(dyn_np/1_000_000.0) if not np.isnan(dyn_np) else "—",
+                         f"Δ {fmt_m(delta_np_m)}" if not np.isnan(delta_np_m) else "", "💰", "净利润动态模拟（营销费率滑块）")
+            with c3:
+                # Cash 只有当前余额，无法按季度回溯，维持原样
+                kpi_card("CASH", fmt_m(cash_cny/1_000_000.0), "(Current)", "🏦", "银行余额（当前本位币汇总）")
+            with c4:
+                kpi_card("MARGIN", fmt_pct(dyn_margin) if not np.isnan(dyn_margin) else "—",
+                         f"基准 {fmt_pct(base_margin)}" if not np.isnan(base_margin) else "", "％", f"{quarter} 净利率（动态）")
+
+            st.write("")
+            st.write("")
+            st.write("")
+
+            # 图表布局：左（营收&毛利率 + 渠道趋势）右（Top8产品贡献 + 月度快照）
+            left, right = st.columns([1.55, 1.0])
+
+            with left:
+                st.markdown('<div class="panel">', unsafe_allow_html=True)
+            
+                # 2026 预测数据生成 + 交互控制更新（跟随“查看区间”筛选）
+                df_forecast_2026 = forecast_frame(annual_profit, profit_q, quarter, forecast_mode)
+
+                st.plotly_chart(cached_figure(fp, *figs_overview["rev_np"]), use_container_width=True)
+                render_insight_module("营收与预测", get_revenue_trend_insights(profit_q, df_forecast_2026, quarter, forecast_mode))
+                st.markdown("</div>", unsafe_allow_html=True)
+
+                st.write("")
+                st.markdown('<div class="panel">', unsafe_allow_html=True)
+                st.plotly_chart(cached_figure(fp, *figs_overview["channel_trend"]), use_container_width=True)
+                render_insight_module("渠道趋势", get_channel_trend_insights(sales_q.channel, channel))
+                st.markdown("</div>", unsafe_allow_html=True)
+
+            with right:
+                # [Fix] 联动 Quarter 筛选（Top8 见上方图表清单）
+                st.markdown('<div class="panel">', unsafe_allow_html=True)
+                # 动态标题（见 overview_figures）
+                st.plotly_chart(cached_figure(fp, *figs_overview["top_products"]), use_container_width=True)
+                render_insight_module("产品贡献", get_product_insights(Top8, sales_q.channel["销售收入"].sum()))
+                st.caption("口径：销售数据按产品名称汇总（Top8 + Others）。悬停条形可查看金额。")
+                st.markdown("</div>", unsafe_allow_html=True)
+
+                st.write("")
+                st.markdown('<div class="panel">', unsafe_allow_html=True)
+                st.subheader("月度快照（年度利润）")
+                render_table(profit_q, millions=["销售额", "净利润"], percent=["毛利率", "净利率"], key="snapshot_table", height=280)
+                st.markdown("</div>", unsafe_allow_html=True)
+
+            if compare_sources:
+                st.write("")
+                render_yoy_panel([used] + compare_sources, quarter, year)
+
+    # -------------------------
+    # Tab2：费用分析
+    # -------------------------
+    with tab2, trace_span(f"分页 {TAB_LABELS[1]}", "tab"):
+        if getattr(tab2, "open", None) is not False:
+
+            render_platform_panel(platform, fp)
+
+            if opex_df.empty:
+                st.info("💡 未读取到有效的运营费用数据（请检查《运营费用》表中的“日期”与“金额”列）。")
+            else:
+                st.markdown('<div class="panel">', unsafe_allow_html=True)
+                st.subheader(f"运营费用分析 ({quarter})")
+
+                # 简单 KPI
+                total_opex = opex_q["运营费用"].sum()
+                c_op1, c_op2 = st.columns([1, 3])
+                with c_op1:
+                    st.metric(f"运营费用合计 ({quarter})", fmt_money(total_opex))
+                with c_op2:
+                    st.plotly_chart(cached_figure(fp, ("opex", quarter), lambda: opex_trend_chart(opex_q, quarter)), use_container_width=True)
+                    render_insight_module("运营费用", get_opex_insights(opex_q))
+                st.markdown("</div>", unsafe_allow_html=True)
+                st.write("")
+            
+    # -------------------------
+    # Tab3：客户&业务员分析
+    # -------------------------
+    with tab3, trace_span(f"分页 {TAB_LABELS[2]}", "tab"):
+        if getattr(tab3, "open", None) is not False:
+            render_customer_panel(sales_q.customer, quarter, fp)
+
+            st.write("")
+
+            st.markdown('<div class="panel">', unsafe_allow_html=True)
+            st.subheader(f"业务员销售分析 ({quarter})")
+
+            repN = 10
+            # [Fix] 联动 Quarter 筛选
+            reps = top_salesreps(sales_q.rep, topn=repN)
+
+            if reps.empty:
+                st.warning("未检测到有效数据，或筛选区间内无数据。")
+            else:
+                render_table(reps[["业务员", "销售收入", "销售毛利", "毛利率", "占比"]], money=["销售收入", "销售毛利"],
+                             percent=["毛利率", "占比"], key="rep_table", height=320)
+
+                st.plotly_chart(cached_figure(fp, ("salesreps", quarter), lambda: salesrep_bar_chart(reps, quarter)), use_container_width=True)
+                render_insight_module("业务员绩效", get_salesrep_insights(reps))
+
+            st.markdown("</div>", unsafe_allow_html=True)
+
+    # 底部战略行动建议 (New Grand Finale)
+    # 底部战略行动建议 (New Grand Finale - CFO Upgrade)
+    # 底部战略行动建议 (New Grand Finale - CEO Roadmap)
+    # -------------------------
+    # 1. 准备 Metrics (基于当前筛选 Quarter / Channel)
+    metrics = roadmap_metrics(sales, annual_profit, profit_q, platform, opex_df, cash_cny, quarter, channel, year, input_budget)
     
     render_final_action_checklist(metrics, quarter, channel, forecast_mode)
 
     st.caption("© BOLVA — CEO Strategic Console (2025) | Data-Driven Decision Engine | Cream Gold Lux Edition")
 
+    # 懒加载：首屏渲染完成后，后台为未打开的分页预取图表，切换过去直接命中图表缓存
+    if LAZY_TABS:
+        for tab, figs in zip(tabs, sections):
+            if not tab.open:
+                prefetch_figures(fp, figs())
+
 if __name__ == "__main__":
-    main()
+    with trace_run(bool(st.session_state.get("debug_trace"))) as run_trace:
+        main()
+    if run_trace is not None:
+        render_trace_panel(run_trace)
@@ -0,0 +1,44 @@
+# bench_reader.py — 读取后端基准：openpyxl（pd.ExcelFile.parse）vs 流式 XML（XlsxStreamReader）
+# 用法：python bench_reader.py 2025年BOLVA经营数据.xlsx [--sheet 销售数据] [--repeat 3]
+import argparse
+import time
+import zipfile
+
+import pandas as pd
+
+from app3 import XlsxStreamReader
+
+
+def best_of(fn, repeat: int):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - t0)
+    return best, out
+
+
+def main():
+    ap = argparse.ArgumentParser(description="对比 openpyxl 与流式 XML 后端的整表解析耗时，并校验结果一致")
+    ap.add_argument("path")
+    ap.add_argument("--sheet", action="append", help="只测指定 sheet（可重复）；默认全部")
+    ap.add_argument("--repeat", type=int, default=1)
+    args = ap.parse_args()
+
+    with zipfile.ZipFile(args.path) as zf:
+        rd = XlsxStreamReader(zf)
+        sheets = args.sheet or list(rd.parts)
+        print(f"{'sheet':<16}{'行数':>10}{'openpyxl(s)':>14}{'xml(s)':>10}{'加速':>8}  一致")
+        for name in sheets:
+            t_old, old = best_of(lambda: pd.ExcelFile(args.path, engine="openpyxl").parse(name, header=None), args.repeat)
+            t_new, new = best_of(lambda: rd.raw(name), args.repeat)
+            try:
+                pd.testing.assert_frame_equal(old, new)
+                same = "✓"
+            except AssertionError:
+                same = "✗"
+            print(f"{name:<16}{len(new):>10}{t_old:>14.2f}{t_new:>10.2f}{t_old / max(t_new, 1e-9):>7.1f}x  {same}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+# bench_suite.py — 看板基准套件：各 read_* 取数、销售立方体、Top 汇总与路线图指标的冷启动耗时，结果存 JSON 便于对比
+# 用法：
+#   python bench_suite.py 2025年全年.xlsx [更多工作簿 ...] [--repeat 3]
+#   python bench_suite.py --generate 10000 1000000 5000000 [--customers 20000]   # 先用 gen_workbook 生成合成工作簿再测
+#   python bench_suite.py --generate 1000000 --compare bench_results/20251001-120000.json
+# 结果默认写到 bench_results/<时间>.json；--compare 按 工作簿 × 阶段 打印与旧结果的对比。
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# 快照 / 分区写到本次专用的临时目录（每轮前清空，测的是冷解析；不碰看板自己的 .snapshots），须在导入 app3 之前设置
+os.environ["BOLVA_SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="bolva-bench-")
+
+import numpy as np
+import pandas as pd
+
+import app3
+import gen_workbook
+
+BENCH_DIR = "bench_results"
+QUARTER, CHANNEL, SCENARIO = "全年", "亚马逊-US", "基准 (+30%)"
+
+
+def cold():
+    """清空快照 / 分区与进程内数据缓存（load_all_dashboard_data 按 sheet 指纹缓存）"""
+    shutil.rmtree(app3.SNAPSHOT_DIR, ignore_errors=True)
+    app3.get_data_cache().clear()
+
+
+def timed(fn, repeat: int, setup=None):
+    runs, out = [], None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        t0 = time.perf_counter()
+        out = fn()
+        runs.append(time.perf_counter() - t0)
+    return {"best": min(runs), "median": statistics.median(runs), "runs": runs}, out
+
+
+def read_cold(loader, path):
+    """新开一个工作簿会话调用 loader（fp=None：不走数据缓存与快照），含打开工作簿与表头探测"""
+    with app3.WorkbookSession(path) as book:
+        return loader(book)
+
+
+def read_sales_streaming(book):
+    """对照：与 read_sales 同口径，但始终按块流式读取（不读写按月分区）"""
+    base = app3._read_sales_streaming(book, book.layout().get("sales"))
+    return app3.attach_channels(app3.compact_sales(base))
+
+
+def bench_workbook(path: str, repeat: int) -> dict:
+    stages = {}
+
+    def run(name, fn, setup=cold):
+        stages[name], out = timed(fn, repeat, setup)
+        print(f"  {name:<40}{stages[name]['best']:>9.3f}s", flush=True)
+        return out
+
+    run("load_all_dashboard_data", lambda: app3.load_all_dashboard_data(path))
+    annual = run("read_annual_profit", lambda: read_cold(app3.read_annual_profit, path))
+    cash = run("read_bank_balance_cny", lambda: read_cold(app3.read_bank_balance_cny, path))
+    sales = run("read_sales", lambda: read_cold(app3.read_sales, path))
+    # 同一文件第二次导入：大表按月分区复用（小表与冷启动相同）
+    run("read_sales（复用分区）", lambda: read_cold(app3.read_sales, path), setup=None)
+    run("read_sales（流式，对照）", lambda: read_cold(read_sales_streaming, path))
+    plat = run("read_platform_selling_exp", lambda: read_cold(app3.read_platform_selling_exp, path))
+    opex = run("read_opex", lambda: read_cold(app3.read_opex, path))
+
+    cube = run("sales_cube_frame", lambda: app3.sales_cube_frame(sales), setup=None)
+    rollups = run("sales_rollups_frame", lambda: app3.sales_rollups_frame(cube), setup=None)
+    year = app3.primary_year(annual) or app3.primary_year(rollups.channel)
+    run("top_products", lambda: app3.top_products(rollups.product, topn=8), setup=None)
+    run("top_customers（含 CustomerAnalytics）", lambda: app3.top_customers(app3.CustomerAnalytics(rollups.customer), topn=10), setup=None)
+    run("top_salesreps", lambda: app3.top_salesreps(rollups.rep, topn=10), setup=None)
+    profit_q = app3.quarter_filter_month_str(annual, QUARTER, "月份", year=year)
+    metrics = run("roadmap_metrics", lambda: app3.roadmap_metrics(rollups, annual, profit_q, plat, opex, cash,
+                                                                   QUARTER, CHANNEL, year, 0.0), setup=None)
+    run("build_roadmap_actions", lambda: app3.build_roadmap_actions(metrics, QUARTER, CHANNEL, SCENARIO), setup=None)
+    return {"path": os.path.abspath(path), "bytes": os.path.getsize(path), "sales_rows": int(len(sales)),
+            "cube_rows": int(len(cube)), "rollup_rows": {k: int(len(v)) for k, v in rollups._asdict().items()},
+            "customers": int(sales["购货单位"].nunique()), "stages": stages}
+
+
+def generated_workbooks(args) -> list:
+    """按 --generate 的行数生成合成工作簿（同参数的文件已存在则直接复用）"""
+    os.makedirs(args.gen_dir, exist_ok=True)
+    paths = []
+    for rows in args.generate:
+        out = os.path.join(args.gen_dir, f"合成_{rows}行_{args.customers}客户_{args.products}产品_{args.reps}业务员_s{args.seed}.xlsx")
+        if not os.path.exists(out):
+            g = argparse.Namespace(out=out, rows=rows, customers=args.customers, products=args.products, reps=args.reps,
+                                   opex_sheets=args.opex_sheets, year=args.year, seed=args.seed)
+            t0 = time.perf_counter()
+            gen_workbook.write_workbook(g)
+            print(f"生成 {out}（{time.perf_counter() - t0:.1f}s）")
+        paths.append(out)
+    return paths
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        return ""
+
+
+def print_compare(old: dict, new: dict):
+    print(f"\n对比 {old['meta'].get('commit') or '?'}（{old['meta']['time']}） -> {new['meta'].get('commit') or '?'}（{new['meta']['time']}），取最优值")
+    print(f"{'工作簿 / 阶段':<52}{'旧(s)':>10}{'新(s)':>10}{'变化':>9}")
+    for label, res in new["results"].items():
+        prev = old["results"].get(label)
+        if prev is None:
+            print(f"{label:<52}{'（旧结果无此工作簿）':>20}")
+            continue
+        print(label)
+        for stage, t in res["stages"].items():
+            p = prev["stages"].get(stage)
+            if p is None:
+                print(f"  {stage:<50}{'-':>10}{t['best']:>10.3f}")
+                continue
+            change = t["best"] / p["best"] - 1 if p["best"] > 0 else np.nan
+            print(f"  {stage:<50}{p['best']:>10.3f}{t['best']:>10.3f}{change:>+8.0%}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="看板取数与汇总的基准测试（冷启动），结果保存为 JSON 以便比较")
+    ap.add_argument("paths", nargs="*", help="工作簿路径")
+    ap.add_argument("--generate", type=int, nargs="+", default=[], metavar="ROWS", help="生成指定销售行数的合成工作簿并测试")
+    ap.add_argument("--customers", type=int, default=5000)
+    ap.add_argument("--products", type=int, default=400)
+    ap.add_argument("--reps", type=int, default=30)
+    ap.add_argument("--opex-sheets", type=int, default=2)
+    ap.add_argument("--year", type=int, default=2025)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--gen-dir", default=os.path.join(tempfile.gettempdir(), "bolva-bench-workbooks"))
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", help=f"结果 JSON；默认 {BENCH_DIR}/<时间>.json")
+    ap.add_argument("--compare", help="与之前保存的结果 JSON 对比")
+    args = ap.parse_args()
+
+    paths = list(args.paths) + generated_workbooks(args)
+    if not paths:
+        ap.error("请给出工作簿路径或 --generate 行数")
+
+    now = datetime.datetime.now()
+    result = {
+        "meta": {
+            "time": now.isoformat(timespec="seconds"), "commit": git_commit(), "repeat": args.repeat,
+            "python": sys.version.split()[0], "pandas": pd.__version__, "numpy": np.__version__,
+            "platform": platform.platform(), "cpus": os.cpu_count(),
+            "env": {k: v for k, v in os.environ.items() if k.startswith("BOLVA_") and k != "BOLVA_SNAPSHOT_DIR"},
+        },
+        "results": {},
+    }
+    try:
+        for path in paths:
+            print(f"{os.path.basename(path)}", flush=True)
+            result["results"][os.path.basename(path)] = bench_workbook(path, args.repeat)
+    finally:
+        shutil.rmtree(app3.SNAPSHOT_DIR, ignore_errors=True)
+
+    out = args.out or os.path.join(BENCH_DIR, f"{now:%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=1)
+    print(f"结果已保存：{out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            print_compare(json.load(f), result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+# gen_workbook.py — 合成经营数据工作簿：sheet / 表头 / 取值写法与真实《2025年全年.xlsx》一致，数据全部随机生成
+# 用法：python gen_workbook.py 合成_10万行.xlsx --rows 100000 [--customers 3000 --products 400 --reps 30 --opex-sheets 2 --year 2025 --seed 0]
+# 生成的 sheet：年度利润（前两行标题，表头在第 3 行）/ 销售数据 / 平台 销售费用比（表头在第 2 行）/ 银行余额 / 运营费用（可多张）
+# 写法与 Excel 保存的一致：共享字符串、带 r= 坐标的单元格、<dimension>、日期为带日期格式的序列号。
+import argparse
+import datetime
+import sys
+import time
+import zipfile
+from xml.sax.saxutils import escape
+
+import numpy as np
+import pandas as pd
+
+CHUNK_ROWS = 200_000
+EXCEL_EPOCH = np.datetime64("1899-12-30")
+
+# 平台客户：名称覆盖渠道规则表的各个关键词（含地区），其余为批发客户
+PLATFORM_BUYERS = [
+    ("Amazon US 店", "Amazon US"), ("亚马逊美国-", "Amazon US"), ("Amazon UK 店", "Amazon UK"),
+    ("TikTok US Shop ", "TikTok US"), ("TikTok UK Shop ", "TikTok UK"),
+    ("Shopify 官网 ", "Shopify"), ("Juvera 旗舰店 ", "Juvera"),
+]
+PRODUCT_WORDS = ["真空保温杯", "不锈钢餐具", "硅胶收纳盒", "宠物饮水机", "便携榨汁杯", "折叠衣架", "香薰加湿器", "无线充电器"]
+OPEX_ITEMS = ["房租物业", "办公费", "差旅费", "软件服务", "招聘培训", "水电网络", "咨询审计"]
+SALES_HEADER = ["日期", "购货单位", "产品名称", "数量", "销售收入", "销售成本", "销售毛利", "业务员", "渠道"]
+
+NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+STYLES_XML = (
+    f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<styleSheet xmlns="{NS}">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="yyyy-mm-dd hh:mm:ss"/></numFmts>'
+    '<fonts count="1"><font><sz val="11"/><name val="等线"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="2"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/></cellXfs>'
+    '<cellStyles count="1"><cellStyle name="常规" xfId="0" builtinId="0"/></cellStyles></styleSheet>'
+)
+DATE_STYLE = 1
+
+
+def col_letter(i: int) -> str:
+    s = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+class XlsxWriter:
+    """
+    最小 xlsx 写出器：行直接拼 sheet XML，字符串进共享字符串表，日期写成带日期格式的序列号。
+    openpyxl 逐格构造对象写 500 万行要十几分钟，这里按块生成 XML，只受压缩速度限制。
+    sheet 可以按任意顺序写入压缩包，工作簿里的顺序由 add_sheet 的 position 决定。
+    """
+    def __init__(self, path: str):
+        self.zf = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED, compresslevel=1)
+        self.sheets = []                  # (position, name, part)
+        self.sst = {}
+
+    def string(self, s: str) -> int:
+        i = self.sst.get(s)
+        if i is None:
+            i = self.sst[s] = len(self.sst)
+        return i
+
+    def cell(self, ref: str, v) -> str:
+        if v is None or (isinstance(v, float) and np.isnan(v)):
+            return ""
+        if isinstance(v, str):
+            return f'<c r="{ref}" t="s"><v>{self.string(v)}</v></c>'
+        if isinstance(v, datetime.datetime):
+            serial = float((np.datetime64(v) - EXCEL_EPOCH) / np.timedelta64(1, "D"))
+            return f'<c r="{ref}" s="{DATE_STYLE}"><v>{serial!r}</v></c>'
+        v = int(v) if isinstance(v, (int, np.integer)) else float(v)
+        return f'<c r="{ref}"><v>{v!r}</v></c>'
+
+    def add_sheet(self, position: int, name: str, n_rows: int, n_cols: int, blocks):
+        """blocks：逐块产出 <row> XML 字符串；n_rows / n_cols 写入 <dimension>"""
+        part = f"xl/worksheets/sheet{len(self.sheets) + 1}.xml"
+        self.sheets.append((position, name, part))
+        with self.zf.open(part, "w", force_zip64=True) as f:
+            f.write((f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<worksheet xmlns="{NS}" xmlns:r="{REL_NS}">'
+                     f'<dimension ref="A1:{col_letter(n_cols - 1)}{n_rows}"/><sheetData>').encode("utf-8"))
+            for block in blocks:
+                f.write(block.encode("utf-8"))
+            f.write(b"</sheetData></worksheet>")
+
+    def add_rows(self, position: int, name: str, rows):
+        """小表：按行写 Python 取值（None 为空单元格）"""
+        xml = []
+        for r, row in enumerate(rows, start=1):
+            cells = "".join(self.cell(f"{col_letter(c)}{r}", v) for c, v in enumerate(row))
+            xml.append(f'<row r="{r}">{cells}</row>')
+        self.add_sheet(position, name, len(rows), max((len(r) for r in rows), default=1), xml)
+
+    def close(self):
+        sheets = sorted(self.sheets)
+        self.zf.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+            '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+            + "".join(f'<Override PartName="/{part}" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+                      for _, _, part in sheets)
+            + "</Types>"))
+        self.zf.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+            '</Relationships>'))
+        self.zf.writestr("xl/workbook.xml", (
+            f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<workbook xmlns="{NS}" xmlns:r="{REL_NS}"><sheets>'
+            + "".join(f'<sheet name="{escape(name)}" sheetId="{i + 1}" r:id="rId{i + 1}"/>' for i, (_, name, _) in enumerate(sheets))
+            + "</sheets></workbook>"))
+        n = len(sheets)
+        self.zf.writestr("xl/_rels/workbook.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(f'<Relationship Id="rId{i + 1}" Type="{REL_NS}/worksheet" Target="{part[3:]}"/>' for i, (_, _, part) in enumerate(sheets))
+            + f'<Relationship Id="rId{n + 1}" Type="{REL_NS}/styles" Target="styles.xml"/>'
+            + f'<Relationship Id="rId{n + 2}" Type="{REL_NS}/sharedStrings" Target="sharedStrings.xml"/>'
+            + "</Relationships>"))
+        self.zf.writestr("xl/styles.xml", STYLES_XML)
+        with self.zf.open("xl/sharedStrings.xml", "w", force_zip64=True) as f:
+            f.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<sst xmlns="{NS}" uniqueCount="{len(self.sst)}">'.encode("utf-8"))
+            for s in self.sst:
+                f.write(f"<si><t>{escape(s)}</t></si>".encode("utf-8"))
+            f.write(b"</sst>")
+        self.zf.close()
+
+
+def make_dims(args, rng):
+    """客户 / 产品 / 业务员及其属性（客户按 Zipf 分布取，头部集中、长尾很长）"""
+    n_plat = min(max(args.customers // 10, len(PLATFORM_BUYERS)), args.customers)
+    buyers, platform = [], []
+    for i in range(n_plat):
+        prefix, plat = PLATFORM_BUYERS[i % len(PLATFORM_BUYERS)]
+        buyers.append(f"{prefix}{i // len(PLATFORM_BUYERS) + 1}")
+        platform.append(plat)
+    for i in range(args.customers - n_plat):
+        buyers.append(f"客户{i + 1:05d}贸易有限公司")
+        platform.append(None)
+    is_plat = np.array([p is not None for p in platform])
+    order = rng.permutation(args.customers)                  # 打乱排名，头部客户平台 / 批发混合
+    weight = 1.0 / np.arange(1, args.customers + 1) ** 1.1
+    cust_p = np.empty(args.customers)
+    cust_p[order] = weight / weight.sum()
+    # 平台客户基本是 B2C；约 10% 的批发客户两种业务都做（触发 Multi 主渠道）
+    b2c_share = np.where(is_plat, 0.95, np.where(rng.random(args.customers) < 0.1, 0.5, 0.03))
+
+    products = [f"{PRODUCT_WORDS[i % len(PRODUCT_WORDS)]} {i + 1:04d}" for i in range(args.products)]
+    prod_p = 1.0 / np.arange(1, args.products + 1) ** 0.9
+    prod_p /= prod_p.sum()
+    prod_price = rng.lognormal(4.5, 0.8, args.products).round(2)
+    prod_margin = rng.uniform(0.15, 0.6, args.products)
+
+    reps = [f"业务员{i + 1:02d}" for i in range(args.reps)]
+    cust_rep = rng.integers(0, args.reps, args.customers)   # 客户固定归属一个业务员
+    return dict(buyers=buyers, platform=np.array(platform, dtype=object), cust_p=cust_p, b2c_share=b2c_share,
+                products=products, prod_p=prod_p, prod_price=prod_price, prod_margin=prod_margin,
+                reps=reps, cust_rep=cust_rep)
+
+
+def sales_chunks(args, dims, rng):
+    """按块生成销售明细（整表按日期升序，与真实流水账一致）"""
+    start = np.datetime64(f"{args.year}-01-01")
+    days = int((np.datetime64(f"{args.year + 1}-01-01") - start).astype(int))
+    day_of_row = np.sort(rng.integers(0, days, args.rows))
+    for lo in range(0, args.rows, CHUNK_ROWS):
+        n = min(CHUNK_ROWS, args.rows - lo)
+        c = rng.choice(len(dims["buyers"]), n, p=dims["cust_p"])
+        p = rng.choice(len(dims["products"]), n, p=dims["prod_p"])
+        qty = rng.integers(1, 60, n)
+        rev = (qty * dims["prod_price"][p] * rng.uniform(0.85, 1.1, n)).round(2)
+        cost = (rev * (1 - np.clip(dims["prod_margin"][p] + rng.normal(0, 0.05, n), -0.2, 0.9))).round(2)
+        b2c = rng.random(n) < dims["b2c_share"][c]
+        seconds = rng.integers(8 * 3600, 20 * 3600, n)
+        yield pd.DataFrame({
+            "日期": pd.to_datetime(start + day_of_row[lo:lo + n].astype("timedelta64[D]")) + pd.to_timedelta(seconds, unit="s"),
+            "客户": c, "产品": p, "数量": qty, "销售收入": rev, "销售成本": cost, "销售毛利": (rev - cost).round(2),
+            "业务员": dims["cust_rep"][c], "B2C": b2c,
+        })
+
+
+def sales_rows_xml(df: pd.DataFrame, sst_ix: dict, first_row: int) -> str:
+    """一块销售明细 -> <row> XML（字符串列写共享字符串序号，sst_ix 为各取值表的序号数组）"""
+    buyer_ix = sst_ix["buyers"][df["客户"].to_numpy()]
+    prod_ix = sst_ix["products"][df["产品"].to_numpy()]
+    rep_ix = sst_ix["reps"][df["业务员"].to_numpy()]
+    chan_ix = sst_ix["channels"][df["B2C"].to_numpy().astype(int)]
+    serial = ((df["日期"].to_numpy() - EXCEL_EPOCH) / np.timedelta64(1, "s") / 86400).round(8)
+    cols = zip(range(first_row, first_row + len(df)), serial.tolist(), buyer_ix.tolist(), prod_ix.tolist(),
+               df["数量"].tolist(), df["销售收入"].tolist(), df["销售成本"].tolist(), df["销售毛利"].tolist(),
+               rep_ix.tolist(), chan_ix.tolist())
+    return "".join(
+        f'<row r="{r}"><c r="A{r}" s="{DATE_STYLE}"><v>{d!r}</v></c><c r="B{r}" t="s"><v>{b}</v></c>'
+        f'<c r="C{r}" t="s"><v>{p}</v></c><c r="D{r}"><v>{q}</v></c><c r="E{r}"><v>{rev!r}</v></c>'
+        f'<c r="F{r}"><v>{cost!r}</v></c><c r="G{r}"><v>{gp!r}</v></c><c r="H{r}" t="s"><v>{rep}</v></c>'
+        f'<c r="I{r}" t="s"><v>{ch}</v></c></row>'
+        for r, d, b, p, q, rev, cost, gp, rep, ch in cols
+    )
+
+
+def write_workbook(args):
+    rng = np.random.default_rng(args.seed)
+    dims = make_dims(args, rng)
+    wx = XlsxWriter(args.out)
+    monthly, by_platform, t0 = [], [], time.perf_counter()
+
+    def sales_blocks():
+        yield "<row r=\"1\">" + "".join(wx.cell(f"{col_letter(i)}1", h) for i, h in enumerate(SALES_HEADER)) + "</row>"
+        sst_ix = {k: np.array([wx.string(x) for x in dims[k]]) for k in ("buyers", "products", "reps")}
+        sst_ix["channels"] = np.array([wx.string("B2B"), wx.string("B2C")])
+        written = 0
+        for df in sales_chunks(args, dims, rng):
+            yield sales_rows_xml(df, sst_ix, written + 2)
+            monthly.append(df.groupby(df["日期"].dt.month)[["销售收入", "销售毛利"]].sum())
+            by_platform.append(df.groupby(dims["platform"][df["客户"].to_numpy()])["销售收入"].sum())
+            written += len(df)
+            print(f"  销售数据 {written:,}/{args.rows:,} 行（{time.perf_counter() - t0:.0f}s）", file=sys.stderr)
+
+    # 销售数据先写（年度利润、平台费用按它汇总），工作簿里的顺序仍是 年度利润 在前
+    wx.add_sheet(2, "销售数据", args.rows + 1, len(SALES_HEADER), sales_blocks())
+
+    # 年度利润：前两行为标题 / 单位，表头在第 3 行；月份写成“2025年1月”
+    m = pd.concat(monthly).groupby(level=0).sum().reindex(range(1, 13), fill_value=0.0)
+    rows = [[f"{args.year}年度利润表"], ["单位：元"], ["月份", "销售额", "毛利率", "净利润", "净利率"]]
+    for month, r in m.iterrows():
+        rev, gp = float(r["销售收入"]), float(r["销售毛利"])
+        net = round(gp - rev * float(rng.uniform(0.18, 0.3)), 2)
+        rows.append([f"{args.year}年{month}月", round(rev, 2), round(gp / rev, 4) if rev else None,
+                     net, round(net / rev, 4) if rev else None])
+    wx.add_rows(1, "年度利润", rows)
+
+    # 平台 销售费用比：第 1 行标题，表头在第 2 行，末行合计
+    rows = [[f"{args.year}年平台销售费用比"],
+            ["平台", "渠道", "销售收入", "广告费(CNY)", "物流费(CNY)", "佣金(CNY)", "销售折扣/补贴", "总销售费用"]]
+    totals = np.zeros(6)
+    for plat, rev in pd.concat(by_platform).groupby(level=0).sum().items():
+        ad, logi, comm, disc = (rev * rng.uniform(*r) for r in [(0.08, 0.25), (0.1, 0.3), (0.08, 0.15), (0.0, 0.05)])
+        row = np.round([rev, ad, logi, comm, -disc, ad + logi + comm + disc], 2)
+        totals += row
+        rows.append([plat, "B2C"] + row.tolist())
+    rows.append(["合计", None] + np.round(totals, 2).tolist())
+    wx.add_rows(3, "平台 销售费用比", rows)
+
+    rows = [["银行", "账号", "币种", "原币余额", "汇率", "本位币(CNY)"]]
+    for i, (cur, rate) in enumerate([("CNY", 1.0), ("USD", 7.1), ("GBP", 9.0), ("CNY", 1.0)]):
+        amt = round(float(rng.uniform(2e5, 5e6)), 2)
+        rows.append([f"银行{i + 1}", f"62{rng.integers(10**9, 10**10)}", cur, amt, rate, round(amt * rate, 2)])
+    wx.add_rows(4, "银行余额", rows)
+
+    # 运营费用：前两行标题，表头含“日期 + 金额”；看板取第一张有数据的此类 sheet
+    for k in range(args.opex_sheets):
+        rows = [[f"{args.year}年运营费用明细" + ("" if k == 0 else f"（部门{k + 1}）")], [None],
+                ["日期", "部门", "费用项目", "摘要", "金额"]]
+        for month in range(1, 13):
+            for item in OPEX_ITEMS:
+                for _ in range(int(rng.integers(1, 4))):
+                    rows.append([datetime.datetime(args.year, month, int(rng.integers(1, 29))), f"部门{k + 1}", item,
+                                 f"{item}-{month}月", round(float(rng.lognormal(9, 0.7)), 2)])
+        wx.add_rows(5 + k, "运营费用" if k == 0 else f"运营费用{k + 1}", rows)
+
+    wx.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="生成与真实工作簿同结构的合成经营数据（用于基准测试与演示）")
+    ap.add_argument("out")
+    ap.add_argument("--rows", type=int, default=100_000, help="销售明细行数（1万 ~ 500万）")
+    ap.add_argument("--customers", type=int, default=3000)
+    ap.add_argument("--products", type=int, default=400)
+    ap.add_argument("--reps", type=int, default=30)
+    ap.add_argument("--opex-sheets", type=int, default=1, help="运营费用 sheet 张数")
+    ap.add_argument("--year", type=int, default=2025)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    if args.customers < len(PLATFORM_BUYERS) or args.products < 1 or args.reps < 1 or args.opex_sheets < 1 or args.rows < 1:
+        ap.error(f"至少需要 1 行销售明细、{len(PLATFORM_BUYERS)} 个客户、1 个产品、1 个业务员、1 张运营费用表")
+
+    t0 = time.perf_counter()
+    write_workbook(args)
+    print(f"{args.out}：销售数据 {args.rows:,} 行，{args.customers:,} 客户 / {args.products:,} 产品 / {args.reps} 业务员，"
+          f"{args.opex_sheets} 张运营费用表（{time.perf_counter() - t0:.1f}s）")
+
+
+if __name__ == "__main__":
+    main()
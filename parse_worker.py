@@ -0,0 +1,12 @@
+# parse_worker.py — 并行解析的子进程入口
+# streamlit 以脚本方式执行 app3.py，其中定义的函数无法被 spawn 子进程按模块名找到，
+# 因此入口放在这个可导入的小模块里，子进程首次调用时再导入 app3。
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def run(task: dict):
+    import app3
+    return app3.run_parse_task(task)
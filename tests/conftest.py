@@ -0,0 +1,49 @@
+# tests/conftest.py — 测试公共夹具：用 gen_workbook 生成的小型合成工作簿，快照写到临时目录
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 快照 / 分区写到本次测试专用的临时目录（不碰看板自己的 .snapshots），须在导入 app3 之前设置
+os.environ["BOLVA_SNAPSHOT_DIR"] = tempfile.mkdtemp(prefix="bolva-test-")
+
+import app3  # noqa: E402
+import gen_workbook  # noqa: E402
+
+
+def make_workbook(out: str, rows: int = 3000, customers: int = 300, products: int = 60, reps: int = 8,
+                  opex_sheets: int = 1, year: int = 2025, seed: int = 0) -> str:
+    gen_workbook.write_workbook(argparse.Namespace(out=out, rows=rows, customers=customers, products=products, reps=reps,
+                                                   opex_sheets=opex_sheets, year=year, seed=seed))
+    return out
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(app3.SNAPSHOT_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def workbook(tmp_path_factory) -> str:
+    return make_workbook(str(tmp_path_factory.mktemp("wb") / "合成.xlsx"))
+
+
+@pytest.fixture(scope="session")
+def raw_sales(workbook) -> "pd.DataFrame":
+    """原始《销售数据》sheet（pandas/openpyxl 直接读取），作为旧逐行实现的输入"""
+    import pandas as pd
+    return pd.read_excel(workbook, sheet_name="销售数据", engine="openpyxl")
+
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    """每个测试前清空快照与进程内数据缓存，互不影响"""
+    shutil.rmtree(app3.SNAPSHOT_DIR, ignore_errors=True)
+    app3.get_data_cache().clear()
+    app3.get_figure_cache().clear()
+    yield
@@ -0,0 +1,163 @@
+# tests/legacy.py — 重构前的逐行实现（口径原样保留，去掉了缓存装饰器与注释），只作为测试里对照新路径输出的基准
+import re
+
+import numpy as np
+import pandas as pd
+
+
+def parse_month_key(v):
+    # 支持：2025-01月 / 2025年7月 / 2025/01 / 2025-01
+    s = str(v).strip()
+    s = s.replace("年", "-").replace("月", "").replace("/", "-")
+    # 处理 "2025-01" / "2025-1"
+    m = re.search(r"(\d{4})-(\d{1,2})", s)
+    if m:
+        y, mm = m.group(1), int(m.group(2))
+        return f"{y}-{mm:02d}"
+    # 处理 excel 序列号兜底
+    try:
+        x = float(s)
+        dt = pd.to_datetime(x, unit="D", origin="1899-12-30", errors="coerce")
+        if pd.notna(dt):
+            return dt.to_period("M").strftime("%Y-%m")
+    except:
+        pass
+    return None
+
+
+def _parse_month_key(v):
+    # 支持：2025年1月 / 2025年01月 / 2025-01 / 2025/01
+    s = str(v).strip()
+    s = s.replace("年", "-").replace("月", "").replace("/", "-")
+    m = re.search(r"(\d{4})-(\d{1,2})", s)
+    if not m:
+        return None
+    y, mm = int(m.group(1)), int(m.group(2))
+    return f"{y}-{mm:02d}"
+
+
+def is_channel_token(x: str) -> bool:
+    t = str(x).strip().lower()
+    return any(k in t for k in ["tiktok", "amazon", "shopify", "juvera", "亚马逊"])
+
+
+def map_channel(x: str) -> str:
+    t = str(x).strip().lower()
+    if "juvera" in t: return "Juvera"
+    if "tiktok" in t: return "TikTok-US" if "us" in t else "TikTok-UK"
+    if "amazon" in t or "亚马逊" in t:
+        return "亚马逊-US" if ("us" in t or "美国" in t) else "亚马逊-UK"
+    if "shopify" in t: return "Shopify"
+    return "其他"
+
+
+def read_sales(excel_file):
+    from app3 import pick_col
+    s = pd.read_excel(excel_file, sheet_name="销售数据")
+
+    date_col = pick_col(s.columns, ["日期"])
+    b_col    = pick_col(s.columns, ["购货单位", "客户名称", "客户", "customer", "buyer", "buyer_name"])
+    prod_col = pick_col(s.columns, ["产品名称"])
+    rev_col  = pick_col(s.columns, ["销售收入", "收入", "revenue"])
+    cost_col = pick_col(s.columns, ["销售成本", "成本", "cost"])
+    margin_col = pick_col(s.columns, ["销售毛利", "毛利", "margin"])
+    rep_col  = pick_col(s.columns, ["业务员"])
+    chan_col = pick_col(s.columns, ["渠道", "channel"])
+
+    s["月份"] = s[date_col].apply(parse_month_key)
+    s = s[s["月份"].notna()].copy()
+
+    s[rev_col] = pd.to_numeric(s[rev_col], errors="coerce").fillna(0.0)
+    if cost_col:
+        s[cost_col] = pd.to_numeric(s[cost_col], errors="coerce").fillna(0.0)
+    if margin_col:
+        s["销售毛利"] = pd.to_numeric(s[margin_col], errors="coerce").fillna(0.0)
+    elif cost_col:
+        s["销售毛利"] = s[rev_col] - s[cost_col]
+    else:
+        s["销售毛利"] = np.nan
+
+    s[prod_col] = s[prod_col].astype(str).str.strip()
+    s[b_col]    = s[b_col].astype(str).str.strip()
+    s["渠道_mapped"] = s[b_col].apply(map_channel)
+    if chan_col:
+        s["业务类型"] = s[chan_col].astype(str).str.strip()
+    else:
+        s["业务类型"] = s["渠道_mapped"]
+
+    out = pd.DataFrame({
+        "月份": s["月份"],
+        "渠道": s["渠道_mapped"],
+        "业务类型": s["业务类型"],
+        "购货单位": s[b_col],
+        "产品名称": s[prod_col],
+        "销售收入": s[rev_col],
+        "销售毛利": s["销售毛利"]
+    })
+    out["销售成本"] = s[cost_col] if cost_col else np.nan
+    out["业务员"] = s[rep_col].astype(str).str.strip() if rep_col else np.nan
+    return out
+
+
+def top_products(sales, topn=5):
+    g = sales.groupby("产品名称", as_index=False)["销售收入"].sum().sort_values("销售收入", ascending=False)
+    top = g.head(topn).copy()
+    others = g.iloc[topn:]["销售收入"].sum()
+    if others > 0:
+        top = pd.concat([top, pd.DataFrame([{"产品名称": "Others", "销售收入": others}])], ignore_index=True)
+    top["占比"] = top["销售收入"] / top["销售收入"].sum()
+    return top
+
+
+def top_customers(sales, topn=10, sort_by="销售收入"):
+    from app3 import safe_div
+    g = sales.groupby("购货单位", as_index=False).agg({
+        "销售收入": "sum",
+        "销售毛利": "sum",
+        "业务类型": lambda x: x.mode()[0] if not x.mode().empty else "B2B"
+    })
+
+    g["毛利率"] = safe_div(g["销售毛利"], g["销售收入"])
+
+    def get_main_channel(cust_name):
+        c_data = sales[sales["购货单位"] == cust_name]
+        c_grp = c_data.groupby("渠道")["销售收入"].sum().sort_values(ascending=False)
+        if c_grp.empty: return "未知"
+        top_chan = c_grp.index[0]
+        top_rev = c_grp.iloc[0]
+        total_rev = c_grp.sum()
+        if total_rev > 0 and (top_rev / total_rev) < 0.6:
+            return "Multi"
+        return top_chan
+
+    g["渠道"] = g["购货单位"].apply(get_main_channel)
+
+    g = g.sort_values(sort_by, ascending=False).head(topn).reset_index(drop=True)
+    g.index = g.index + 1
+
+    total_rev_all = sales["销售收入"].sum()
+    total_gp_all = sales["销售毛利"].sum()
+
+    g["占比(收入)"] = g["销售收入"] / total_rev_all if total_rev_all else 0.0
+    g["累计占比(收入)"] = g["占比(收入)"].cumsum()
+
+    g["占比(毛利)"] = g["销售毛利"] / total_gp_all if total_gp_all else 0.0
+    g["累计占比(毛利)"] = g["占比(毛利)"].cumsum()
+
+    return g
+
+
+def top_salesreps(sales, topn=10):
+    from app3 import safe_div
+    if "业务员" not in sales.columns or sales["业务员"].isna().all():
+        return pd.DataFrame()
+    g = sales.dropna(subset=["业务员"]).groupby("业务员", as_index=False).agg({
+        "销售收入": "sum",
+        "销售毛利": "sum"
+    })
+    g = g.sort_values("销售收入", ascending=False).head(topn).reset_index(drop=True)
+    g.index = g.index + 1
+    total = sales["销售收入"].sum()
+    g["占比"] = g["销售收入"] / total if total else 0.0
+    g["毛利率"] = safe_div(g["销售毛利"], g["销售收入"])
+    return g
@@ -0,0 +1,105 @@
+# 数据缓存（BoundedCache / budget_cache）：LRU 字节预算、TTL、缓存键口径
+import numpy as np
+import pandas as pd
+
+import app3
+from app3 import BoundedCache
+
+
+def frame(n: int) -> pd.DataFrame:
+    return pd.DataFrame({"x": np.zeros(n, dtype=np.float64)})
+
+
+def test_lru_evicts_oldest_within_byte_budget():
+    size = app3._nbytes(frame(1000))
+    cache = BoundedCache(max_bytes=int(size * 2.5), ttl=3600)
+    for k in "abc":
+        cache.put("t", k, frame(1000))
+    assert cache.get("a") is cache.MISS
+    assert cache.get("b") is not cache.MISS and cache.get("c") is not cache.MISS
+    assert cache.total_bytes <= cache.max_bytes
+
+    cache.get("b")                  # b 变为最近使用，下一次淘汰 c
+    cache.put("t", "d", frame(1000))
+    assert cache.get("c") is cache.MISS
+    assert cache.get("b") is not cache.MISS
+    assert cache.usage() == {"t": {"entries": 2, "bytes": 2 * size}}
+
+
+def test_single_oversized_entry_is_kept():
+    cache = BoundedCache(max_bytes=10, ttl=3600)
+    cache.put("t", "big", frame(1000))
+    assert cache.get("big") is not cache.MISS
+
+
+def test_ttl_expiry(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr(app3.time, "monotonic", lambda: clock[0])
+    cache = BoundedCache(max_bytes=1 << 20, ttl=60)
+    cache.put("t", "a", 1)
+    clock[0] += 59
+    assert cache.get("a") == 1
+    clock[0] += 2
+    assert cache.get("a") is cache.MISS
+    assert cache.total_bytes == 0
+
+
+def test_put_replaces_and_reaccounts():
+    cache = BoundedCache(max_bytes=1 << 30, ttl=3600)
+    cache.put("t", "a", frame(10))
+    cache.put("t", "a", frame(1000))
+    assert cache.total_bytes == app3._nbytes(frame(1000))
+
+
+def test_miss_is_class_sentinel():
+    # 实例放在 cache_resource 里跨重跑存活：哨兵是类属性，不随重跑时重建的模块级对象变化
+    cache = app3.get_data_cache()
+    assert cache.get(("nope",)) is BoundedCache.MISS is cache.MISS
+
+
+def test_budget_cache_key_defaults_and_missing_fp():
+    calls = []
+
+    @app3.budget_cache("t")
+    def load(_book, fp=None, rules: str = "r1"):
+        calls.append(fp)
+        return len(calls)
+
+    assert load.cache_key(object(), fp="f") == load.cache_key(object(), "f", "r1")   # 默认值参与键
+    assert load.cache_key(object(), fp="f") != load.cache_key(object(), fp="f", rules="r2")
+    assert load(object(), fp="f") == load(object(), fp="f") == 1
+
+    # 没有可靠指纹时不缓存
+    for fp in (None, "none", "unknown"):
+        assert load.cache_key(object(), fp=fp) is None
+    load(object())
+    load(object())
+    assert calls == ["f", None, None]
+
+
+def test_concurrent_misses_of_one_key_load_once():
+    import threading
+    import time
+
+    calls, started = [], threading.Event()
+
+    @app3.budget_cache("t_inflight")
+    def load(_book, fp=None):
+        calls.append(fp)
+        started.set()
+        time.sleep(0.2)
+        return frame(len(calls))
+
+    out = {}
+    run = lambda i, fp: out.__setitem__(i, load(object(), fp=fp))
+    first = threading.Thread(target=run, args=(0, "same"))
+    first.start()
+    started.wait(5)
+    others = [threading.Thread(target=run, args=(i, "same")) for i in (1, 2)] + [threading.Thread(target=run, args=(3, "other"))]
+    for t in others:
+        t.start()
+    for t in [first] + others:
+        t.join(5)
+    assert sorted(calls) == ["other", "same"]
+    assert out[0] is out[1] is out[2] and out[3] is not out[0]
+    assert app3.get_data_cache()._inflight == {}
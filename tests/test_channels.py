@@ -0,0 +1,35 @@
+# ChannelMatcher（规则表 + 去重后一次正则分类）与旧的逐行 map_channel / is_channel_token 一致
+import numpy as np
+import pandas as pd
+
+import app3
+from app3 import CHANNEL_MATCHER, WorkbookSession
+from legacy import is_channel_token, map_channel
+
+NAMES = [
+    "Amazon US 店", "amazon uk", "亚马逊美国-", "亚马逊英国", "AMAZON", "TikTok US Shop ", "tiktok uk shop",
+    "TikTok-Amazon US", "Juvera x TikTok", "Shopify 官网 ", "shopify amazon", "juvera amazon shopify",
+    "us 客户", "客户00012贸易有限公司", "", "nan", "Business Trust", "Amazon Australia",
+]
+
+
+def test_classify_matches_legacy_on_edge_names():
+    s = pd.Series(NAMES * 2, dtype=object)
+    assert CHANNEL_MATCHER.classify(s).tolist() == [map_channel(x) for x in NAMES * 2]
+    assert [CHANNEL_MATCHER.matches(x) for x in NAMES] == [is_channel_token(x) for x in NAMES]
+
+
+def test_classify_handles_missing_and_categorical():
+    s = pd.Series(["Amazon US 店", None, np.nan, "Shopify 官网 "], dtype=object)
+    assert CHANNEL_MATCHER.classify(s).tolist() == ["亚马逊-US", "其他", "其他", "Shopify"]
+    cat = pd.Series(NAMES, dtype="category")
+    assert CHANNEL_MATCHER.classify(cat).tolist() == [map_channel(x) for x in NAMES]
+
+
+def test_read_sales_channels_match_legacy(workbook, raw_sales):
+    with WorkbookSession(workbook) as book:
+        sales = app3.read_sales(book)
+    buyers = raw_sales["购货单位"].astype(str).str.strip()
+    expected = buyers.map(map_channel)
+    assert sales["渠道"].astype(object).tolist() == expected.tolist()
+    assert sales["购货单位"].astype(object).tolist() == buyers.tolist()
@@ -0,0 +1,109 @@
+# 销售立方体与看板用的上卷表：上卷（Top 产品 / 客户 / 业务员、季度筛选、各维度合计、行数、路线图指标）与直接对明细汇总的旧实现一致
+import pandas as pd
+import pytest
+
+import app3
+from app3 import WorkbookSession, decode_dims
+import legacy
+
+
+@pytest.fixture(scope="module")
+def both(workbook):
+    with WorkbookSession(workbook) as book:
+        cube = app3.sales_cube(book)
+    return cube, legacy.read_sales(workbook)
+
+
+@pytest.fixture(scope="module")
+def rollups(both):
+    return app3.sales_rollups_frame(both[0])
+
+
+def slices(both, quarter):
+    cube, old = both
+    cq = app3.quarter_filter_month_str(cube, quarter, "月份", year=2025)
+    oq = old[old["月份"].isin([f"2025-{m:02d}" for m in app3.QUARTER_MONTHS.get(quarter, range(1, 13))])]
+    return cq, oq
+
+
+def test_cube_is_smaller_and_row_counts_add_up(both):
+    cube, old = both
+    assert len(cube) < len(old)
+    assert cube["行数"].sum() == len(old)
+    keys = [c for c in app3.SALES_DIMENSIONS + ["期间"] if c in cube.columns]
+    assert not cube.duplicated(keys).any()
+
+
+@pytest.mark.parametrize("quarter", ["Q1", "Q4", "全年"])
+@pytest.mark.parametrize("dim", ["渠道", "业务类型", "购货单位", "产品名称", "业务员", "月份"])
+def test_rollup_matches_detail(both, quarter, dim):
+    cq, oq = slices(both, quarter)
+    got = decode_dims(cq.groupby(dim, as_index=False, observed=True)[["销售收入", "销售毛利", "行数"]].sum())
+    want = oq.groupby(dim, as_index=False).agg(销售收入=("销售收入", "sum"), 销售毛利=("销售毛利", "sum"), 行数=("销售收入", "size"))
+    assert got[dim].tolist() == want[dim].tolist()
+    assert got["行数"].tolist() == want["行数"].tolist()
+    pd.testing.assert_frame_equal(got[["销售收入", "销售毛利"]], want[["销售收入", "销售毛利"]], check_exact=False)
+
+
+@pytest.mark.parametrize("quarter", ["Q2", "全年"])
+def test_top_products_on_cube_matches_legacy(both, quarter):
+    cq, oq = slices(both, quarter)
+    got, want = app3.top_products(cq, topn=8), legacy.top_products(oq, topn=8)
+    assert got["产品名称"].tolist() == want["产品名称"].tolist()
+    pd.testing.assert_frame_equal(got[["销售收入", "占比"]], want[["销售收入", "占比"]], check_exact=False)
+
+
+@pytest.mark.parametrize("quarter", ["Q3", "全年"])
+def test_top_salesreps_on_cube_matches_legacy(both, quarter):
+    cq, oq = slices(both, quarter)
+    got, want = app3.top_salesreps(cq, topn=10), legacy.top_salesreps(oq, topn=10)
+    assert got["业务员"].tolist() == want["业务员"].tolist()
+    pd.testing.assert_frame_equal(got[["销售收入", "销售毛利", "占比", "毛利率"]], want[["销售收入", "销售毛利", "占比", "毛利率"]],
+                                  check_exact=False)
+
+
+def test_rollups_are_small_and_keep_every_row(both, rollups):
+    cube, old = both
+    for name, r in rollups._asdict().items():
+        assert r["行数"].sum() == len(old), name
+        assert r["销售收入"].sum() == pytest.approx(old["销售收入"].sum()), name
+        assert len(r) < len(cube), name
+    # 客户表按季度汇总：期间都落在季度首月
+    assert (rollups.customer["期间"] % 3 == 0).all()
+    assert app3.primary_year(rollups.channel) == app3.primary_year(cube) == 2025
+
+
+@pytest.mark.parametrize("quarter", ["Q1", "Q3", "全年"])
+def test_views_on_rollups_match_legacy(both, rollups, quarter):
+    _, oq = slices(both, quarter)
+    rq = rollups.slice(quarter, 2025)
+    got, want = app3.top_products(rq.product, topn=8), legacy.top_products(oq, topn=8)
+    assert got["产品名称"].tolist() == want["产品名称"].tolist()
+    assert got["销售收入"].tolist() == pytest.approx(want["销售收入"].tolist())
+    got, want = app3.top_salesreps(rq.rep, topn=10), legacy.top_salesreps(oq, topn=10)
+    assert got["业务员"].tolist() == want["业务员"].tolist()
+    assert got["占比"].tolist() == pytest.approx(want["占比"].tolist())
+    got, want = app3.top_customers(app3.CustomerAnalytics(rq.customer), topn=10), legacy.top_customers(oq, topn=10)
+    assert got["购货单位"].tolist() == want["购货单位"].tolist()
+    assert got["渠道"].tolist() == want["渠道"].tolist() and got["业务类型"].tolist() == want["业务类型"].tolist()
+    assert got["累计占比(收入)"].tolist() == pytest.approx(want["累计占比(收入)"].tolist())
+    trend = decode_dims(rq.channel.groupby(["月份", "渠道"], as_index=False, observed=True)["销售收入"].sum())
+    want = oq.groupby(["月份", "渠道"], as_index=False)["销售收入"].sum()
+    assert trend[["月份", "渠道"]].values.tolist() == want[["月份", "渠道"]].values.tolist()
+    assert trend["销售收入"].tolist() == pytest.approx(want["销售收入"].tolist())
+
+
+@pytest.mark.parametrize("channel", ["亚马逊-US", "Shopify", "其他"])
+@pytest.mark.parametrize("quarter", ["Q2", "全年"])
+def test_roadmap_metrics_on_rollups_match_detail(workbook, both, rollups, quarter, channel):
+    _, oq = slices(both, quarter)
+    with WorkbookSession(workbook) as book:
+        annual, plat, opex = app3.read_annual_profit(book), app3.read_platform_selling_exp(book), app3.read_opex(book)
+    profit_q = app3.quarter_filter_month_str(annual, quarter, "月份", year=2025)
+    got = app3.roadmap_metrics(rollups, annual, profit_q, plat, opex, 0.0, quarter, channel, 2025, 0.0)
+    d = oq if channel == "其他" else oq[oq["渠道"] == channel]
+    rev = d["销售收入"].sum()
+    assert got["gm"] == pytest.approx(d["销售毛利"].sum() / rev)
+    assert got["top1_product_share"] == pytest.approx(d.groupby("产品名称")["销售收入"].sum().max() / rev)
+    share = d.groupby("购货单位")["销售收入"].sum().max() / rev
+    assert got["top1_customer_share"] == (pytest.approx(share) if share < 0.99 else None)
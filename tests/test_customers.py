@@ -0,0 +1,91 @@
+# CustomerAnalytics（一次 客户 × 渠道 × 业务类型 分组）派生的 Top 客户与旧的逐客户 top_customers 一致
+import pandas as pd
+import pytest
+
+import app3
+from app3 import WorkbookSession
+import legacy
+
+COLS = ["购货单位", "销售收入", "销售毛利", "业务类型", "毛利率", "渠道", "占比(收入)", "累计占比(收入)", "占比(毛利)", "累计占比(毛利)"]
+
+
+@pytest.fixture(scope="module")
+def both(workbook):
+    with WorkbookSession(workbook) as book:
+        cube = app3.sales_cube(book)
+        sales = app3.read_sales(book)
+    return cube, sales, legacy.read_sales(workbook)
+
+
+def assert_same(got: pd.DataFrame, want: pd.DataFrame):
+    assert got["购货单位"].tolist() == want["购货单位"].tolist()
+    assert got["业务类型"].tolist() == want["业务类型"].tolist()
+    assert got["渠道"].tolist() == want["渠道"].tolist()
+    assert list(got.index) == list(want.index)
+    num = [c for c in COLS if c not in ("购货单位", "业务类型", "渠道")]
+    pd.testing.assert_frame_equal(got[num], want[num], check_exact=False)
+
+
+@pytest.mark.parametrize("source", ["cube", "detail"])
+@pytest.mark.parametrize("sort_by", ["销售收入", "销售毛利"])
+@pytest.mark.parametrize("quarter", ["Q1", "Q4", "全年"])
+def test_top_customers_match_legacy(both, source, sort_by, quarter):
+    cube, sales, old = both
+    data = cube if source == "cube" else sales
+    q = app3.quarter_filter_month_str(data, quarter, "月份", year=2025)
+    oq = old[old["月份"].isin([f"2025-{m:02d}" for m in app3.QUARTER_MONTHS.get(quarter, range(1, 13))])]
+    ca = app3.CustomerAnalytics(q)
+    assert_same(app3.top_customers(ca, topn=10, sort_by=sort_by), legacy.top_customers(oq, topn=10, sort_by=sort_by))
+
+
+def test_all_customers_match_legacy(both):
+    cube, _, old = both
+    got = app3.top_customers(app3.CustomerAnalytics(cube), topn=None)
+    want = legacy.top_customers(old, topn=len(old))
+    assert_same(got, want)
+
+
+def test_multi_channel_and_ties_match_legacy():
+    # 生成的数据里渠道由客户名决定，这里手工构造：多渠道（Multi / 单一渠道占优）、业务类型并列、收入为零
+    rows = [
+        ("甲", "亚马逊-US", "B2C", 50.0, 10.0), ("甲", "Shopify", "B2B", 30.0, 6.0), ("甲", "TikTok-UK", "B2C", 20.0, 4.0),
+        ("乙", "亚马逊-UK", "B2B", 70.0, 7.0), ("乙", "Juvera", "B2C", 30.0, 3.0),
+        ("丙", "其他", "B2C", 40.0, 8.0), ("丙", "其他", "B2B", 40.0, 8.0),
+        ("丁", "Shopify", "B2B", 5.0, -1.0), ("丁", "Juvera", "B2B", -5.0, 1.0),
+    ]
+    old = pd.DataFrame(rows, columns=["购货单位", "渠道", "业务类型", "销售收入", "销售毛利"])
+    got = app3.top_customers(app3.CustomerAnalytics(old), topn=None)
+    want = legacy.top_customers(old, topn=len(old))
+    assert_same(got, want)
+    assert got.set_index("购货单位")["渠道"].to_dict() == {"甲": "Multi", "乙": "亚马逊-UK", "丙": "其他", "丁": "Shopify"}
+
+
+def test_type_mix_matches_detail(both):
+    cube, _, old = both
+    ca = app3.CustomerAnalytics(cube)
+    names = app3.top_customers(ca, topn=5)["购货单位"].tolist()
+    got = ca.type_mix(names).sort_values(["购货单位", "业务类型"], ignore_index=True)
+    want = (old[old["购货单位"].isin(names)].groupby(["购货单位", "业务类型"], as_index=False)["销售收入"].sum()
+            .sort_values(["购货单位", "业务类型"], ignore_index=True))
+    assert got[["购货单位", "业务类型"]].astype(str).values.tolist() == want[["购货单位", "业务类型"]].values.tolist()
+    assert got["销售收入"].tolist() == pytest.approx(want["销售收入"].tolist())
+
+
+def test_panel_and_prefetch_share_one_engine(both, monkeypatch):
+    cube = both[0]
+    q = app3.quarter_filter_month_str(cube, "Q2", "月份", year=2025)
+    built = []
+
+    class Counting(app3.CustomerAnalytics):
+        def __init__(self, sales):
+            built.append(1)
+            super().__init__(sales)
+
+    monkeypatch.setattr(app3, "CustomerAnalytics", Counting)
+    ca = app3.customer_analytics(q, fp="fp-share", quarter="Q2")
+    for sort_by in ("销售收入", "销售毛利"):
+        figs = app3.customer_figures(q, "Q2", sort_by, fp="fp-share")
+        figs["matrix"][1]()
+    assert app3.customer_analytics(q, fp="fp-share", quarter="Q2") is ca
+    assert len(built) == 1
+    assert app3._nbytes(ca) >= ca.grid.memory_usage(deep=True).sum()
@@ -0,0 +1,43 @@
+# normalize_month_keys（去重 + 向量化）与旧的逐行 parse_month_key / _parse_month_key 逐值一致
+import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app3 import normalize_month_keys, read_annual_profit, WorkbookSession
+from legacy import parse_month_key, _parse_month_key
+
+MIXED = [
+    datetime.datetime(2025, 3, 4, 12, 30), datetime.date(2024, 12, 31), pd.Timestamp("2025-07-01"),
+    np.datetime64("2025-02-15"), pd.NaT, None, np.nan, "",
+    "2025年7月", "2025年07月", "2025/1", "2025/01", "2025-01月", "2025-1", " 2025-11 ", "2025-10-05 00:00:00",
+    "45678", "45678.5", 45678, 45678.25, 0, -3.0, 1e12, "abc", "合计", "7月", True,
+]
+
+
+@pytest.mark.parametrize("excel_serial,legacy", [(True, parse_month_key), (False, _parse_month_key)])
+def test_mixed_values_match_legacy(excel_serial, legacy):
+    got = normalize_month_keys(pd.Series(MIXED * 3, dtype=object), excel_serial=excel_serial).tolist()
+    assert got == [legacy(v) for v in MIXED * 3]
+
+
+def test_sales_dates_match_legacy(raw_sales):
+    dates = raw_sales["日期"]
+    got = normalize_month_keys(dates)
+    assert got.index.equals(dates.index)
+    assert got.tolist() == [parse_month_key(v) for v in dates]
+
+
+def test_annual_profit_months_match_legacy(workbook):
+    raw = pd.read_excel(workbook, sheet_name="年度利润", header=2, engine="openpyxl")
+    expected = [m for m in (parse_month_key(v) for v in raw["月份"]) if m is not None]
+    with WorkbookSession(workbook) as book:
+        assert read_annual_profit(book)["月份"].tolist() == expected
+
+
+def test_datetime_column_matches_legacy():
+    dates = pd.Series([pd.Timestamp("2025-01-31 23:59:59"), pd.NaT, pd.Timestamp("2024-12-01"), pd.Timestamp("2025-01-01")] * 5, index=range(100, 120))
+    got = normalize_month_keys(dates)
+    assert got.index.equals(dates.index)
+    assert got.tolist() == [parse_month_key(v) for v in dates]
@@ -0,0 +1,79 @@
+# 并行预解析：销售表按整行字节区间切分，拼回后与顺序解析一致；上传文件只落一次临时文件；失败记日志后退回顺序流程
+import io
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import pytest
+
+import app3
+from app3 import WorkbookSession, compact_sales, decode_dims
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """线程池代替进程池（任务函数与进程池里执行的相同），并让小工作簿也按区间切分"""
+    monkeypatch.setattr(app3, "get_parse_pool", lambda workers: ThreadPoolExecutor(workers))
+    monkeypatch.setattr(app3, "PARSE_SPLIT_MIN_ROWS", 500)
+    tasks = []
+    run = app3.run_parse_task
+    monkeypatch.setattr(app3, "run_parse_task", lambda task: (tasks.append(task), run(task))[1])
+    return tasks
+
+
+@pytest.mark.parametrize("parts", [2, 5, 64])
+def test_byte_ranges_cover_every_row_once(workbook, tmp_path, parts):
+    with WorkbookSession(workbook) as book:
+        rd = book.xml_reader()
+        part = rd.part(book.layout().get("sales").sheet)
+        want = list(rd.iter_rows(book.layout().get("sales").sheet))
+        path = str(tmp_path / "sheet.xml")
+        ranges = app3._split_sheet_xml(book.zip(), part, path, parts)
+    assert len(ranges) == parts
+    assert ranges[0][0] == 0 and ranges[-1][1] == os.path.getsize(path)
+    assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+    got = []
+    with open(path, "rb") as fh:
+        for lo, hi, first in ranges:
+            fh.seek(lo)
+            got += list(app3._xml_rows(fh, first, hi - lo))
+    assert got == want
+
+
+@pytest.mark.parametrize("upload", [False, True])
+def test_prefetch_matches_sequential_read(workbook, pool, upload):
+    src = io.BytesIO(open(workbook, "rb").read()) if upload else workbook
+    with WorkbookSession(src, fp="并行测试") as book:
+        app3.prefetch_parallel(book, 4)
+        fps = {role: book.role_fp(role) for role in app3.ROLE_LOADERS}
+    sales_tasks = [t for t in pool if t["kind"] == "sales_rows"]
+    assert len(sales_tasks) == 4
+    # 子进程只拿到路径：上传文件写到同一个临时文件，任务里没有整份字节
+    assert len({t["src"] for t in pool}) == 1 and all(isinstance(t["src"], str) for t in pool)
+    assert not os.path.exists(sales_tasks[0]["xml"])   # 临时目录用完即删
+    if upload:
+        assert not os.path.exists(pool[0]["src"])
+
+    cache = app3.get_data_cache()
+    key = app3.read_sales.cache_key(book, fp=fps["sales"])
+    got = cache.get(key)
+    assert got is not cache.MISS
+    with WorkbookSession(workbook) as book:
+        want = app3.read_sales(book)
+    pd.testing.assert_frame_equal(decode_dims(got.reset_index(drop=True)), decode_dims(want.reset_index(drop=True)))
+
+
+def test_failed_task_is_logged_and_left_to_sequential(workbook, monkeypatch, caplog):
+    monkeypatch.setattr(app3, "get_parse_pool", lambda workers: ThreadPoolExecutor(workers))
+
+    def boom(task):
+        raise RuntimeError(f"坏任务 {task['kind']}")
+    monkeypatch.setattr(app3, "run_parse_task", boom)
+    with caplog.at_level(logging.ERROR, logger=app3.logger.name):
+        with WorkbookSession(workbook, fp="失败测试") as book:
+            app3.prefetch_parallel(book, 2)
+            key = app3.read_sales.cache_key(book, fp=book.role_fp("sales"))
+    failed = [r for r in caplog.records if "并行解析任务失败" in r.getMessage()]
+    assert failed and all(r.exc_info for r in failed)
+    assert app3.get_data_cache().get(key) is app3.get_data_cache().MISS
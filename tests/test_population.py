@@ -0,0 +1,43 @@
+# 全部客户效率矩阵：长尾聚合点带网格编号，框选聚合点能还原成其中的全部客户
+import pytest
+
+import app3
+from app3 import CustomerAnalytics, WorkbookSession, customer_population_matrix, population_split, selected_buyers
+
+
+@pytest.fixture(scope="module")
+def ca(workbook):
+    with WorkbookSession(workbook) as book:
+        return CustomerAnalytics(app3.read_sales(book))
+
+
+def event(fig, picks):
+    """模拟 st.plotly_chart 的选择事件：picks 为 [(trace 序号, 点序号)]"""
+    points = [{"curve_number": t, "point_index": i, "customdata": fig.data[t].customdata[i].tolist()} for t, i in picks]
+    return {"selection": {"points": points}}
+
+
+def test_bins_cover_the_tail(ca):
+    fig = customer_population_matrix(ca, limit=50, bins=8)
+    head, tail = population_split(ca, limit=50, bins=8)
+    assert len(head) == 50 and len(tail) > 0
+    agg = fig.data[0]
+    assert len(agg.customdata) == tail["bin"].nunique()
+    assert sorted(agg.customdata[:, 0]) == sorted(tail["bin"].unique())
+
+
+def test_selected_bins_map_back_to_member_buyers(ca):
+    fig = customer_population_matrix(ca, limit=50, bins=8)
+    head, tail = population_split(ca, limit=50, bins=8)
+    picks = [(0, 0), (0, 1), (1, 0)]
+    names = selected_buyers(event(fig, picks), ca, limit=50, bins=8)
+    cells = {int(fig.data[0].customdata[i][0]) for i in (0, 1)}
+    members = tail.loc[tail["bin"].isin(cells), "购货单位"].tolist()
+    assert names == [fig.data[1].customdata[0][0]] + members
+    assert set(members) <= set(tail["购货单位"]) and not set(members) & set(head["购货单位"])
+
+
+def test_without_analytics_only_plotted_buyers_are_returned(ca):
+    fig = customer_population_matrix(ca, limit=50, bins=8)
+    assert selected_buyers(event(fig, [(0, 0), (1, 0), (1, 0)])) == [fig.data[1].customdata[0][0]]
+    assert selected_buyers(None) == []
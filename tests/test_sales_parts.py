@@ -0,0 +1,148 @@
+# 销售数据按月分区导入：首次导入 / 复用 / 重排共享字符串 / 改一个值 / 乱序行，结果都与流式读取、旧的逐行实现一致
+import os
+import re
+import zipfile
+
+import pandas as pd
+import pytest
+
+import app3
+from app3 import WorkbookSession, compact_sales, decode_dims
+import legacy
+
+ROW_RE = re.compile(rb'<row r="(\d+)"([^>]*)>(.*?)</row>', re.S)
+SI_RE = re.compile(rb"<si>.*?</si>", re.S)
+SST_V_RE = re.compile(rb'(t="s"><v>)(\d+)(</v>)')
+
+
+@pytest.fixture(autouse=True)
+def partitioned(monkeypatch):
+    """小工作簿也走分区导入"""
+    monkeypatch.setattr(app3, "SALES_STREAM_MIN_ROWS", 1)
+
+
+def rewrite(src: str, dst: str, edit) -> str:
+    """复制 xlsx，edit(条目名, 字节, 销售 sheet 的条目名) 返回改写后的字节"""
+    with WorkbookSession(src) as book:
+        sheet = book.xml_reader().part(book.layout().get("sales").sheet)
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            zout.writestr(info, edit(info.filename, zin.read(info.filename), sheet))
+    return dst
+
+
+def read(path: str):
+    """(分区导入结果, 流式读取结果, 分区日志标签)"""
+    with WorkbookSession(path) as book:
+        lay = book.layout().get("sales")
+        part = app3._read_sales_partitioned(book, lay)
+        label = [k for k in book.timings if "分区" in k]
+        stream = app3._read_sales_streaming(book, lay)
+    assert part is not None
+    return compact_sales(part), compact_sales(stream), label
+
+
+def assert_same(part: pd.DataFrame, stream: pd.DataFrame):
+    pd.testing.assert_frame_equal(decode_dims(part.copy()), decode_dims(stream.copy()))
+
+
+def test_cold_then_warm_reuses_every_month(workbook):
+    cold, stream, label = read(workbook)
+    assert_same(cold, stream)
+    assert label == ["销售数据（分区：首次导入 12 月）"]
+    warm, _, label = read(workbook)
+    assert_same(warm, stream)
+    assert label == ["销售数据（分区：复用 12 月 / 解析 0 月）"]
+
+
+def test_read_sales_through_partitions_matches_legacy(workbook):
+    old = legacy.read_sales(workbook)
+    for _ in range(2):   # 首次导入、全部复用
+        app3.get_data_cache().clear()
+        with WorkbookSession(workbook) as book:
+            new = decode_dims(app3.read_sales(book).drop(columns="期间"))
+        for c in old.columns:
+            assert new[c].tolist() == old[c].tolist(), c
+
+
+def test_reordered_shared_strings_reuse_every_month(workbook, tmp_path):
+    def edit(name, data, sheet):
+        if name == "xl/sharedStrings.xml":
+            items = SI_RE.findall(data)
+            head, tail = data.split(items[0], 1)[0], data.rsplit(items[-1], 1)[1]
+            return head + b"".join(reversed(items)) + tail
+        if name == sheet:
+            n = len(SI_RE.findall(shared))
+            return SST_V_RE.sub(lambda m: m.group(1) + str(n - 1 - int(m.group(2))).encode() + m.group(3), data)
+        return data
+
+    with zipfile.ZipFile(workbook) as z:
+        shared = z.read("xl/sharedStrings.xml")
+    read(workbook)
+    _, stream, _ = read(workbook)
+    part, stream2, label = read(rewrite(workbook, str(tmp_path / "重排.xlsx"), edit))
+    assert label == ["销售数据（分区：复用 12 月 / 解析 0 月）"]
+    assert_same(stream2, stream)
+    assert_same(part, stream2)
+
+
+def test_one_changed_value_reparses_one_month(workbook, tmp_path):
+    def edit(name, data, sheet):
+        if name != sheet:
+            return data
+        return re.sub(rb'(<c r="E100"[^>]*><v>)[^<]*', rb"\g<1>123456.5", data, count=1)
+
+    read(workbook)
+    part, stream, label = read(rewrite(workbook, str(tmp_path / "改值.xlsx"), edit))
+    assert label == ["销售数据（分区：复用 11 月 / 解析 1 月）"]
+    assert_same(part, stream)
+    assert (decode_dims(part.copy())["销售收入"] == 123456.5).sum() == 1
+
+
+def test_unsorted_rows_keep_sheet_order(workbook, tmp_path):
+    def edit(name, data, sheet):
+        if name != sheet:
+            return data
+        rows = ROW_RE.findall(data)
+        first, last = rows[1], rows[-1]   # 第一条明细（1 月）与最后一条（12 月）对调
+
+        def swap(m):
+            if m.group(1) not in (first[0], last[0]):
+                return m.group(0)
+            src = last if m.group(1) == first[0] else first
+            inner = re.sub(rb'r="([A-Z]+)\d+"', lambda c: b'r="' + c.group(1) + m.group(1) + b'"', src[2])
+            return b'<row r="' + m.group(1) + b'"' + m.group(2) + b">" + inner + b"</row>"
+        return ROW_RE.sub(swap, data)
+
+    read(workbook)
+    part, stream, label = read(rewrite(workbook, str(tmp_path / "乱序.xlsx"), edit))
+    assert label == ["销售数据（分区：复用 10 月 / 解析 2 月）"]
+    assert_same(part, stream)
+    months = decode_dims(part.copy())["月份"]
+    assert months.iloc[0] > months.iloc[-1]
+
+
+def test_falls_back_when_partition_file_is_corrupt(workbook):
+    read(workbook)
+    for name in app3.os.listdir(app3.SALES_PART_DIR):
+        with open(app3.os.path.join(app3.SALES_PART_DIR, name), "wb") as f:
+            f.write(b"broken")
+    with WorkbookSession(workbook) as book:
+        assert app3._read_sales_partitioned(book, book.layout().get("sales")) is None
+
+
+def test_force_refresh_clears_this_sources_snapshots(tmp_path):
+    from conftest import make_workbook
+    path, other = (make_workbook(str(tmp_path / f"{n}.xlsx"), rows=600, seed=s) for n, s in (("强制刷新", 11), ("其他", 12)))
+    dirs = {}
+    for p in (path, other):
+        fp = app3.file_fingerprint(p)
+        app3.load_all_dashboard_data(p, fp=fp)
+        with WorkbookSession(p, fp=fp) as book:
+            dirs[p] = {app3._snapshot_dir(book.role_fp(r)) for r in app3.ROLE_SPECS} - dirs.get(path, set())
+    assert any(os.path.isdir(d) for d in dirs[path]) and any(os.path.isdir(d) for d in dirs[other])
+    assert any(f.endswith(".arrow") for f in os.listdir(app3.SALES_PART_DIR))
+    app3.clear_source_snapshots(path, app3.file_fingerprint(path))
+    assert not any(os.path.isdir(d) for d in dirs[path])
+    assert any(os.path.isdir(d) for d in dirs[other])
+    assert not os.path.exists(app3.SALES_PART_DIR)
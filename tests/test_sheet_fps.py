@@ -0,0 +1,67 @@
+# sheet 级指纹：只计入各表自己引用的共享字符串，改某张表用到的文本只让这张表失效
+import re
+import zipfile
+
+import pytest
+
+import app3
+from app3 import WorkbookSession
+
+SI_RE = re.compile(rb"<si>.*?</si>", re.S)
+
+
+def fingerprints(path: str) -> dict:
+    with WorkbookSession(path, fp=app3.file_fingerprint(path)) as book:
+        return {role: book.role_fp(role) for role in app3.ROLE_SPECS}
+
+
+def string_refs(path: str) -> dict:
+    """{sheet 名: 它引用的共享字符串下标集合}"""
+    with WorkbookSession(path, fp=app3.file_fingerprint(path)) as book:
+        return {name: set(app3.sheet_string_refs(book, part).tolist()) for name, part in book.xml_reader().parts.items()}
+
+
+def edit_shared_string(src: str, dst: str, index: int, text: bytes) -> str:
+    """复制 xlsx，把第 index 个共享字符串改成 text（只改 sharedStrings.xml）"""
+    with zipfile.ZipFile(src) as zin, zipfile.ZipFile(dst, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            data = zin.read(info.filename)
+            if info.filename == "xl/sharedStrings.xml":
+                items = SI_RE.findall(data)
+                head, rest = data.split(items[index], 1)
+                data = head + b"<si><t>" + text + b"</t></si>" + rest
+            zout.writestr(info, data)
+    return dst
+
+
+def only_in(refs: dict, sheet: str) -> int:
+    others = set().union(*(v for k, v in refs.items() if k != sheet))
+    return min(refs[sheet] - others)
+
+
+def test_refs_match_cells(workbook):
+    refs = string_refs(workbook)
+    with WorkbookSession(workbook) as book:
+        rd = book.xml_reader()
+        with zipfile.ZipFile(workbook) as z:
+            for name, part in rd.parts.items():
+                want = {int(x) for x in re.findall(rb'<c [^>]*t="s"[^>]*><v>(\d+)</v>', z.read(part))}
+                assert refs[name] == want, name
+
+
+@pytest.mark.parametrize("sheet, role", [("银行余额", "bank"), ("销售数据", "sales"), ("年度利润", "annual_profit")])
+def test_text_change_invalidates_only_its_sheet(workbook, tmp_path, sheet, role):
+    before = fingerprints(workbook)
+    edited = edit_shared_string(workbook, str(tmp_path / "改文本.xlsx"), only_in(string_refs(workbook), sheet), "改过的文本".encode())
+    after = fingerprints(edited)
+    assert [r for r in before if before[r] != after[r]] == [role]
+
+
+def test_unreadable_shared_strings_fall_back_to_whole_file(workbook, tmp_path, monkeypatch):
+    index = only_in(string_refs(workbook), "银行余额")
+    app3.get_data_cache().clear()
+    monkeypatch.setattr(app3, "READER_BACKEND", "openpyxl")
+    before = fingerprints(workbook)
+    edited = edit_shared_string(workbook, str(tmp_path / "改文本.xlsx"), index, b"x")
+    after = fingerprints(edited)
+    assert all(before[r] != after[r] for r in before if before[r] is not None)
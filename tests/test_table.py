@@ -0,0 +1,51 @@
+# 大表分页：排序在服务端对整表进行后再取页，不是只排当前页
+import numpy as np
+import pandas as pd
+import pytest
+
+from app3 import table_page
+
+
+@pytest.fixture
+def frame():
+    rng = np.random.default_rng(0)
+    rev = rng.normal(1000, 300, 950)
+    rev[[5, 500]] = np.nan
+    return pd.DataFrame({"购货单位": [f"客户{i:04d}" for i in range(950)], "销售收入": rev, "毛利率": rng.random(950)})
+
+
+def test_sort_applies_to_whole_table_before_paging(frame):
+    pages = [table_page(frame, p, 200, "销售收入") for p in range(1, 6)]
+    got = pd.concat(pages)
+    assert len(got) == len(frame) and got.index.is_unique
+    want = frame["销售收入"].sort_values(ascending=False, na_position="last")
+    assert got["销售收入"].tolist()[:-2] == want.tolist()[:-2]
+    assert got["销售收入"].iloc[-2:].isna().all()
+    assert pages[0]["销售收入"].iloc[0] == frame["销售收入"].max()
+    assert pages[1]["销售收入"].max() <= pages[0]["销售收入"].min()
+
+
+def test_ascending_and_original_order(frame):
+    asc = table_page(frame, 1, 200, "毛利率", descending=False)
+    assert asc["毛利率"].iloc[0] == frame["毛利率"].min() and asc["毛利率"].is_monotonic_increasing
+    assert table_page(frame, 2, 200).equals(frame.iloc[200:400])
+    assert table_page(frame, 1, 200, "不存在的列").equals(frame.iloc[:200])
+
+
+def test_render_table_sort_control_sorts_every_page():
+    from streamlit.testing.v1 import AppTest
+
+    def page():
+        import numpy as np
+        import pandas as pd
+        import app3
+        rev = np.arange(450, dtype=float)
+        app3.render_table(pd.DataFrame({"客户": [f"c{i}" for i in range(450)], "销售收入": rev}),
+                          money=["销售收入"], page_rows=200, key="t")
+
+    at = AppTest.from_function(page, default_timeout=60).run()
+    assert at.dataframe[0].value["销售收入"].iloc[0] == 0
+    at.selectbox(key="t_sort").set_value("销售收入").run()
+    assert at.dataframe[0].value["销售收入"].iloc[0] == 449
+    at.number_input(key="t_page").set_value(3).run()
+    assert at.dataframe[0].value["销售收入"].tolist() == list(range(49, -1, -1))
@@ -0,0 +1,107 @@
+# 文件监视：预热未完成时前台只读缓存（新内容不写在旧指纹名下）；不再被任何会话使用的路径停掉监视线程
+import os
+import shutil
+
+import pytest
+
+import app3
+from app3 import WorkbookSession, cache_read_only
+
+pytest.importorskip("watchdog")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(app3.time, "monotonic", lambda: now[0])
+    return now
+
+
+def snapshot_files():
+    return sorted(f for _, _, files in os.walk(app3.SNAPSHOT_DIR) for f in files)
+
+
+def test_read_only_load_does_not_write_cache_or_snapshots(workbook):
+    cache = app3.get_data_cache()
+    with cache_read_only() as ro, WorkbookSession(workbook, fp="旧指纹") as book:
+        key = app3.read_annual_profit.cache_key(book, fp=book.role_fp("annual_profit"))
+        fresh = app3.read_annual_profit(book, fp=book.role_fp("annual_profit"))
+    assert ro.missed
+    assert cache.get(key) is cache.MISS and not cache.usage()
+    assert snapshot_files() == []
+
+    with cache_read_only(False) as off, WorkbookSession(workbook, fp="旧指纹") as book:
+        assert off is None
+        cached = app3.read_annual_profit(book, fp=book.role_fp("annual_profit"))
+    assert cache.get(key) is cached and snapshot_files()
+    with cache_read_only() as ro, WorkbookSession(workbook, fp="旧指纹") as book:
+        assert app3.read_annual_profit(book, fp=book.role_fp("annual_profit")) is cached
+    assert not ro.missed
+    assert fresh.equals(cached)
+
+
+def test_read_only_load_skips_parallel_prefetch(workbook, monkeypatch):
+    monkeypatch.setattr(app3, "get_parse_pool", lambda workers: pytest.fail("只读取数不应分发到进程池"))
+    with cache_read_only(), WorkbookSession(workbook, fp="旧指纹") as book:
+        app3.prefetch_parallel(book, 4)
+
+
+def test_released_and_idle_paths_stop_their_observers(workbook, tmp_path, clock):
+    a, b = str(tmp_path / "a.xlsx"), str(tmp_path / "b.xlsx")
+    shutil.copy(workbook, a)
+    shutil.copy(workbook, b)
+    pool = app3.WatcherPool()
+    wa = pool.get(a, "会话1")
+    assert pool.get(a, "会话2") is wa
+    wb = pool.get(b, "会话1")
+
+    pool.release(a, "会话1")          # 会话 1 换到 b，会话 2 仍在用 a
+    assert pool.paths() == [a, b] and wa._observer.is_alive()
+
+    clock[0] += app3.WATCH_IDLE_S + 1  # 会话 2 关掉了页面，之后只有会话 1 在轮询 b
+    wb.seen("会话1")
+    pool.sweep()
+    assert pool.paths() == [b]
+    wa._observer.join(5)
+    assert not wa._observer.is_alive() and wb._observer.is_alive()
+
+    pool.release(b, "会话1")
+    assert pool.paths() == []
+    wb._observer.join(5)
+    assert not wb._observer.is_alive()
+    wb.touch()                        # 停掉之后的事件不再触发预热
+    assert not wb.pending and wb._timer is None
+
+
+def test_failed_warm_up_retries_then_switches_instead_of_staying_pending(workbook, tmp_path, monkeypatch):
+    path = str(tmp_path / "w.xlsx")
+    shutil.copy(workbook, path)
+    calls = []
+
+    def broken(p, fp):
+        calls.append(fp)
+        raise OSError("磁盘暂时不可读")
+
+    monkeypatch.setattr(app3, "warm_dashboard_data", broken)
+    monkeypatch.setattr(app3.WorkbookWatcher, "touch", lambda self: setattr(self, "pending", True))
+    w = app3.WorkbookWatcher(path)
+    try:
+        os.utime(path, ns=(0, 0))
+        for _ in range(app3.WATCH_RETRIES):
+            w.touch()
+            w._reload()
+            assert w.pending and w.version == 0   # 重试中：仍是旧版本
+        w._reload()
+        assert not w.pending and w.version == 1 and w.fp == app3.file_fingerprint(path)
+        assert len(calls) == app3.WATCH_RETRIES + 1
+    finally:
+        w.stop()
+
+
+def test_warm_up_fills_the_sales_cube(workbook):
+    fp = app3.file_fingerprint(workbook)
+    app3.warm_dashboard_data(workbook, fp)
+    cache = app3.get_data_cache()
+    with WorkbookSession(workbook, fp=fp) as book:
+        key = app3.sales_cube.cache_key(book, fp=book.role_fp("sales"))
+    assert cache.get(key) is not cache.MISS
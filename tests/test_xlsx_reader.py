@@ -0,0 +1,92 @@
+# XlsxStreamReader（流式 XML 后端）与 openpyxl 读取口径一致；_xHHHH_ 转义按 OOXML 规则解码
+import pandas as pd
+import pytest
+
+import app3
+import gen_workbook
+from app3 import WorkbookSession
+
+ESCAPED = {
+    "a_x000D_b": "a\rb",
+    "tab_x0009_c": "tab\tc",
+    "_x4E2D_文": "中文",
+    "literal_x005F_x000D_d": "literal_x000D_d",   # _x005F_ 是字面的 "_"，其后的 x000D_ 不再解码
+    "bad_xZZZZ_": "bad_xZZZZ_",
+    "plain": "plain",
+}
+
+
+def sheets(path):
+    with pd.ExcelFile(path, engine="openpyxl") as x:
+        return x.sheet_names
+
+
+def test_raw_sheets_match_openpyxl(workbook):
+    with WorkbookSession(workbook) as book:
+        rd = book.xml_reader()
+        for sheet in sheets(workbook):
+            want = pd.read_excel(workbook, sheet_name=sheet, header=None, engine="openpyxl")
+            pd.testing.assert_frame_equal(rd.raw(sheet), want, obj=sheet)
+
+
+@pytest.mark.parametrize("chunk_rows", [700, 50_000])
+def test_iter_chunks_match_openpyxl(workbook, monkeypatch, chunk_rows):
+    with WorkbookSession(workbook) as book:
+        lay = book.layout().get("sales")
+        got = list(book.xml_reader().iter_chunks(lay.sheet, lay.header_row, chunk_rows))
+    monkeypatch.setattr(WorkbookSession, "xml_reader", lambda self: None)
+    with WorkbookSession(workbook) as book:
+        want = list(book.iter_chunks(lay.sheet, lay.header_row, chunk_rows))
+    assert [len(c) for c in got] == [len(c) for c in want]
+    for a, b in zip(got, want):
+        pd.testing.assert_frame_equal(a, b)
+
+
+def test_tap_sees_every_data_row_once(workbook):
+    seen = []
+    with WorkbookSession(workbook) as book:
+        lay = book.layout().get("sales")
+        n = sum(len(c) for c in book.xml_reader().iter_chunks(lay.sheet, lay.header_row, 700, tap=seen.extend))
+    assert [r for r, _ in seen] == list(range(lay.header_row + 1, lay.header_row + 1 + n))
+
+
+def test_shared_strings_are_unescaped(tmp_path):
+    path = str(tmp_path / "转义.xlsx")
+    w = gen_workbook.XlsxWriter(path)
+    w.add_rows(0, "S", [["值"]] + [[k] for k in ESCAPED])
+    w.close()
+    with WorkbookSession(path) as book:
+        assert book.xml_reader().sst == ["值", *ESCAPED.values()]
+        assert book.raw("S")[0].tolist()[1:] == list(ESCAPED.values())
+
+
+def test_inline_strings_are_unescaped(workbook):
+    with WorkbookSession(workbook) as book:
+        rd = book.xml_reader()
+    for raw, want in ESCAPED.items():
+        xml = f'<c r="A1" t="inlineStr"><is><t>{raw}</t></is></c>'.encode("utf-8")
+        assert rd.row_values(xml) == {0: want}                          # 常见写法的快速路径
+        assert rd.row_values(xml.replace(b"<c ", b"<c  ")) == {0: want}  # 通用路径
+
+
+def test_head_matches_raw_prefix(workbook):
+    with WorkbookSession(workbook) as book:
+        rd = book.xml_reader()
+        for sheet in sheets(workbook):
+            rows, n_rows = rd.head(sheet, 5)
+            raw = rd.raw(sheet)
+            assert n_rows == len(raw)
+            assert set(rows) <= set(range(5))
+            for r, cells in rows.items():
+                assert cells == {c: v for c, v in enumerate(raw.iloc[r]) if not (isinstance(v, str) and v == "") and not pd.isna(v)}
+
+
+def test_layout_without_stream_reader_matches(workbook, monkeypatch):
+    with WorkbookSession(workbook) as book:
+        want = book.layout()
+    monkeypatch.setattr(WorkbookSession, "stream_reader", lambda self: None)
+    with WorkbookSession(workbook) as book:
+        got = book.layout()
+    assert got.sheet_names == want.sheet_names
+    assert {k: [(l.sheet, l.header_row, l.columns) for l in v] for k, v in got.roles.items()} == \
+        {k: [(l.sheet, l.header_row, l.columns) for l in v] for k, v in want.roles.items()}
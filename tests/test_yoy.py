@@ -0,0 +1,115 @@
+# 多年度同比 / 环比：按月汇总表上的自连接结果与直接对两年明细逐期求和、逐个对齐上年同期 / 上一期的结果一致
+import math
+
+import pandas as pd
+import pytest
+
+import app3
+from app3 import COMPARE_ALL, COMPARE_METRICS, QUARTER_MONTHS
+import legacy
+from conftest import make_workbook
+
+
+@pytest.fixture(scope="module")
+def years(tmp_path_factory):
+    d = tmp_path_factory.mktemp("yoy")
+    return [make_workbook(str(d / f"{y}.xlsx"), rows=2000, customers=120, year=y, seed=y) for y in (2024, 2025)]
+
+
+@pytest.fixture(scope="module")
+def detail(years):
+    return pd.concat([legacy.read_sales(p) for p in years], ignore_index=True)
+
+
+def naive_sums(detail: pd.DataFrame, dim: str, grain: str) -> dict:
+    """{(取值, 年, 月或季度): {度量: 合计}}，逐行累加"""
+    out = {}
+    for _, r in detail.iterrows():
+        y, m = int(r["月份"][:4]), int(r["月份"][5:])
+        k = (COMPARE_ALL if dim == COMPARE_ALL else str(r[dim]), y, (m - 1) // 3 + 1 if grain == "quarter" else m)
+        acc = out.setdefault(k, dict.fromkeys(COMPARE_METRICS, 0.0))
+        for c in COMPARE_METRICS:
+            acc[c] += r[c]
+    return out
+
+
+def rate(cur, base):
+    if base is None or base == 0:
+        return math.nan
+    return (cur - base) / abs(base)
+
+
+def assert_close(got, want, what):
+    if want is None or (isinstance(want, float) and math.isnan(want)):
+        assert pd.isna(got), what
+    else:
+        assert got == pytest.approx(want, rel=1e-9, abs=1e-6), what
+
+
+@pytest.mark.parametrize("grain", ["month", "quarter"])
+@pytest.mark.parametrize("dim", [COMPARE_ALL] + app3.COMPARE_DIMENSIONS)
+def test_period_deltas_match_naive(years, detail, dim, grain):
+    store = app3.load_month_store(years)
+    got = app3.period_deltas(store, dim, grain)
+    want = naive_sums(detail, dim, grain)
+    span = 4 if grain == "quarter" else 12
+    sub = "季度" if grain == "quarter" else "月"
+    assert len(got) == len(want)
+    for r in got.to_dict("records"):
+        v, y, p = r["取值"], r["年"], r[sub]
+        cur = want[(v, y, p)]
+        last_year = want.get((v, y - 1, p))
+        prev = want.get((v, y, p - 1) if p > 1 else (v, y - 1, span))
+        for m in COMPARE_METRICS:
+            assert_close(r[m], cur[m], (v, y, p, m))
+            assert_close(r[f"{m}_上年同期"], last_year and last_year[m], (v, y, p, m, "上年同期"))
+            assert_close(r[f"{m}_上期"], prev and prev[m], (v, y, p, m, "上期"))
+            assert_close(r[f"{m}_同比"], rate(cur[m], last_year and last_year[m]), (v, y, p, m, "同比"))
+            assert_close(r[f"{m}_环比"], rate(cur[m], prev and prev[m]), (v, y, p, m, "环比"))
+
+
+@pytest.mark.parametrize("quarter", ["Q1", "Q3", "全年"])
+@pytest.mark.parametrize("dim", app3.COMPARE_DIMENSIONS)
+def test_yoy_summary_matches_naive(years, detail, dim, quarter):
+    store = app3.load_month_store(years)
+    got = app3.yoy_summary(store, dim, 2025, quarter).set_index("取值")
+    months = [f"{y}-{m:02d}" for y in (2024, 2025) for m in QUARTER_MONTHS.get(quarter, range(1, 13))]
+    d = detail[detail["月份"].isin(months)].assign(年=lambda x: x["月份"].str[:4].astype(int), 取值=lambda x: x[dim].astype(str))
+    cur = d[d["年"] == 2025].groupby("取值")[COMPARE_METRICS].sum()
+    prev = d[d["年"] == 2024].groupby("取值")[COMPARE_METRICS].sum()
+    assert sorted(got.index) == sorted(set(cur.index) | set(prev.index))
+    assert got["销售收入"].dropna().is_monotonic_decreasing
+    for v in got.index:
+        for m in COMPARE_METRICS:
+            c = cur[m].get(v)
+            p = prev[m].get(v)
+            assert_close(got.at[v, m], c, (v, m))
+            assert_close(got.at[v, f"{m}_上年同期"], p, (v, m, "上年同期"))
+            assert_close(got.at[v, f"{m}_同比"], math.nan if c is None else rate(c, p), (v, m, "同比"))
+
+
+def test_later_source_of_same_year_wins_on_overlapping_months(years, tmp_path):
+    redo = make_workbook(str(tmp_path / "2025重做.xlsx"), rows=500, customers=50, year=2025, seed=7)
+    store = app3.load_month_store([years[1], redo, years[0]])
+    want = legacy.read_sales(redo).groupby("月份")["销售收入"].sum()
+    got = app3.period_deltas(store)
+    got = got[got["年"] == 2025].set_index("期间")["销售收入"]
+    assert got.to_dict() == pytest.approx(want.to_dict())
+
+
+def test_trend_chart_is_cached_per_sources_and_grain(years, monkeypatch):
+    from streamlit.testing.v1 import AppTest
+
+    def page(paths):
+        import app3
+        app3.render_yoy_panel(paths, "全年", 2025)
+
+    built = []
+    real = app3.yoy_trend_chart
+    monkeypatch.setattr(app3, "yoy_trend_chart", lambda d, grain: built.append(grain) or real(d, grain))
+    at = AppTest.from_function(page, args=(years,), default_timeout=120).run()
+    assert not at.exception and built == ["month"]
+    at.run()
+    assert built == ["month"]
+    at.radio(key="yoy_grain").set_value("季度").run()
+    assert built == ["month", "quarter"]